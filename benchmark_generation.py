@@ -0,0 +1,139 @@
+"""
+End-to-end generation benchmark against the offline mock OpenRouter server
+Runs generate_all_posts / test_generation through the real OpenRouter backend,
+pointed at mock_openrouter_server.py, and reports posts/sec, p50/p95 request
+latency and total wall time for each scenario.
+
+Usage:
+    python benchmark_generation.py                       # default scenarios
+    python benchmark_generation.py --scenarios 1 8 8x5   # concurrency[xposts-per-call]
+    python benchmark_generation.py --latency lognormal:0.6,0.4 --rate-limit-rate 0.05 --output bench.json
+    python benchmark_generation.py --scenarios 8 --quota 20/5 --rate-limit 1   # adaptive limiter vs a real quota
+    python benchmark_generation.py --scenarios 1 8 --latency lognormal:0.3,1.0 --hedge-backend stub
+"""
+
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+import generate_modelit_x_posts as pipeline
+from llm_backends import configure_backend, configure_hedging, get_backend, reset_backends
+from llm_cache import configure_cache
+from llm_metrics import metrics
+from mock_openrouter_server import MockOpenRouterServer
+
+DEFAULT_SCENARIOS = ["1", "8", "16", "8x5"]
+
+def parse_scenario(spec: str) -> Dict:
+    """'8x5' -> concurrency 8, 5 posts per call; 'test5' -> test_generation(5)"""
+    if spec.startswith("test"):
+        return {"name": spec, "mode": "test", "num_posts": int(spec[4:] or 5)}
+    concurrency, _, per_call = spec.partition("x")
+    return {"name": spec, "mode": "all", "concurrency": int(concurrency), "posts_per_call": int(per_call or 1)}
+
+def run_scenario(scenario: Dict, mock_url: str, workdir: str, seed: int, rate_limit: float = 0.0,
+                 max_rate: float = None, hedge_backend: str = None) -> Dict:
+    """Run one scenario with a fresh backend and no response cache"""
+    reset_backends()
+    configure_cache(enabled=False)
+    concurrency = scenario.get("concurrency", 1)
+    backend = configure_backend("openrouter", url=mock_url, pool_size=max(concurrency, 10))
+    backend.limiter.configure(rate=rate_limit, max_rate=max_rate)
+    if hedge_backend:
+        configure_hedging(hedge_backend)
+
+    output_file = os.path.join(workdir, f"bench_{scenario['name']}.json")
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if scenario["mode"] == "test":
+            pipeline.test_generation(scenario["num_posts"], seed=seed)
+            posts = scenario["num_posts"]
+        else:
+            posts = len(pipeline.generate_all_posts(output_file, concurrency=concurrency, seed=seed,
+                                                    posts_per_call=scenario["posts_per_call"]))
+    wall = time.perf_counter() - started
+
+    run = metrics.summary()["run"]
+    hedging = get_backend().stats() if hedge_backend else None
+    return {
+        "scenario": scenario["name"],
+        "posts": posts,
+        "requests": run["requests"],
+        "retries": run["retries"],
+        "wall_seconds": round(wall, 3),
+        "posts_per_second": round(posts / wall, 2) if wall else 0.0,
+        "p50_latency": run["time_to_response"]["p50"],
+        "p95_latency": run["time_to_response"]["p95"],
+        "mean_latency": run["time_to_response"]["mean"],
+        "rate_limit_wait": run["rate_limit_wait"],
+        "status_codes": run["status_codes"],
+        "limiter": backend.limiter.stats(),
+        "hedging": hedging,
+        "connections": backend.client.stats()
+    }
+
+def run_benchmark(scenarios: List[str], latency: str = "lognormal:0.6,0.4", error_rate: float = 0.0,
+                  rate_limit_rate: float = 0.0, seed: int = 0, quota: str = None,
+                  rate_limit: float = 0.0, max_rate: float = None, hedge_backend: str = None) -> List[Dict]:
+    """Run every scenario against one mock server and return the results"""
+    results = []
+    with MockOpenRouterServer(latency=latency, error_rate=error_rate,
+                              rate_limit_rate=rate_limit_rate, seed=seed, quota=quota) as mock, \
+            tempfile.TemporaryDirectory() as workdir:
+        for spec in scenarios:
+            print(f"  ▶️  Scenario {spec}...")
+            results.append(run_scenario(parse_scenario(spec), mock.url, workdir, seed, rate_limit, max_rate,
+                                        hedge_backend))
+        print(f"  🧪 Mock server: {mock.counts}")
+    reset_backends()
+    return results
+
+def print_report(results: List[Dict]):
+    """Print a comparison table"""
+    print("\n" + "="*78)
+    print("📊 GENERATION BENCHMARK")
+    print("="*78)
+    print(f"{'scenario':<10}{'posts':>7}{'requests':>10}{'wall s':>10}{'posts/s':>10}{'p50 s':>9}{'p95 s':>9}"
+          f"{'reuse':>9}{'429s':>6}")
+    for r in results:
+        print(f"{r['scenario']:<10}{r['posts']:>7}{r['requests']:>10}{r['wall_seconds']:>10.2f}"
+              f"{r['posts_per_second']:>10.2f}{r['p50_latency']:>9.3f}{r['p95_latency']:>9.3f}"
+              f"{r['connections']['reuse_rate']:>9.0%}{r['status_codes'].get('429', 0):>6}")
+        if r["hedging"]:
+            h = r["hedging"]
+            print(f"{'':<10}hedged {h['hedge_rate']:.0%} ({h['secondary_wins']} won by hedge, "
+                  f"{h['failovers']} failovers), {h['time_saved_seconds']:.1f}s saved")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark post generation against a local mock OpenRouter")
+    parser.add_argument("--scenarios", nargs="+", default=DEFAULT_SCENARIOS + ["test5"],
+                        help='Concurrency[xPostsPerCall] for generate_all_posts, or "testN" for test_generation')
+    parser.add_argument("--latency", default="lognormal:0.6,0.4",
+                        help="Mock latency: fixed:S | uniform:A,B | lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0, help="Seeds the mock server and hashtag selection")
+    parser.add_argument("--quota", default=None, help="Mock server quota LIMIT/WINDOW_SECONDS, e.g. 20/5")
+    parser.add_argument("--rate-limit", type=float, default=0.0,
+                        help="Starting rate for the adaptive limiter in req/s (default: 0 = off)")
+    parser.add_argument("--max-rate", type=float, default=None, help="Ceiling for the adaptive limiter")
+    parser.add_argument("--hedge-backend", default=None, help="Hedge slow mock requests to this backend (e.g. stub)")
+    parser.add_argument("--output", default=None, help="Also write results as JSON")
+    options = parser.parse_args()
+
+    print("🚀 Benchmarking generation against mock OpenRouter\n")
+    results = run_benchmark(options.scenarios, options.latency, options.error_rate,
+                            options.rate_limit_rate, options.seed, options.quota,
+                            options.rate_limit, options.max_rate, options.hedge_backend)
+    print_report(results)
+
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Saved to: {options.output}")
@@ -0,0 +1,92 @@
+"""
+Startup benchmark for the Sheets uploader
+Cron-driven syncs pay the interpreter and import cost on every run, so this
+times fresh interpreters doing only the startup work: the eager imports
+and build() the uploader used to do, importing the uploader now, and
+everything up to a ready Sheets service (credentials object plus service
+built from the cached or bundled discovery document; no network).
+
+Usage:
+    python benchmark_startup.py
+    python benchmark_startup.py --runs 20 --output startup.json
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SCENARIOS = {
+    "python": "pass",
+    "eager startup (old)": (
+        "import googleapiclient.discovery, googleapiclient.errors, google.oauth2.credentials, "
+        "google.oauth2.service_account, google.auth.transport.requests, google_auth_oauthlib.flow\n"
+        "googleapiclient.discovery.build('sheets', 'v4', "
+        "credentials=google.oauth2.credentials.Credentials(token='benchmark'))"
+    ),
+    "import uploader": "import upload_posts_to_sheets",
+    "uploader -> service": (
+        "import upload_posts_to_sheets as up\n"
+        "from google.oauth2.credentials import Credentials\n"
+        "up.build_sheets_service(Credentials(token='benchmark'))"
+    ),
+}
+
+def time_startup(code: str, runs: int, workdir: str) -> Dict:
+    """Wall time of `python -c code` in fresh interpreters (after one warm-up run)"""
+    env = dict(os.environ, PYTHONPATH=REPO_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    command = [sys.executable, "-c", code]
+
+    warmup = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True)
+    if warmup.returncode != 0:
+        error = (warmup.stderr.strip().splitlines() or ["failed"])[-1]
+        return {"error": error}
+
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, cwd=workdir, env=env, check=True, capture_output=True)
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        "median_ms": round(statistics.median(timings), 1),
+        "min_ms": round(min(timings), 1),
+        "max_ms": round(max(timings), 1)
+    }
+
+def run_benchmark(runs: int = 10) -> Dict[str, Dict]:
+    # The warm-up run of "uploader -> service" writes the discovery cache into
+    # the scratch directory, so the timed runs measure the cached path
+    with tempfile.TemporaryDirectory() as workdir:
+        return {name: time_startup(code, runs, workdir) for name, code in SCENARIOS.items()}
+
+def print_report(results: Dict[str, Dict]):
+    print(f"\n{'scenario':<22} {'median':>9} {'min':>9} {'max':>9}")
+    baseline = results.get("python", {}).get("median_ms")
+    for name, result in results.items():
+        if "error" in result:
+            print(f"{name:<22} {'-':>9} {'-':>9} {'-':>9}  ({result['error']})")
+            continue
+        extra = f"  (+{result['median_ms'] - baseline:.0f}ms over bare python)" if baseline and name != "python" else ""
+        print(f"{name:<22} {result['median_ms']:>7.1f}ms {result['min_ms']:>7.1f}ms {result['max_ms']:>7.1f}ms{extra}")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Time uploader startup in fresh interpreters")
+    parser.add_argument("--runs", type=int, default=10, help="Timed runs per scenario (default: 10)")
+    parser.add_argument("--output", default=None, help="Also write the results as JSON")
+    options = parser.parse_args()
+
+    print(f"⏱️  Timing startup over {options.runs} fresh interpreters per scenario...")
+    results = run_benchmark(options.runs)
+    print_report(results)
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results written to {options.output}")
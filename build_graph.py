@@ -0,0 +1,251 @@
+"""
+Incremental build of post text and images, keyed on content hashes
+Every post is built in a chain - prompt -> main_text -> full_post -> image -
+and images/build_manifest.json records, per post and step, the hash of the
+input it was built from and the hash of what it produced. A run recomputes
+the input hashes and rebuilds only the steps whose input changed, plus
+everything downstream of them:
+
+- main_text: regenerated when its prompt (category prefix, campaign notes
+  and per-post instructions) changed or it is an ERROR placeholder. A
+  hand-edited main_text is kept - it only makes the later steps stale.
+- full_post: rebuilt from main_text, hashtags and links.
+- image: regenerated when its request (image model and the prompt built
+  from full_post) changed, the file is missing, the last attempt failed or
+  image_hashes.py marked it as a near-duplicate of another post's image.
+
+Posts the manifest has never seen (the first run, or new posts) are adopted
+as they are, so only missing images and placeholders are built. Image
+files are re-hashed only when their size or mtime changed, so a nightly run
+with nothing to do reads no image data. Everything is recorded in
+images/build_manifest.json, keyed on content hashes rather than filenames.
+
+Usage:
+    python build_graph.py modelit_x_posts.json --dry-run
+    python build_graph.py modelit_x_posts.json
+    python build_graph.py modelit_x_posts.json --skip-images
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import generate_modelit_x_posts as pipeline
+from campaigns import Campaign
+from generate_images import (DEFAULT_CONCURRENCY, DEFAULT_IMAGES_DIR, DEFAULT_RETRY_ROUNDS, IMAGE_MODEL, ImageStage,
+                            get_image_prompt, image_path)
+from post_store import iter_posts, read_metadata, write_posts
+from post_validator import PLACEHOLDER_PREFIX
+
+MANIFEST_NAME = "build_manifest.json"
+MANIFEST_VERSION = 1
+STEPS = ("main_text", "full_post", "image")
+STALE_IMAGE_STATUSES = ("failed", "duplicate")
+KEPT_IMAGE_KEYS = ("built_at", "perceptual")  # carried over while the image is unchanged
+
+def text_hash(*parts: str) -> str:
+    """sha256 over the parts, separated so ("ab", "c") and ("a", "bc") differ"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def step_inputs(post: Dict, campaign: Campaign, image_model: str = IMAGE_MODEL) -> Dict[str, str]:
+    """Hash of what each step of one post is currently built from"""
+    post_num = post["post_number"]
+    prompt = (pipeline.get_category_prompt(post["category"], post_num, campaign)
+              + pipeline.get_post_instructions(post_num))
+    return {
+        "main_text": text_hash(prompt),
+        "full_post": text_hash(post["main_text"], post["hashtags"], campaign.website_url, campaign.tpt_url),
+        "image": text_hash(image_model, get_image_prompt(post))
+    }
+
+def image_state(path: str, record: Optional[Dict] = None) -> Optional[Dict]:
+    """sha256, size and mtime of an image file (None if missing), trusting record's hash if size and mtime match"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    if record and record.get("bytes") == stat.st_size and record.get("mtime") == stat.st_mtime and record.get("hash"):
+        file_sha = record["hash"]
+    else:
+        file_sha = file_hash(path)
+    return {"hash": file_sha, "bytes": stat.st_size, "mtime": stat.st_mtime}
+
+def manifest_path(images_dir: str = DEFAULT_IMAGES_DIR) -> str:
+    return os.path.join(images_dir, MANIFEST_NAME)
+
+def load_manifest(path: str) -> Dict:
+    if not os.path.exists(path):
+        return {"version": MANIFEST_VERSION, "posts": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(path: str, manifest: Dict):
+    manifest["updated_at"] = datetime.now().isoformat(timespec="seconds")
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_path, path)
+
+def plan_build(posts: List[Dict], manifest: Dict, campaign: Campaign, images_dir: str = DEFAULT_IMAGES_DIR,
+               image_model: str = IMAGE_MODEL) -> Dict[str, List[int]]:
+    """{step: post numbers to rebuild}; a stale step makes every later step of the post stale too"""
+    plan = {step: [] for step in STEPS}
+    for post in posts:
+        post_num = post["post_number"]
+        inputs = step_inputs(post, campaign, image_model)
+        # Posts the manifest has never seen are adopted as built from their current inputs
+        record = manifest["posts"].get(str(post_num)) or {step: {"input": inputs[step]} for step in STEPS}
+
+        main_text = (record["main_text"].get("input") != inputs["main_text"]
+                     or post["main_text"].startswith(PLACEHOLDER_PREFIX))
+        full_post = main_text or record["full_post"].get("input") != inputs["full_post"]
+        image = (full_post or record["image"].get("input") != inputs["image"]
+                 or record["image"].get("status") in STALE_IMAGE_STATUSES
+                 or not os.path.exists(image_path(post_num, images_dir)))
+        for step, stale in zip(STEPS, (main_text, full_post, image)):
+            if stale:
+                plan[step].append(post_num)
+    return plan
+
+def print_plan(plan: Dict[str, List[int]], total: int):
+    print(f"🧱 {total} posts: " + ", ".join(f"{len(plan[step])} {step}" for step in STEPS) + " to rebuild")
+    for step in STEPS:
+        if plan[step]:
+            print(f"   {step}: posts {', '.join(map(str, plan[step]))}")
+
+def run_build(posts_file: str, images_dir: str = DEFAULT_IMAGES_DIR, manifest_file: str = None,
+              image_model: str = IMAGE_MODEL, seed: int = None, fmt: str = None, concurrency: int = 1,
+              dry_run: bool = False, skip_images: bool = False, image_concurrency: int = DEFAULT_CONCURRENCY,
+              retry_rounds: int = DEFAULT_RETRY_ROUNDS) -> Dict[str, List[int]]:
+    """Rebuild the stale steps of every post and record the results in the manifest"""
+    manifest_file = manifest_file or manifest_path(images_dir)
+    posts = list(iter_posts(posts_file, fmt))
+    metadata = read_metadata(posts_file, fmt)
+    campaign = pipeline.campaign_from_metadata(metadata)
+    manifest = load_manifest(manifest_file)
+
+    plan = plan_build(posts, manifest, campaign, images_dir, image_model)
+    print_plan(plan, len(posts))
+    if dry_run:
+        return plan
+
+    if plan["main_text"]:
+        pipeline.regenerate_posts(posts_file, plan["main_text"], seed=seed, fmt=fmt, campaign=campaign,
+                                  concurrency=concurrency)
+        posts = list(iter_posts(posts_file, fmt))
+
+    rebuilt = 0
+    for post in posts:
+        if post["post_number"] in plan["full_post"]:
+            full_post = pipeline.create_full_post(post["main_text"], post["hashtags"], campaign)
+            if full_post != post["full_post"]:
+                post["full_post"] = full_post
+                rebuilt += 1
+    if rebuilt:
+        write_posts(posts_file, metadata, posts, fmt)
+        print(f"📝 Rebuilt full_post for {rebuilt} posts")
+
+    previous = manifest["posts"]
+    manifest = {"version": MANIFEST_VERSION, "posts_file": posts_file, "image_model": image_model,
+                "updated_at": None, "posts": {}}
+    # Re-check images against the rebuilt text: a regeneration that kept the old text leaves its image fresh
+    plan["image"] = []
+    changed_on_disk = 0
+    by_number = {}
+    for post in posts:
+        post_num = post["post_number"]
+        by_number[post_num] = post
+        inputs = step_inputs(post, campaign, image_model)
+        old_record = previous.get(str(post_num))
+        old_image = (old_record or {}).get("image") or {}
+        if ((old_record is not None and old_image.get("input") != inputs["image"])
+                or old_image.get("status") in STALE_IMAGE_STATUSES
+                or not os.path.exists(image_path(post_num, images_dir))):
+            plan["image"].append(post_num)
+        record = {
+            "main_text": {"input": inputs["main_text"], "hash": text_hash(post["main_text"])},
+            "full_post": {"input": inputs["full_post"], "hash": text_hash(post["full_post"])},
+            "image": old_image
+        }
+        if post_num not in plan["image"]:
+            state = image_state(image_path(post_num, images_dir), old_image)
+            if old_image.get("hash") and state["hash"] != old_image["hash"]:
+                changed_on_disk += 1
+            record["image"] = {"input": inputs["image"], "file": image_path(post_num, images_dir),
+                               **state, "status": old_image.get("status", "adopted")}
+            record["image"].update((key, old_image[key]) for key in KEPT_IMAGE_KEYS if key in old_image)
+        manifest["posts"][str(post_num)] = record
+    save_manifest(manifest_file, manifest)
+    if changed_on_disk:
+        print(f"🖼️  {changed_on_disk} images were replaced by hand - keeping them")
+
+    if skip_images or not plan["image"]:
+        print(f"💾 Manifest written to {manifest_file}" + (f" ({len(plan['image'])} images left stale)"
+                                                          if plan["image"] else ""))
+        return plan
+
+    print(f"\n🎨 Generating {len(plan['image'])} images with {image_model}, {image_concurrency} at a time")
+
+    def record_image(post: Dict, path: Optional[str], error: Optional[Exception]):
+        record = manifest["posts"][str(post["post_number"])]
+        inputs = step_inputs(post, campaign, image_model)
+        if error is None:
+            record["image"] = {"input": inputs["image"], "file": path, **image_state(path),
+                               "status": "built", "built_at": datetime.now().isoformat(timespec="seconds")}
+        else:
+            record["image"] = dict(record["image"], input=inputs["image"], status="failed", error=str(error))
+        save_manifest(manifest_file, manifest)
+
+    stage = ImageStage(images_dir, image_concurrency, retry_rounds, image_model, on_result=record_image)
+    for post_num in plan["image"]:
+        stage.submit(by_number[post_num])
+    failed = stage.finish()
+    if failed:
+        print(f"⚠️  Posts {', '.join(map(str, sorted(failed)))} still have no fresh image - the next run retries them")
+    print(f"💾 Manifest written to {manifest_file}")
+    return plan
+
+if __name__ == "__main__":
+    import argparse
+
+    from llm_backends import BACKENDS, DEFAULT_BACKEND, configure_backend
+    from llm_cache import add_cache_arguments, cache_options, configure_cache
+
+    parser = argparse.ArgumentParser(description="Rebuild only the post text and images whose inputs changed")
+    parser.add_argument("posts_file", nargs="?", default="modelit_x_posts.json")
+    parser.add_argument("--images-dir", default=DEFAULT_IMAGES_DIR)
+    parser.add_argument("--manifest", default=None,
+                        help=f"Build manifest (default: IMAGES_DIR/{MANIFEST_NAME})")
+    parser.add_argument("--dry-run", action="store_true", help="Only show what is stale")
+    parser.add_argument("--skip-images", action="store_true", help="Rebuild text only; stale images stay stale")
+    parser.add_argument("--image-model", default=IMAGE_MODEL)
+    parser.add_argument("--image-concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Image requests in flight (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--retry-rounds", type=int, default=DEFAULT_RETRY_ROUNDS,
+                        help=f"Extra rounds for images that failed, retrying only those (default: {DEFAULT_RETRY_ROUNDS})")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=DEFAULT_BACKEND,
+                        help="Text backend for regenerated main_text")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--format", choices=["json", "jsonl"], default=None)
+    add_cache_arguments(parser)
+    options = parser.parse_args()
+
+    configure_backend(options.backend)
+    configure_cache(**cache_options(options))
+    run_build(options.posts_file, options.images_dir, options.manifest, options.image_model, options.seed,
+              options.format, options.concurrency, options.dry_run, options.skip_images, options.image_concurrency,
+              options.retry_rounds)
@@ -0,0 +1,135 @@
+"""
+Campaign specs
+A campaign is one post schedule: brand links, category mix, start date,
+total posts and posting rhythm, plus optional prompt guidance (grade band,
+language, ...). Specs live in a JSON file so many campaigns can be queued
+and generated in one night:
+
+{
+  "campaigns": [
+    {
+      "name": "modelit-2026",
+      "output": "campaigns/modelit-2026.jsonl",
+      "total_posts": 104,
+      "start_date": "2026-01-05",
+      "posts_per_week": 2,
+      "categories": {"Feature Highlight": 20, "Quick Win": 15, ...},
+      "guidance": "Write for middle school science teachers.",
+      "category_guidance": {"Quick Win": "CATEGORY: Quick Win\\n..."},
+      "website_url": "https://modelitk12.com",
+      "tpt_url": "https://www.teacherspayteachers.com/store/modelit"
+    }
+  ]
+}
+
+Every key except "name" is optional and defaults to the ModelIt K12
+campaign in generate_modelit_x_posts.py.
+"""
+
+import json
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+class Campaign:
+    """Everything that varies between post schedules"""
+
+    def __init__(self, name: str, categories: Dict[str, int], start_date: datetime, total_posts: int = None,
+                 posts_per_week: int = 2, website_url: str = "", tpt_url: str = "", output: str = None,
+                 guidance: str = "", category_guidance: Dict[str, str] = None):
+        self.name = name
+        self.categories = dict(categories)
+        self.start_date = start_date
+        self.total_posts = total_posts or sum(self.categories.values())
+        self.posts_per_week = posts_per_week
+        self.website_url = website_url
+        self.tpt_url = tpt_url
+        self.output = output or f"{name}.json"
+        self.guidance = guidance
+        self.category_guidance = category_guidance or {}
+        self.prompts = {}  # category -> compiled prompt prefix, filled by the generator
+
+    def category_distribution(self) -> List[str]:
+        """One category per post, in the spec's order
+
+        If total_posts differs from the sum of the category counts, the
+        counts are scaled proportionally (largest remainder).
+        """
+        weights = self.categories
+        total = sum(weights.values())
+        if total == self.total_posts:
+            counts = dict(weights)
+        else:
+            exact = {category: count * self.total_posts / total for category, count in weights.items()}
+            counts = {category: int(value) for category, value in exact.items()}
+            leftover = self.total_posts - sum(counts.values())
+            for category in sorted(exact, key=lambda c: exact[c] - counts[c], reverse=True)[:leftover]:
+                counts[category] += 1
+
+        categories = []
+        for category, count in counts.items():
+            categories.extend([category] * count)
+        return categories
+
+    def post_slots(self, num_posts: int = None) -> List[Tuple[int, int, int, str]]:
+        """Lay out (post_num, week_num, post_order, category) for each post"""
+        categories = self.category_distribution()
+        slots = []
+        for i in range(min(num_posts or self.total_posts, self.total_posts)):
+            post_num = i + 1
+            week_num = (i // self.posts_per_week) + 1
+            post_order = (i % self.posts_per_week) + 1
+            slots.append((post_num, week_num, post_order, categories[i]))
+        return slots
+
+    def scheduled_date(self, week_num: int, post_order: int) -> str:
+        """Posting days spread evenly over the week (2/week: Monday and Thursday)"""
+        day = (post_order - 1) * 7 // self.posts_per_week
+        return (self.start_date + timedelta(days=(week_num - 1) * 7 + day)).strftime("%Y-%m-%d")
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "output": self.output,
+            "total_posts": self.total_posts,
+            "start_date": self.start_date.strftime("%Y-%m-%d"),
+            "posts_per_week": self.posts_per_week,
+            "categories": self.categories,
+            "guidance": self.guidance,
+            "category_guidance": self.category_guidance,
+            "website_url": self.website_url,
+            "tpt_url": self.tpt_url
+        }
+
+    @classmethod
+    def from_dict(cls, spec: Dict, defaults: "Campaign") -> "Campaign":
+        """Build a campaign from a spec entry, taking missing keys from defaults"""
+        if not spec.get("name"):
+            raise ValueError("Every campaign needs a name")
+        start_date = spec.get("start_date")
+        return cls(
+            name=spec["name"],
+            categories=spec.get("categories", defaults.categories),
+            start_date=datetime.strptime(start_date, "%Y-%m-%d") if start_date else defaults.start_date,
+            total_posts=spec.get("total_posts"),
+            posts_per_week=spec.get("posts_per_week", defaults.posts_per_week),
+            website_url=spec.get("website_url", defaults.website_url),
+            tpt_url=spec.get("tpt_url", defaults.tpt_url),
+            output=spec.get("output"),
+            guidance=spec.get("guidance", defaults.guidance),
+            category_guidance=spec.get("category_guidance", defaults.category_guidance)
+        )
+
+def load_campaigns(path: str, defaults: Campaign) -> Dict[str, Campaign]:
+    """Read a campaign spec file -> {name: Campaign}"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    campaigns = {}
+    for spec in data.get("campaigns", [data] if "name" in data else []):
+        campaign = Campaign.from_dict(spec, defaults)
+        if campaign.name in campaigns:
+            raise ValueError(f"Duplicate campaign name {campaign.name!r} in {path}")
+        campaigns[campaign.name] = campaign
+    if not campaigns:
+        raise ValueError(f"No campaigns found in {path}")
+    return campaigns
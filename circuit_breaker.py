@@ -0,0 +1,162 @@
+"""
+Error classification and circuit breaking for provider calls
+Retrying only helps with transient failures (timeouts, 408/429, 5xx,
+dropped connections). Client errors such as 400 can never succeed, and
+401/402/403 mean every request of the run will fail the same way.
+
+During an outage the breaker opens after N consecutive transient failures
+so the run stops spending its retry budget on a dead provider. It then
+either pauses every worker and lets one probe request through per cooldown
+until the provider answers again ("pause"), or stops the run straight away
+so it can be finished later with --resume ("abort").
+"""
+
+import threading
+import time
+from typing import Dict
+
+from llm_metrics import status_code_of
+
+RETRYABLE_STATUS = {408, 409, 425, 429}
+ACCOUNT_STATUS = {401, 402, 403}
+OUTAGE_MODES = ("pause", "abort")
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while the provider is considered down"""
+
+def classify_error(error: Exception) -> str:
+    """Return "retryable", "account" (401/402/403) or "fatal" (any other 4xx)
+
+    Errors without a status (timeouts, refused or reset connections) are
+    transient and therefore retryable.
+    """
+    status = status_code_of(error)
+    if status is None or status >= 500 or status in RETRYABLE_STATUS:
+        return "retryable"
+    if status in ACCOUNT_STATUS:
+        return "account"
+    return "fatal"
+
+class CircuitBreaker:
+    """Thread-safe closed -> open -> half-open breaker for one backend"""
+
+    def __init__(self, name: str = "", failure_threshold: int = 5, cooldown: float = 30.0,
+                 max_cooldown: float = 300.0, mode: str = "pause", max_outage: float = 1800.0):
+        if mode not in OUTAGE_MODES:
+            raise ValueError(f"Unknown outage mode {mode!r}. Choose from: {', '.join(OUTAGE_MODES)}")
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.mode = mode
+        self.max_outage = max_outage
+        self._cond = threading.Condition()
+        self.state = "closed"
+        self.failures = 0
+        self.fatal_reason = None
+        self._cooldown = cooldown
+        self._opened_at = 0.0
+        self._retry_at = 0.0
+        self.trips = 0
+        self.probes = 0
+        self.short_circuited = 0
+        self.outage_seconds = 0.0
+
+    def configure(self, failure_threshold: int = None, cooldown: float = None, mode: str = None):
+        with self._cond:
+            if failure_threshold is not None:
+                self.failure_threshold = failure_threshold
+            if cooldown is not None:
+                self.base_cooldown = self._cooldown = cooldown
+            if mode is not None:
+                if mode not in OUTAGE_MODES:
+                    raise ValueError(f"Unknown outage mode {mode!r}. Choose from: {', '.join(OUTAGE_MODES)}")
+                self.mode = mode
+
+    def _reject(self, reason: str):
+        self.short_circuited += 1
+        raise CircuitOpenError(reason)
+
+    def before_request(self):
+        """Wait for (or refuse) permission to send a request
+
+        Closed: returns at once. Open: after the cooldown one caller becomes
+        the half-open probe; everyone else waits for its outcome in pause
+        mode or gets CircuitOpenError in abort mode.
+        """
+        with self._cond:
+            while True:
+                if self.fatal_reason:
+                    self._reject(self.fatal_reason)
+                if self.state == "closed":
+                    return
+
+                now = time.monotonic()
+                if self.state == "open" and now >= self._retry_at:
+                    self.state = "half_open"
+                    self.probes += 1
+                    print(f"  🔎 {self.name}: circuit half-open, sending a probe request")
+                    return
+
+                outage = now - self._opened_at
+                if self.mode == "abort" or outage >= self.max_outage:
+                    self._reject(f"{self.name} circuit open for {outage:.0f}s after "
+                                 f"{self.failures} consecutive failures")
+
+                deadline = self._opened_at + self.max_outage
+                if self.state == "open":
+                    deadline = min(deadline, self._retry_at)
+                self._cond.wait(max(deadline - now, 0.01))
+
+    def record_success(self):
+        """The provider answered (even a 4xx proves it is up)"""
+        with self._cond:
+            if self.state != "closed":
+                outage = time.monotonic() - self._opened_at
+                self.outage_seconds += outage
+                print(f"  ✅ {self.name}: provider recovered, circuit closed after {outage:.0f}s")
+            self.state = "closed"
+            self.failures = 0
+            self._cooldown = self.base_cooldown
+            self._cond.notify_all()
+
+    def record_failure(self):
+        """A transient failure; opens the circuit at the threshold or on a failed probe"""
+        with self._cond:
+            self.failures += 1
+            now = time.monotonic()
+            if self.state == "half_open":
+                self._cooldown = min(self._cooldown * 2, self.max_cooldown)
+                self.state = "open"
+                self._retry_at = now + self._cooldown
+                print(f"  🔌 {self.name}: probe failed, next probe in {self._cooldown:.0f}s")
+                self._cond.notify_all()
+            elif self.state == "closed" and self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.trips += 1
+                self._opened_at = now
+                self._retry_at = now + self._cooldown
+                action = "pausing requests" if self.mode == "pause" else "stopping the run"
+                print(f"  🔌 {self.name}: circuit open after {self.failures} consecutive failures, {action}")
+
+    def trip_fatal(self, reason: str):
+        """Open for good: an account-level error (bad key, no credits) fails every request"""
+        with self._cond:
+            if not self.fatal_reason:
+                self.fatal_reason = f"{self.name}: {reason}"
+                self.trips += 1
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                print(f"  🛑 {self.fatal_reason} - not retrying")
+            self._cond.notify_all()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "state": self.state,
+                "trips": self.trips,
+                "probes": self.probes,
+                "short_circuited": self.short_circuited,
+                "outage_seconds": round(self.outage_seconds, 1),
+                "fatal": self.fatal_reason
+            }
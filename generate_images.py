@@ -0,0 +1,268 @@
+"""
+Post image generation through OpenRouter
+Each post gets one square illustration from an image-capable model
+(Gemini 2.5 Flash Image by default). The prompt is built from the post's
+full_post, so the image is rebuilt whenever the post text changes - see
+build_graph.py, which decides which images are stale.
+
+OpenRouter returns generated images as base64 data URLs in
+choices[0].message.images when the request asks for the "image" modality.
+Responses are streamed: the data URL is decoded into a .part file as it
+arrives (a hosted https URL is downloaded instead, resuming with a Range
+request if the connection drops), and the file is renamed into place only
+once it is complete.
+
+ImageStage runs a bounded pool of these requests in the background - next
+to generate_all_posts (--images) or for build_graph.py's stale images -
+and retries only the posts whose image failed.
+"""
+
+import base64
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
+
+from llm_backends import OpenRouterClient
+from rate_limiter import AdaptiveRateLimiter
+
+IMAGE_MODEL = os.getenv("OPENROUTER_IMAGE_MODEL", "google/gemini-2.5-flash-image-preview")
+IMAGE_TIMEOUT = 120  # image responses take far longer than text
+DEFAULT_IMAGES_DIR = "images"
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RETRY_ROUNDS = 2
+DOWNLOAD_ATTEMPTS = 3
+CHUNK_SIZE = 64 * 1024
+
+IMAGE_PROMPT = """Create a square illustration to accompany this X (Twitter) post from an education technology company ({category} post).
+
+Style: bright, friendly and modern; classrooms, students, teachers or STEM models and diagrams. Do not put any words, hashtags, logos or URLs in the image.
+
+POST:
+{full_post}"""
+
+_IMAGE_URL = re.compile(rb'"url"\s*:\s*"(data:image\\?/[\w.+-]+;base64,|https?:)')  # JSON may escape / as \/
+
+def image_filename(post_number: int) -> str:
+    return f"Twitter_Post_{post_number:03d}_Image.png"
+
+def image_path(post_number: int, images_dir: str = DEFAULT_IMAGES_DIR) -> str:
+    return os.path.join(images_dir, image_filename(post_number))
+
+def get_image_prompt(post: Dict) -> str:
+    """Image request text for a post (depends only on its category and full_post)"""
+    return IMAGE_PROMPT.format(category=post["category"], full_post=post["full_post"])
+
+class ImageStreamParser:
+    """Pulls the first image out of a chat completion body fed in chunks
+
+    A base64 data URL is decoded into out as it arrives, so memory use is
+    one chunk however large the image is. A hosted URL is left in .url for
+    the caller to download.
+    """
+
+    def __init__(self, out):
+        self.out = out
+        self.state = "search"  # -> "data" or "url" -> "done"
+        self.url = None
+        self.written = 0
+        self._buffer = b""
+        self._pending = b""  # base64 characters not yet a multiple of 4
+
+    def feed(self, chunk: bytes):
+        self._buffer += chunk
+        if self.state == "search":
+            key = self._buffer.find(b'"image_url"')
+            match = _IMAGE_URL.search(self._buffer, key) if key >= 0 else None
+            if not match:
+                return
+            self.state = "data" if match.group(1).startswith(b"data:") else "url"
+            self._buffer = self._buffer[match.end():] if self.state == "data" else self._buffer[match.start(1):]
+
+        end = self._buffer.find(b'"')
+        if self.state == "url":
+            if end >= 0:
+                self.url = json.loads(b'"' + self._buffer[:end] + b'"')
+                self.state = "done"
+            return
+        if self.state != "data":
+            return
+
+        data = self._buffer if end < 0 else self._buffer[:end]
+        keep = b""
+        if end < 0 and data.endswith(b"\\"):
+            data, keep = data[:-1], b"\\"  # half of a JSON escape; wait for the rest
+        data = self._pending + data.replace(b"\\/", b"/").replace(b"\\n", b"")
+        usable = len(data) - len(data) % 4
+        if usable:
+            self.written += self.out.write(base64.b64decode(data[:usable]))
+        self._pending = data[usable:]
+        self._buffer = keep
+        if end >= 0:
+            if self._pending:
+                raise ValueError("Truncated base64 image data")
+            self.state = "done"
+
+    def close(self):
+        """Raise unless a whole image (or a hosted URL) was found"""
+        if self.state == "done":
+            return
+        if self.state != "search":
+            raise ValueError("Response ended in the middle of the image")
+        try:
+            error = json.loads(self._buffer).get("error")
+        except (ValueError, AttributeError):
+            error = None
+        if error:
+            raise ValueError(f"Provider error: {error.get('message', error) if isinstance(error, dict) else error}")
+        raise ValueError("No images in response")
+
+class ImageGenerator:
+    """Image model client over a pooled OpenRouter connection"""
+
+    def __init__(self, model: str = IMAGE_MODEL, pool_size: int = DEFAULT_CONCURRENCY,
+                 limiter: AdaptiveRateLimiter = None, **client_options):
+        import requests
+
+        client_options.setdefault("timeout", IMAGE_TIMEOUT)
+        self.model = model
+        # Streaming needs the requests transport; HTTP/2 gains nothing for a few large responses
+        self.client = OpenRouterClient(pool_size=pool_size, http2=False, **client_options)
+        self.limiter = limiter or AdaptiveRateLimiter(rate=None)
+        self._downloads = requests.Session()  # hosted images must not get the API key
+        self._download_errors = (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError,
+                                 requests.exceptions.Timeout)
+        self._lock = threading.Lock()
+        self.bytes_written = 0
+        self.resumed_downloads = 0
+
+    def save(self, post: Dict, images_dir: str = DEFAULT_IMAGES_DIR) -> str:
+        """Generate a post's image and stream it to disk, renaming it into place only once complete"""
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": get_image_prompt(post)}],
+            "modalities": ["image", "text"]
+        }
+        path = image_path(post["post_number"], images_dir)
+        temp_path = path + ".part"
+        os.makedirs(images_dir, exist_ok=True)
+        try:
+            self.limiter.acquire()
+            with self.client.post(payload, stream=True) as response:
+                if response.status_code >= 400:
+                    self.limiter.on_error(response.status_code, response.headers, 0)
+                    response.raise_for_status()
+                self.limiter.on_success(response.headers)
+                with open(temp_path, "wb") as f:
+                    parser = ImageStreamParser(f)
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        parser.feed(chunk)
+                        if parser.state == "done":
+                            break
+                    parser.close()
+            if parser.url:
+                self.download(parser.url, temp_path)
+            with self._lock:
+                self.bytes_written += os.path.getsize(temp_path)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return path
+
+    def download(self, url: str, temp_path: str):
+        """Stream a hosted image to temp_path, resuming with a Range request when the connection drops"""
+        for attempt in range(DOWNLOAD_ATTEMPTS):
+            offset = os.path.getsize(temp_path) if os.path.exists(temp_path) else 0
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+            try:
+                with self._downloads.get(url, headers=headers, stream=True, timeout=self.client.timeout) as response:
+                    if offset and response.status_code == 416:
+                        return  # nothing left to fetch
+                    response.raise_for_status()
+                    resuming = offset and response.status_code == 206
+                    with open(temp_path, "ab" if resuming else "wb") as f:
+                        for chunk in response.iter_content(CHUNK_SIZE):
+                            f.write(chunk)
+                return
+            except self._download_errors:
+                if attempt == DOWNLOAD_ATTEMPTS - 1:
+                    raise
+                with self._lock:
+                    self.resumed_downloads += 1
+
+    def close(self):
+        self.client.close()
+        self._downloads.close()
+
+class ImageStage:
+    """Bounded background pool of image requests
+
+    submit() posts while their text is still being generated; finish()
+    waits for the pool, then resubmits only the posts whose image failed,
+    for up to retry_rounds more rounds. on_result(post, path, error) is
+    called from the thread running finish() for every attempt.
+    """
+
+    def __init__(self, images_dir: str = DEFAULT_IMAGES_DIR, concurrency: int = DEFAULT_CONCURRENCY,
+                 retry_rounds: int = DEFAULT_RETRY_ROUNDS, model: str = IMAGE_MODEL,
+                 on_result: Callable[[Dict, Optional[str], Optional[Exception]], None] = None):
+        self.images_dir = images_dir
+        self.retry_rounds = retry_rounds
+        self.on_result = on_result
+        self.generator = ImageGenerator(model, pool_size=concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._futures = {}
+        self.built: Dict[int, str] = {}
+        self.failed: Dict[int, str] = {}
+
+    def submit(self, post: Dict):
+        self._futures[self._executor.submit(self.generator.save, post, self.images_dir)] = post
+
+    @property
+    def pending(self) -> int:
+        return sum(1 for future in self._futures if not future.done())
+
+    def _collect(self, futures: Dict) -> List[Dict]:
+        failed = []
+        for future in as_completed(futures):
+            post = futures[future]
+            post_num = post["post_number"]
+            try:
+                path = future.result()
+            except Exception as e:
+                failed.append(post)
+                self.failed[post_num] = str(e)
+                print(f"  ❌ Image for post {post_num}: {e}")
+                if self.on_result:
+                    self.on_result(post, None, e)
+                continue
+            self.built[post_num] = path
+            self.failed.pop(post_num, None)
+            print(f"  🖼️  Post {post_num} → {path}")
+            if self.on_result:
+                self.on_result(post, path, None)
+        return failed
+
+    def finish(self) -> Dict[int, str]:
+        """Wait for every image, retrying failures; returns {post_number: error} for those that still failed"""
+        try:
+            failed = self._collect(self._futures)
+            for _ in range(self.retry_rounds):
+                if not failed:
+                    break
+                print(f"  🔁 Retrying {len(failed)} failed images: posts "
+                      f"{', '.join(str(post['post_number']) for post in failed)}")
+                failed = self._collect({self._executor.submit(self.generator.save, post, self.images_dir): post
+                                        for post in failed})
+        finally:
+            self._executor.shutdown()
+            self.generator.close()
+
+        resumed = f", {self.generator.resumed_downloads} downloads resumed" if self.generator.resumed_downloads else ""
+        print(f"🎨 {len(self.built)} images written ({self.generator.bytes_written / 1e6:.1f} MB), "
+              f"{len(self.failed)} failed{resumed}")
+        return dict(self.failed)
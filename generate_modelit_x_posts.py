@@ -1,24 +1,38 @@
 """
 Generate 104 engaging X posts for ModelIt K12 using OpenRouter + Nano Banana (Gemini Flash 2.5)
 Outputs to JSON format for Google Sheets automation
+
+The provider is pluggable (see llm_backends.py): --backend openrouter (default),
+gemini (direct Google Gemini API) or stub (offline). Other brands, schedules
+and category mixes are described as campaigns (see campaigns.py); the
+constants below are the default ModelIt K12 campaign.
 """
 
-import os
 import json
+import os
+import random
+import re
 import time
-from datetime import datetime, timedelta
-from typing import List, Dict
-import requests
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv(override=True)
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import List, Dict, Tuple
+
+from campaigns import Campaign, load_campaigns
+from circuit_breaker import OUTAGE_MODES, CircuitOpenError
+from generate_images import DEFAULT_CONCURRENCY as IMAGE_CONCURRENCY, DEFAULT_IMAGES_DIR, ImageStage, image_path
+from llm_backends import (BACKENDS, DEFAULT_BACKEND, MAX_TOKENS, configure_backend, configure_hedging, get_backend,
+                          print_backend_stats)
+from llm_metrics import metrics, metrics_path, print_metrics_summary, request_context
+from llm_cache import add_cache_arguments, cache_options, get_cache, print_cache_stats, print_prompt_cache_stats
+from near_duplicates import DEFAULT_THRESHOLD, NearDuplicateIndex, describe_key
+from post_store import JsonlPostWriter, PostJournal, detect_format, iter_posts, journal_path, read_metadata, write_posts
+from post_validator import (MAX_MAIN_TEXT, MAX_WEIGHTED_LENGTH, PLACEHOLDER_PROBLEM, validate_post, validate_posts,
+                            weighted_length)
 
 # Configuration
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-MODEL = "google/gemini-2.5-flash-preview-09-2025"  # Nano Banana (Gemini 2.5 Flash)
 WEBSITE_URL = "https://modelitk12.com"
 TPT_URL = "https://www.teacherspayteachers.com/store/modelit"
+ERROR_TEXT = "ERROR - Manual review needed"
 
 # Content categories with distribution
 CATEGORIES = {
@@ -35,17 +49,19 @@ CATEGORIES = {
 # Start date for scheduling (first Monday)
 START_DATE = datetime(2025, 1, 6)  # Adjust as needed
 
-def create_category_distribution() -> List[str]:
+DEFAULT_CAMPAIGN = Campaign("modelit", CATEGORIES, START_DATE, total_posts=104, posts_per_week=2,
+                            website_url=WEBSITE_URL, tpt_url=TPT_URL, output="modelit_x_posts.json")
+
+def create_category_distribution(campaign: Campaign = None) -> List[str]:
     """Create a list of 104 categories based on distribution"""
-    categories = []
-    for category, count in CATEGORIES.items():
-        categories.extend([category] * count)
-    return categories
+    return (campaign or DEFAULT_CAMPAIGN).category_distribution()
 
-def get_category_prompt(category: str, post_num: int) -> str:
-    """Generate specific prompt based on category"""
+def build_post_slots(num_posts: int = None, campaign: Campaign = None) -> List[Tuple[int, int, int, str]]:
+    """Lay out (post_num, week_num, post_order, category) for each post"""
+    return (campaign or DEFAULT_CAMPAIGN).post_slots(num_posts)
 
-    base_context = """You are creating an engaging X (Twitter) post for ModelIt K12, an interactive modeling platform that helps teachers make abstract concepts concrete and engaging for students.
+# Prompt templates: a long shared context plus per-category guidance
+BASE_CONTEXT = """You are creating an engaging X (Twitter) post for ModelIt K12, an interactive modeling platform that helps teachers make abstract concepts concrete and engaging for students.
 
 Your audience: K-12 teachers who want to create more engaging, interactive learning experiences for their students.
 
@@ -61,8 +77,8 @@ REQUIREMENTS:
 
 """
 
-    category_guidance = {
-        "Feature Highlight": """CATEGORY: Feature Highlight
+CATEGORY_GUIDANCE = {
+    "Feature Highlight": """CATEGORY: Feature Highlight
 Showcase a specific ModelIt K12 feature and how it transforms teaching. Focus on:
 - Interactive modeling capabilities
 - Real-time visualization
@@ -72,7 +88,7 @@ Showcase a specific ModelIt K12 feature and how it transforms teaching. Focus on
 
 Make the teacher envision using this in their classroom tomorrow.""",
 
-        "Quick Win": """CATEGORY: Quick Win
+    "Quick Win": """CATEGORY: Quick Win
 Share a fast, actionable tip or "did you know" fact. Focus on:
 - Time-saving shortcuts
 - Simple strategies for immediate use
@@ -81,7 +97,7 @@ Share a fast, actionable tip or "did you know" fact. Focus on:
 
 Keep it snappy and valuable.""",
 
-        "Student Engagement": """CATEGORY: Student Engagement Story
+    "Student Engagement": """CATEGORY: Student Engagement Story
 Paint a picture of student excitement and discovery. Focus on:
 - "Aha!" moments when concepts click
 - Students getting genuinely excited about learning
@@ -90,7 +106,7 @@ Paint a picture of student excitement and discovery. Focus on:
 
 Make it emotional, positive, and relatable.""",
 
-        "Subject Integration": """CATEGORY: Subject Integration
+    "Subject Integration": """CATEGORY: Subject Integration
 Show how ModelIt K12 works across subjects. Focus on:
 - STEM applications (ecosystems, chemical reactions, physics)
 - Math modeling and data visualization
@@ -99,7 +115,7 @@ Show how ModelIt K12 works across subjects. Focus on:
 
 Be specific about grade levels and topics.""",
 
-        "Teacher Testimonial": """CATEGORY: Teacher Testimonial
+    "Teacher Testimonial": """CATEGORY: Teacher Testimonial
 Share a realistic success story (can be composite/hypothetical but authentic). Focus on:
 - What the teacher wanted to achieve
 - How ModelIt K12 helped them succeed
@@ -107,7 +123,7 @@ Share a realistic success story (can be composite/hypothetical but authentic). F
 
 Use first-person perspective or quote format with enthusiastic, positive tone.""",
 
-        "Systems Thinking": """CATEGORY: Systems Thinking Benefits
+    "Systems Thinking": """CATEGORY: Systems Thinking Benefits
 Explain why systems thinking matters for students. Focus on:
 - 21st-century skills development
 - Critical thinking and problem-solving
@@ -116,7 +132,7 @@ Explain why systems thinking matters for students. Focus on:
 
 Connect to future readiness.""",
 
-        "Free Resources": """CATEGORY: Free Resources
+    "Free Resources": """CATEGORY: Free Resources
 Highlight available free materials. Focus on:
 - Ready-to-use lesson plans
 - Sample models to try
@@ -125,7 +141,7 @@ Highlight available free materials. Focus on:
 
 Emphasize "try it now" accessibility.""",
 
-        "Problem Solution": """CATEGORY: Positive Transformation
+    "Problem Solution": """CATEGORY: Positive Transformation
 Showcase how ModelIt K12 creates exciting new possibilities for teaching. Focus on:
 - Making abstract concepts come alive for students
 - Access to powerful interactive tools
@@ -133,12 +149,61 @@ Showcase how ModelIt K12 creates exciting new possibilities for teaching. Focus
 - Easy differentiation opportunities
 
 Use positive "imagine...", "discover...", "unlock..." language that inspires action."""
-    }
-
-    return base_context + category_guidance.get(category, "")
+}
 
-def generate_hashtags(category: str, variation: int) -> str:
-    """Generate relevant hashtags based on category"""
+# Precompiled once at import: stable per-category prompt prefixes
+CATEGORY_PROMPTS = {category: BASE_CONTEXT + guidance for category, guidance in CATEGORY_GUIDANCE.items()}
+
+def get_category_prompt(category: str, post_num: int, campaign: Campaign = None) -> str:
+    """Generate specific prompt based on category
+
+    Returns the precompiled, post-independent prefix for the category.
+    Campaigns with their own guidance get their prefixes compiled once too.
+    """
+    if campaign is None or not (campaign.guidance or campaign.category_guidance):
+        return CATEGORY_PROMPTS.get(category, BASE_CONTEXT)
+
+    if category not in campaign.prompts:
+        guidance = campaign.category_guidance.get(category, CATEGORY_GUIDANCE.get(category, ""))
+        extra = f"\n\nCAMPAIGN NOTES:\n{campaign.guidance}" if campaign.guidance else ""
+        campaign.prompts[category] = BASE_CONTEXT + guidance + extra
+    return campaign.prompts[category]
+
+def get_post_instructions(post_num: int, avoid: List[str] = None) -> str:
+    """Variable, per-post suffix that follows the category prefix
+
+    avoid lists existing posts the new one must not resemble (used when
+    regenerating a near-duplicate).
+    """
+    if not avoid:
+        return f"\n\nGenerate post #{post_num}. Return ONLY the 2-3 sentence post text, nothing else."
+
+    existing = "\n".join(f'- "{text}"' for text in avoid)
+    return (
+        f"\n\nGenerate post #{post_num}. It must NOT resemble these existing posts - use a different "
+        f"opening, angle and wording:\n{existing}\n\nReturn ONLY the 2-3 sentence post text, nothing else."
+    )
+
+def get_fix_instructions(post_num: int, previous: str, problems: List[str], max_chars: int) -> str:
+    """Per-post suffix asking for a version that passes validation
+
+    previous is the rejected text and problems the validator's complaints
+    about it (both empty when a valid post is regenerated on request).
+    """
+    rules = (f"Write 2-3 complete sentences, at most {max_chars} characters in total, "
+             "with no hashtags or links (they are added separately).")
+    if not problems or previous == ERROR_TEXT:
+        return f"\n\nGenerate post #{post_num}. {rules} Return ONLY the post text, nothing else."
+    return (
+        f"\n\nGenerate post #{post_num}. A previous version was rejected ({'; '.join(problems)}):\n"
+        f'"{previous}"\n\n{rules} Return ONLY the post text, nothing else.'
+    )
+
+def generate_hashtags(category: str, variation: int, rng: random.Random = None) -> str:
+    """Generate relevant hashtags based on category
+
+    Pass a seeded rng to make the selection reproducible.
+    """
 
     # Core hashtags (always include 1-2)
     core = ["#edtech", "#K12education", "#teachers"]
@@ -156,86 +221,64 @@ def generate_hashtags(category: str, variation: int) -> str:
     }
 
     # Select 4-5 hashtags: 1 core + 3-4 category-specific
-    import random
+    rng = rng or random
     selected = [core[variation % len(core)]]
     cat_tags = category_tags.get(category, ["#education", "#teaching"])
-    selected.extend(random.sample(cat_tags, min(4, len(cat_tags))))
+    selected.extend(rng.sample(cat_tags, min(4, len(cat_tags))))
 
     return " ".join(selected[:5])
 
-def call_openrouter(prompt: str, max_retries: int = 3) -> str:
-    """Call OpenRouter API with Nano Banana model"""
-
-    url = "https://openrouter.ai/api/v1/chat/completions"
-
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://modelitk12.com",
-        "X-Title": "ModelIt K12 Content Generator"
-    }
-
-    payload = {
-        "model": MODEL,
-        "messages": [
-            {
-                "role": "user",
-                "content": prompt
-            }
-        ],
-        "temperature": 0.8,
-        "max_tokens": 200
-    }
-
-    for attempt in range(max_retries):
-        try:
-            response = requests.post(url, headers=headers, json=payload, timeout=30)
-            response.raise_for_status()
-
-            result = response.json()
-            content = result['choices'][0]['message']['content'].strip()
-            return content
-
-        except requests.exceptions.RequestException as e:
-            print(f"  ⚠️  Attempt {attempt + 1} failed: {e}")
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)  # Exponential backoff
-            else:
-                raise
+def call_llm(prompt: str, prefix: str = "", max_tokens: int = MAX_TOKENS, response_format: Dict = None,
+             use_cache: bool = True) -> str:
+    """Generate text with the active backend
 
-    return ""
+    Regenerations pass use_cache=False: their prompt can repeat an earlier
+    attempt's, and the cached answer is exactly the text being replaced.
+    """
+    return get_backend().complete(prompt, prefix=prefix, max_tokens=max_tokens, response_format=response_format,
+                                  use_cache=use_cache)
 
-def create_full_post(main_text: str, hashtags: str) -> str:
+def create_full_post(main_text: str, hashtags: str, campaign: Campaign = None) -> str:
     """Combine all elements into final X post format"""
+    campaign = campaign or DEFAULT_CAMPAIGN
     return f"""{main_text} {hashtags}
 
-🔗 {WEBSITE_URL}
-📚 {TPT_URL}"""
+🔗 {campaign.website_url}
+📚 {campaign.tpt_url}"""
 
-def generate_post(category: str, post_num: int, week_num: int, post_order: int) -> Dict:
-    """Generate a single X post"""
+def generate_post(category: str, post_num: int, week_num: int, post_order: int, seed: int = None,
+                  campaign: Campaign = None) -> Dict:
+    """Generate a single X post
 
-    print(f"  Generating post {post_num}/104 - {category}...")
+    With a seed, hashtag selection is derived from (seed, post_num) so
+    cached reruns reproduce the same post regardless of generation order.
+    """
 
-    # Create prompt
-    prompt = get_category_prompt(category, post_num)
-    prompt += f"\n\nGenerate post #{post_num}. Return ONLY the 2-3 sentence post text, nothing else."
+    total_posts = (campaign or DEFAULT_CAMPAIGN).total_posts
+    print(f"  Generating post {post_num}/{total_posts} - {category}...")
 
-    # Generate main text
-    main_text = call_openrouter(prompt)
+    # Generate main text from the cached category prefix plus a per-post suffix
+    main_text = call_llm(get_post_instructions(post_num), prefix=get_category_prompt(category, post_num, campaign))
+
+    return build_post(category, post_num, week_num, post_order, main_text, seed, campaign)
+
+def build_post(category: str, post_num: int, week_num: int, post_order: int, main_text: str,
+               seed: int = None, campaign: Campaign = None) -> Dict:
+    """Turn generated main text into a complete post record"""
 
     # Clean up any extra formatting
     main_text = main_text.strip().strip('"').strip("'")
 
     # Generate hashtags
-    hashtags = generate_hashtags(category, post_num)
+    rng = random.Random(f"{seed}:{post_num}") if seed is not None else None
+    hashtags = generate_hashtags(category, post_num, rng)
 
-    # Calculate scheduled date (Monday or Thursday)
-    days_offset = (week_num - 1) * 7 + (0 if post_order == 1 else 3)
-    scheduled_date = (START_DATE + timedelta(days=days_offset)).strftime("%Y-%m-%d")
+    # Calculate scheduled date (Monday or Thursday by default)
+    campaign = campaign or DEFAULT_CAMPAIGN
+    scheduled_date = campaign.scheduled_date(week_num, post_order)
 
     # Create full post
-    full_post = create_full_post(main_text, hashtags)
+    full_post = create_full_post(main_text, hashtags, campaign)
 
     return {
         "post_number": post_num,
@@ -244,88 +287,506 @@ def generate_post(category: str, post_num: int, week_num: int, post_order: int)
         "category": category,
         "main_text": main_text,
         "hashtags": hashtags,
-        "website_link": WEBSITE_URL,
-        "tpt_link": TPT_URL,
+        "website_link": campaign.website_url,
+        "tpt_link": campaign.tpt_url,
         "full_post": full_post,
         "scheduled_date": scheduled_date
     }
 
-def generate_all_posts(output_file: str = "modelit_x_posts.json", batch_size: int = 10):
-    """Generate all 104 posts"""
-
-    print("🚀 Starting ModelIt K12 X Posts Generation")
-    print(f"📊 Using model: {MODEL}")
-    print(f"📅 Starting from: {START_DATE.strftime('%Y-%m-%d')}")
-    print(f"💾 Output file: {output_file}\n")
-
-    # Create category distribution
-    categories = create_category_distribution()
-
-    posts = []
-
-    # Generate posts
-    for i in range(104):
-        post_num = i + 1
-        week_num = (i // 2) + 1
-        post_order = (i % 2) + 1
-        category = categories[i]
+def get_batch_instructions(post_nums: List[int]) -> str:
+    """Variable suffix asking for several posts as structured JSON"""
+    count = len(post_nums)
+    return (
+        f"\n\nGenerate {count} different posts (#{post_nums[0]}-#{post_nums[-1]}). "
+        "Each must follow every requirement above and take a distinct angle with different wording. "
+        f'Return ONLY a JSON object of the form {{"posts": ["post text", ...]}} with exactly {count} strings, '
+        "nothing else."
+    )
+
+def parse_batch_response(content: str, expected: int) -> List[str]:
+    """Extract post texts from a batch response, raising ValueError if malformed"""
+    content = re.sub(r"^```(?:json)?\s*|\s*```$", "", content.strip())
+    data = json.loads(content)
+    texts = data.get("posts") if isinstance(data, dict) else data
+
+    if not isinstance(texts, list) or len(texts) != expected:
+        raise ValueError(f"expected {expected} posts, got {texts!r:.80}")
+    if not all(isinstance(text, str) and text.strip() for text in texts):
+        raise ValueError("batch contains empty or non-text posts")
+    return texts
+
+def generate_post_batch(slots: List[Tuple[int, int, int, str]], seed: int = None,
+                        campaign: Campaign = None) -> List[Dict]:
+    """Generate several posts of one category in a single call
+
+    Falls back to one call per post if the batch response is malformed or
+    the batch request fails.
+    """
+    category = slots[0][3]
+    post_nums = [slot[0] for slot in slots]
+
+    total_posts = (campaign or DEFAULT_CAMPAIGN).total_posts
+    print(f"  Generating posts {post_nums[0]}-{post_nums[-1]}/{total_posts} - {category} (batch of {len(slots)})...")
+
+    try:
+        content = call_llm(get_batch_instructions(post_nums),
+                           prefix=get_category_prompt(category, post_nums[0], campaign),
+                           max_tokens=MAX_TOKENS * len(slots),
+                           response_format={"type": "json_object"})
+        texts = parse_batch_response(content, len(slots))
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        print(f"  ⚠️  Batch {post_nums[0]}-{post_nums[-1]} unusable ({e}), falling back to single posts")
+        return [
+            generate_post_or_placeholder(category, post_num, week_num, post_order, seed, campaign)
+            for post_num, week_num, post_order, category in slots
+        ]
+
+    return [
+        build_post(category, post_num, week_num, post_order, text, seed, campaign)
+        for (post_num, week_num, post_order, category), text in zip(slots, texts)
+    ]
+
+def batch_slots(slots: List[Tuple[int, int, int, str]], posts_per_call: int) -> List[List[Tuple[int, int, int, str]]]:
+    """Group slots into same-category batches of up to posts_per_call"""
+    if posts_per_call <= 1:
+        return [[slot] for slot in slots]
+
+    by_category = {}
+    for slot in slots:
+        by_category.setdefault(slot[3], []).append(slot)
+
+    batches = []
+    for category_slots in by_category.values():
+        for start in range(0, len(category_slots), posts_per_call):
+            batches.append(category_slots[start:start + posts_per_call])
+    return batches
+
+def create_error_placeholder(category: str, post_num: int, week_num: int, post_order: int,
+                             campaign: Campaign = None) -> Dict:
+    """Placeholder record for a post that failed to generate"""
+    campaign = campaign or DEFAULT_CAMPAIGN
+    return {
+        "post_number": post_num,
+        "week_number": week_num,
+        "post_order": post_order,
+        "category": category,
+        "main_text": ERROR_TEXT,
+        "hashtags": "",
+        "website_link": campaign.website_url,
+        "tpt_link": campaign.tpt_url,
+        "full_post": ERROR_TEXT,
+        "scheduled_date": ""
+    }
 
+def generate_post_or_placeholder(category: str, post_num: int, week_num: int, post_order: int,
+                                 seed: int = None, campaign: Campaign = None) -> Dict:
+    """Generate a single post, falling back to a placeholder on failure
+
+    CircuitOpenError is not caught: an open circuit stops the run instead
+    of filling the remaining posts with placeholders.
+    """
+    try:
+        return generate_post(category, post_num, week_num, post_order, seed, campaign)
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        print(f"  ❌ Error generating post {post_num}: {e}")
+        return create_error_placeholder(category, post_num, week_num, post_order, campaign)
+
+def regenerate_if_duplicate(post: Dict, index: NearDuplicateIndex, seed: int = None,
+                            max_attempts: int = 2, campaign: Campaign = None) -> Dict:
+    """Return post, or a regenerated version if it is a near-duplicate of an indexed post
+
+    Each retry shows the model the posts it collided with. If every attempt
+    is still too similar, the least similar version is kept.
+    """
+    post_num = post["post_number"]
+    matches = index.query(post["main_text"], exclude=post_num)
+    if not matches:
+        return post
+
+    best, best_similarity = post, matches[0][1]
+    for attempt in range(max_attempts):
+        print(f"  🔁 Post {post_num} is {matches[0][1]:.0%} similar to {describe_key(matches[0][0])}, regenerating...")
         try:
-            post = generate_post(category, post_num, week_num, post_order)
-            posts.append(post)
-
-            # Save periodically
-            if post_num % batch_size == 0:
-                save_posts(posts, output_file)
-                print(f"  ✅ Saved batch at post {post_num}\n")
+            with request_context(category=post["category"], post_numbers=[post_num], dedupe=True):
+                main_text = call_llm(get_post_instructions(post_num, [index.text(key) for key, _ in matches[:3]]),
+                                     prefix=get_category_prompt(post["category"], post_num, campaign),
+                                     use_cache=False)
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            print(f"  ⚠️  Could not regenerate post {post_num}: {e}")
+            break
+
+        candidate = build_post(post["category"], post_num, post["week_number"], post["post_order"], main_text,
+                               seed, campaign)
+        matches = index.query(candidate["main_text"], exclude=post_num)
+        if not matches:
+            return candidate
+        if matches[0][1] < best_similarity:
+            best, best_similarity = candidate, matches[0][1]
+
+    print(f"  ⚠️  Post {post_num} is still {best_similarity:.0%} similar to an earlier post - keeping the most "
+          "distinct version for manual review")
+    return best
+
+def main_text_budget(hashtags: str, campaign: Campaign = None) -> int:
+    """Longest main_text that keeps full_post within X's weighted length"""
+    overhead = weighted_length(create_full_post("", hashtags, campaign))
+    return min(MAX_MAIN_TEXT, MAX_WEIGHTED_LENGTH - overhead)
+
+def regenerate_if_invalid(post: Dict, seed: int = None, max_attempts: int = 2, campaign: Campaign = None,
+                          force: bool = False) -> Dict:
+    """Return post, or a regenerated version if it fails validation
+
+    Each retry shows the model the rejected text and what was wrong with
+    it. If no attempt passes, the version with the fewest problems is kept.
+    With force, a valid post is regenerated too (and kept if no new
+    version passes).
+    """
+    post_num = post["post_number"]
+    problems = validate_post(post)
+    if not problems and not force:
+        return post
+
+    best, best_problems = post, problems
+    current, current_problems = post, problems
+    for attempt in range(max_attempts):
+        reason = "; ".join(current_problems) or "requested"
+        print(f"  🔁 Post {post_num} ({reason}), regenerating...")
+        hashtags = current["hashtags"] or generate_hashtags(post["category"], post_num)
+        try:
+            with request_context(category=post["category"], post_numbers=[post_num], regenerate=True):
+                main_text = call_llm(get_fix_instructions(post_num, current["main_text"], current_problems,
+                                                          main_text_budget(hashtags, campaign)),
+                                     prefix=get_category_prompt(post["category"], post_num, campaign),
+                                     use_cache=False)
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            print(f"  ⚠️  Could not regenerate post {post_num}: {e}")
+            break
+
+        current = build_post(post["category"], post_num, post["week_number"], post["post_order"], main_text,
+                             seed, campaign)
+        if post["scheduled_date"]:
+            current["scheduled_date"] = post["scheduled_date"]
+        current_problems = validate_post(current)
+        if not current_problems:
+            return current
+        if best_problems == [PLACEHOLDER_PROBLEM] or len(current_problems) < len(best_problems):
+            best, best_problems = current, current_problems
+
+    if best_problems:
+        print(f"  ⚠️  Post {post_num} still invalid ({'; '.join(best_problems)}) - keeping the closest version "
+              "for manual review")
+    return best
+
+def build_dedupe_index(threshold: float, archive: List[str] = None) -> NearDuplicateIndex:
+    """Near-duplicate index preloaded with earlier campaigns' posts"""
+    index = NearDuplicateIndex(threshold)
+    for path in archive or []:
+        count = index.load_archive(path, skip_text=[ERROR_TEXT])
+        print(f"📚 Dedupe archive {path}: {count} posts")
+    return index
+
+def generate_all_posts(output_file: str = "modelit_x_posts.json", batch_size: int = 10, concurrency: int = 1,
+                       seed: int = None, resume: bool = False, fmt: str = None, posts_per_call: int = 1,
+                       metrics_prom: str = None, dedupe_threshold: float = None, dedupe_archive: List[str] = None,
+                       campaign: Campaign = None, images_dir: str = None, image_concurrency: int = IMAGE_CONCURRENCY):
+    """Generate all 104 posts (or every post of the given campaign)
+
+    With concurrency > 1 posts are requested in parallel from a bounded
+    worker pool; the output is always ordered by post_number.
+
+    Every finished post is appended to a journal next to the output file.
+    With resume=True the journal is replayed first and only the missing
+    (or previously failed) post numbers are generated.
+
+    A .jsonl output file (or fmt="jsonl") is written as a stream, one
+    line per post, instead of being rewritten at every checkpoint.
+
+    With posts_per_call > 1, posts of the same category are requested
+    together in one structured-JSON call.
+
+    Per-request metrics are written to <output>.metrics.json, and to a
+    Prometheus textfile when metrics_prom is given.
+
+    If the backend's circuit breaker refuses requests (provider outage or
+    an account error), the run stops early, saves what it has and can be
+    finished later with resume=True.
+
+    With a dedupe_threshold, every finished post is checked against the
+    posts so far (and any dedupe_archive post stores) with a MinHash/LSH
+    index, and only near-duplicates are regenerated.
+
+    With an images_dir, each finished post's image is requested right away
+    from a separate pool of image_concurrency workers, so images are made
+    while the rest of the text is still being generated.
+    """
+
+    backend = get_backend()
 
-            # Rate limiting (be nice to the API)
-            time.sleep(1)
+    print("🚀 Starting ModelIt K12 X Posts Generation")
+    if campaign is not None:
+        print(f"🗂️  Campaign: {campaign.name} ({campaign.total_posts} posts)")
+    print(f"📊 Using model: {backend.model} ({backend.name})")
+    print(f"📅 Starting from: {(campaign or DEFAULT_CAMPAIGN).start_date.strftime('%Y-%m-%d')}")
+    print(f"⚡ Concurrency: {concurrency}")
+    print(f"💾 Output file: {output_file}\n")
 
-        except Exception as e:
-            print(f"  ❌ Error generating post {post_num}: {e}")
-            # Create a placeholder
-            posts.append({
-                "post_number": post_num,
-                "week_number": week_num,
-                "post_order": post_order,
-                "category": category,
-                "main_text": "ERROR - Manual review needed",
-                "hashtags": "",
-                "website_link": WEBSITE_URL,
-                "tpt_link": TPT_URL,
-                "full_post": "ERROR - Manual review needed",
-                "scheduled_date": ""
-            })
+    metrics.reset()
+    journal = PostJournal(journal_path(output_file))
+    if resume:
+        completed = journal.load()
+        print(f"♻️  Resuming: {len(completed)} posts recovered from {journal.path}\n")
+    else:
+        journal.reset()
+        completed = {}
+
+    slots = build_post_slots(campaign=campaign)
+    writer = None
+    if detect_format(output_file, fmt) == "jsonl":
+        writer = JsonlPostWriter(output_file, build_metadata(len(slots), campaign))
+        for post_num in sorted(completed):
+            writer.add(completed[post_num])
+    slots = [slot for slot in slots if slot[0] not in completed]
+
+    index = None
+    if dedupe_threshold:
+        index = build_dedupe_index(dedupe_threshold, dedupe_archive)
+        for post_num in sorted(completed):
+            if completed[post_num]["main_text"] != ERROR_TEXT:
+                index.add(post_num, completed[post_num]["main_text"])
+
+    images = None
+    if images_dir:
+        images = ImageStage(images_dir, image_concurrency)
+        print(f"🎨 Images: {image_concurrency} at a time into {images_dir}/\n")
+        # Resumed posts whose image was never written
+        for post_num in sorted(completed):
+            if completed[post_num]["main_text"] != ERROR_TEXT and not os.path.exists(image_path(post_num, images_dir)):
+                images.submit(completed[post_num])
+
+    def record(post: Dict):
+        if index is not None and post["main_text"] != ERROR_TEXT:
+            post = regenerate_if_duplicate(post, index, seed, campaign=campaign)
+            index.add(post["post_number"], post["main_text"])
+        completed[post["post_number"]] = post
+        if post["main_text"] != ERROR_TEXT:
+            journal.append(post)
+            if images is not None:
+                images.submit(post)
+
+        if writer:
+            writer.add(post)
+        # Save periodically
+        elif len(completed) % batch_size == 0:
+            save_posts([completed[n] for n in sorted(completed)], output_file, campaign=campaign)
+            print(f"  ✅ Saved batch at {len(completed)} posts\n")
+
+    def run_batch(batch: List[Tuple[int, int, int, str]], submitted: float) -> List[Dict]:
+        with request_context(category=batch[0][3], post_numbers=[slot[0] for slot in batch],
+                             queue_wait=time.perf_counter() - submitted):
+            if len(batch) > 1:
+                return generate_post_batch(batch, seed, campaign)
+            post_num, week_num, post_order, category = batch[0]
+            return [generate_post_or_placeholder(category, post_num, week_num, post_order, seed, campaign)]
+
+    batches = batch_slots(slots, posts_per_call)
+
+    # Pacing is left to the backend's adaptive rate limiter
+    stopped = None
+    if concurrency <= 1:
+        for batch in batches:
+            try:
+                posts = run_batch(batch, time.perf_counter())
+            except CircuitOpenError as e:
+                stopped = e
+                break
+            for post in posts:
+                record(post)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [executor.submit(run_batch, batch, time.perf_counter()) for batch in batches]
+            unrecorded = set(futures)
+            for future in as_completed(futures):
+                unrecorded.discard(future)
+                try:
+                    posts = future.result()
+                except CircuitOpenError as e:
+                    stopped = e
+                    # Cancelled futures never reach as_completed, so stop waiting on it
+                    for pending in futures:
+                        pending.cancel()
+                    break
+                for post in posts:
+                    record(post)
+        # Batches already running when the circuit opened have finished by now; keep what they made
+        for future in futures:
+            if future in unrecorded and not future.cancelled():
+                try:
+                    posts = future.result()
+                except CircuitOpenError:
+                    continue
+                for post in posts:
+                    record(post)
+
+    if stopped:
+        missing = len(slots) - sum(1 for slot in slots if slot[0] in completed)
+        print(f"\n🛑 Stopping early: {stopped}")
+        print(f"   {missing} posts not generated - rerun with --resume once the provider is back")
+
+    journal.close()
+    posts = [completed[n] for n in sorted(completed)]
 
     # Final save
-    save_posts(posts, output_file)
+    if writer:
+        writer.close()
+    else:
+        save_posts(posts, output_file, fmt, campaign)
 
     print(f"\n✨ Generation complete!")
     print(f"📝 Total posts: {len(posts)}")
     print(f"💾 Saved to: {output_file}")
+    invalid = validate_posts(posts)
+    if invalid:
+        print(f"⚠️  {len(invalid)} posts fail validation - fix just those with: "
+              f"python generate_modelit_x_posts.py regenerate {output_file} --only-invalid")
+
+    if images is not None:
+        print(f"\n🎨 Waiting for {images.pending} images...")
+        images.finish()
+
+    # Write request metrics next to the output
+    metrics.write_json(metrics_path(output_file))
+    print(f"📈 Metrics: {metrics_path(output_file)}")
+    if metrics_prom:
+        metrics.write_prometheus(metrics_prom)
+        print(f"📈 Prometheus textfile: {metrics_prom}")
 
     # Print summary
     print_summary(posts)
+    print_backend_stats()
+    print_cache_stats()
+    print_prompt_cache_stats()
+    print_metrics_summary()
 
     return posts
 
-def save_posts(posts: List[Dict], filename: str):
-    """Save posts to JSON file"""
-    output = {
-        "metadata": {
-            "total_posts": len(posts),
-            "generated_at": datetime.now().isoformat(),
-            "model": MODEL,
-            "website_url": WEBSITE_URL,
-            "tpt_url": TPT_URL,
-            "start_date": START_DATE.strftime("%Y-%m-%d")
-        },
-        "posts": posts
+def dedupe_posts(posts_file: str, threshold: float = DEFAULT_THRESHOLD, archive: List[str] = None,
+                 seed: int = None, fmt: str = None) -> int:
+    """Regenerate only the near-duplicate posts of an existing post store, in place"""
+    print(f"🔍 Checking {posts_file} for near-duplicates (threshold {threshold:.0%})...\n")
+    metrics.reset()
+    index = build_dedupe_index(threshold, archive)
+
+    posts = []
+    replaced = 0
+    for post in iter_posts(posts_file, fmt):
+        if post["main_text"] != ERROR_TEXT:
+            fixed = regenerate_if_duplicate(post, index, seed)
+            replaced += fixed is not post
+            post = fixed
+            index.add(post["post_number"], post["main_text"])
+        posts.append(post)
+
+    if replaced:
+        save_posts(posts, posts_file, fmt)
+    print(f"\n✨ Regenerated {replaced} near-duplicate posts in {posts_file}")
+    print_backend_stats()
+    print_metrics_summary()
+    return replaced
+
+def campaign_from_metadata(metadata: Dict) -> Campaign:
+    """Campaign for an existing post store: the default one with the store's links and start date"""
+    spec = {"name": metadata.get("campaign", DEFAULT_CAMPAIGN.name)}
+    for key in ("website_url", "tpt_url", "start_date", "total_posts"):
+        if metadata.get(key):
+            spec[key] = metadata[key]
+    return Campaign.from_dict(spec, DEFAULT_CAMPAIGN)
+
+def regenerate_posts(posts_file: str, post_numbers: List[int] = None, only_invalid: bool = False,
+                     seed: int = None, fmt: str = None, campaign: Campaign = None, concurrency: int = 1) -> int:
+    """Re-call the provider for just the chosen posts and patch them into the store in place
+
+    post_numbers picks posts explicitly; only_invalid adds every post that
+    fails validation. Everything else in the store is left untouched.
+    """
+    posts = list(iter_posts(posts_file, fmt))
+    metadata = read_metadata(posts_file, fmt)
+    campaign = campaign or campaign_from_metadata(metadata)
+    positions = {post["post_number"]: i for i, post in enumerate(posts)}
+
+    targets = set(post_numbers or [])
+    if only_invalid:
+        invalid = validate_posts(posts)
+        print(f"🔎 {len(invalid)}/{len(posts)} posts in {posts_file} fail validation")
+        targets |= set(invalid)
+    for post_num in sorted(targets - set(positions)):
+        print(f"  ⚠️  No post {post_num} in {posts_file}, skipping")
+    targets = sorted(targets & set(positions))
+
+    print(f"🔧 Regenerating {len(targets)} of {len(posts)} posts\n")
+    metrics.reset()
+
+    def fix(post_num: int) -> Dict:
+        post = posts[positions[post_num]]
+        return regenerate_if_invalid(post, seed, campaign=campaign, force=post_num in (post_numbers or ()))
+
+    replaced = 0
+    stopped = None
+    finished = set()
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+        futures = {executor.submit(fix, post_num): post_num for post_num in targets}
+        for future in as_completed(futures):
+            if isinstance(future.exception(), CircuitOpenError):
+                stopped = future.exception()
+                # Cancelled futures never reach as_completed, so stop waiting on it
+                for pending in futures:
+                    pending.cancel()
+                break
+            finished.add(future)
+    # Posts already being fixed when the circuit opened have finished by now; keep them too
+    if stopped:
+        finished.update(future for future in futures
+                        if not future.cancelled() and not isinstance(future.exception(), CircuitOpenError))
+    for future in finished:
+        post = future.result()
+        if post is not posts[positions[futures[future]]]:
+            posts[positions[post["post_number"]]] = post
+            replaced += 1
+
+    if stopped:
+        print(f"\n🛑 Stopping early: {stopped}")
+    if replaced:
+        write_posts(posts_file, metadata, posts, fmt)
+    remaining = validate_posts(posts)
+    print(f"\n✨ Regenerated {replaced} posts in {posts_file}; {len(remaining)} still fail validation")
+    print_backend_stats()
+    print_metrics_summary()
+    return replaced
+
+def build_metadata(total_posts: int, campaign: Campaign = None) -> Dict:
+    """Metadata block stored alongside the posts"""
+    metadata = {
+        "total_posts": total_posts,
+        "generated_at": datetime.now().isoformat(),
+        "model": get_backend().model,
+        "website_url": (campaign or DEFAULT_CAMPAIGN).website_url,
+        "tpt_url": (campaign or DEFAULT_CAMPAIGN).tpt_url,
+        "start_date": (campaign or DEFAULT_CAMPAIGN).start_date.strftime("%Y-%m-%d")
     }
+    if campaign is not None:
+        metadata["campaign"] = campaign.name
+    return metadata
 
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(output, f, indent=2, ensure_ascii=False)
+def save_posts(posts: List[Dict], filename: str, fmt: str = None, campaign: Campaign = None):
+    """Save posts to a JSON (or JSONL) file"""
+    write_posts(filename, build_metadata(len(posts), campaign), posts, fmt)
 
 def print_summary(posts: List[Dict]):
     """Print generation summary"""
@@ -347,19 +808,14 @@ def print_summary(posts: List[Dict]):
         print(f"\n--- Post {i} ({post['category']}) ---")
         print(post['full_post'])
 
-def test_generation(num_posts: int = 5):
+def test_generation(num_posts: int = 5, seed: int = None):
     """Test generation with a small batch"""
     print(f"🧪 Testing with {num_posts} posts...\n")
 
-    categories = create_category_distribution()[:num_posts]
-
-    for i in range(num_posts):
-        post_num = i + 1
-        week_num = (i // 2) + 1
-        post_order = (i % 2) + 1
-        category = categories[i]
-
-        post = generate_post(category, post_num, week_num, post_order)
+    metrics.reset()
+    for post_num, week_num, post_order, category in build_post_slots(num_posts):
+        with request_context(category=category, post_numbers=[post_num]):
+            post = generate_post(category, post_num, week_num, post_order, seed)
 
         print(f"\n{'='*60}")
         print(f"POST {post_num} - {category}")
@@ -367,16 +823,114 @@ def test_generation(num_posts: int = 5):
         print(post['full_post'])
         print()
 
-        time.sleep(1)
-
-if __name__ == "__main__":
-    import sys
-
-    if len(sys.argv) > 1 and sys.argv[1] == "test":
+    print_backend_stats()
+    print_cache_stats()
+    print_prompt_cache_stats()
+    print_metrics_summary()
+
+def load_campaign_option(option: str) -> Campaign:
+    """Resolve --campaign SPEC[:NAME] to one campaign"""
+    path, _, name = option.partition(":")
+    campaigns = load_campaigns(path, DEFAULT_CAMPAIGN)
+    if name and name not in campaigns:
+        raise SystemExit(f"❌ No campaign {name!r} in {path} (have: {', '.join(campaigns)})")
+    return campaigns[name] if name else next(iter(campaigns.values()))
+
+def main(argv: List[str] = None, default_backend: str = DEFAULT_BACKEND):
+    """Command-line entry point shared by every provider"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate ModelIt K12 X posts")
+    parser.add_argument("args", nargs="*",
+                        help='"test [N]" for a test run, "dedupe FILE" to fix near-duplicates, '
+                             '"regenerate FILE [POST ...]" to redo single posts, otherwise the output file')
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=default_backend,
+                        help=f"LLM provider (default: {default_backend})")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Number of posts to request in parallel (default: 1, sequential)")
+    parser.add_argument("--pool-size", type=int, default=None,
+                        help="Max pooled keep-alive connections (default: max(concurrency, 10))")
+    parser.add_argument("--no-http2", action="store_true", help="Use HTTP/1.1 even if httpx[http2] is installed")
+    parser.add_argument("--seed", type=int, default=None, help="Seed hashtag selection for reproducible reruns")
+    parser.add_argument("--resume", action="store_true",
+                        help="Replay the checkpoint journal and only generate missing posts")
+    parser.add_argument("--posts-per-call", type=int, default=1,
+                        help="Request this many same-category posts per API call as structured JSON")
+    parser.add_argument("--format", choices=["json", "jsonl"], default=None,
+                        help="Output format (default: from the output file extension)")
+    parser.add_argument("--rate-limit", type=float, default=None,
+                        help="Starting request rate in req/s; adapts to rate-limit headers and 429s (0 = off)")
+    parser.add_argument("--max-rate", type=float, default=None,
+                        help="Ceiling for the adaptive request rate in req/s (default: 20)")
+    parser.add_argument("--hedge-backend", choices=sorted(BACKENDS), default=None,
+                        help="Send slow or failed requests to this second backend too; the first answer wins")
+    parser.add_argument("--hedge-percentile", type=float, default=95,
+                        help="Hedge once a request is slower than this percentile of recent latencies (default: 95)")
+    parser.add_argument("--hedge-after", type=float, default=8.0,
+                        help="Hedge delay in seconds until enough latencies have been seen (default: 8)")
+    parser.add_argument("--breaker-threshold", type=int, default=5,
+                        help="Open the circuit after this many consecutive transient failures (default: 5)")
+    parser.add_argument("--breaker-cooldown", type=float, default=30.0,
+                        help="Seconds before the first probe request once the circuit is open (default: 30)")
+    parser.add_argument("--on-outage", choices=OUTAGE_MODES, default="pause",
+                        help="While the circuit is open: pause and probe until recovery, or abort the run")
+    parser.add_argument("--dedupe-threshold", type=float, default=None,
+                        help=f"Regenerate posts whose text is at least this similar to an earlier one "
+                             f"(e.g. {DEFAULT_THRESHOLD}; default: off, and {DEFAULT_THRESHOLD} in dedupe mode)")
+    parser.add_argument("--dedupe-archive", nargs="+", default=None,
+                        help="Earlier campaigns' post stores that new posts must not duplicate")
+    parser.add_argument("--only-invalid", action="store_true",
+                        help="regenerate mode: redo every post that fails validation (length, sentences, hashtags, "
+                             "ERROR placeholders)")
+    parser.add_argument("--campaign", default=None, metavar="SPEC[:NAME]",
+                        help="Generate a campaign from a spec file (first campaign unless NAME is given); "
+                             "see run_campaigns.py to shard many campaigns across workers")
+    parser.add_argument("--images", nargs="?", const=DEFAULT_IMAGES_DIR, default=None, metavar="DIR",
+                        help=f"Also generate each post's image into DIR (default: {DEFAULT_IMAGES_DIR}) "
+                             "while the text is still being generated")
+    parser.add_argument("--image-concurrency", type=int, default=IMAGE_CONCURRENCY,
+                        help=f"Image requests in flight with --images (default: {IMAGE_CONCURRENCY})")
+    parser.add_argument("--metrics-prom", default=None,
+                        help="Also export run metrics to this Prometheus textfile (.prom)")
+    add_cache_arguments(parser)
+    options = parser.parse_args(argv)
+
+    backend_options = {}
+    if options.backend == "openrouter":
+        backend_options = {"pool_size": options.pool_size or max(options.concurrency, 10),
+                           "http2": not options.no_http2}
+    backend = configure_backend(options.backend, **backend_options)
+    backend.limiter.configure(rate=options.rate_limit, max_rate=options.max_rate)
+    backend.breaker.configure(failure_threshold=options.breaker_threshold, cooldown=options.breaker_cooldown,
+                              mode=options.on_outage)
+    if options.hedge_backend:
+        configure_hedging(options.hedge_backend, hedge_percentile=options.hedge_percentile,
+                          hedge_after=options.hedge_after)
+    get_cache(**cache_options(options))
+
+    if options.args and options.args[0] == "test":
         # Test mode
-        num_test = int(sys.argv[2]) if len(sys.argv) > 2 else 5
-        test_generation(num_test)
+        num_test = int(options.args[1]) if len(options.args) > 1 else 5
+        test_generation(num_test, seed=options.seed)
+    elif options.args and options.args[0] == "dedupe":
+        posts_file = options.args[1] if len(options.args) > 1 else "modelit_x_posts.json"
+        dedupe_posts(posts_file, options.dedupe_threshold or DEFAULT_THRESHOLD, options.dedupe_archive,
+                     seed=options.seed, fmt=options.format)
+    elif options.args and options.args[0] == "regenerate":
+        if len(options.args) < 2 or (len(options.args) < 3 and not options.only_invalid):
+            parser.error("regenerate needs a post store and post numbers and/or --only-invalid")
+        campaign = load_campaign_option(options.campaign) if options.campaign else None
+        regenerate_posts(options.args[1], [int(n) for n in options.args[2:]], options.only_invalid,
+                         seed=options.seed, fmt=options.format, campaign=campaign, concurrency=options.concurrency)
     else:
         # Full generation
-        output_file = sys.argv[1] if len(sys.argv) > 1 else "modelit_x_posts.json"
-        generate_all_posts(output_file)
+        campaign = load_campaign_option(options.campaign) if options.campaign else None
+        output_file = options.args[0] if options.args else (campaign or DEFAULT_CAMPAIGN).output
+        generate_all_posts(output_file, concurrency=options.concurrency, seed=options.seed,
+                           resume=options.resume, fmt=options.format, posts_per_call=options.posts_per_call,
+                           metrics_prom=options.metrics_prom, dedupe_threshold=options.dedupe_threshold,
+                           dedupe_archive=options.dedupe_archive, campaign=campaign, images_dir=options.images,
+                           image_concurrency=options.image_concurrency)
+
+if __name__ == "__main__":
+    main()
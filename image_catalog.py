@@ -0,0 +1,240 @@
+"""
+SQLite catalog of post images, built from file headers alone
+One row per Twitter_Post_NNN_Image file in images/ with its format, width,
+height, byte size, mtime and sha256. Dimensions come from the PNG IHDR
+chunk or the JPEG SOF segment - a few hundred bytes per file, no pixels are
+decoded. The posts of a post store are copied into the same database, so
+questions like "which posts have no image" or "which images are over 1 MB"
+are one indexed query instead of a walk over the images directory.
+
+A refresh only reads files whose size or mtime changed since the last one,
+and takes the sha256 from images/build_manifest.json when the manifest
+already hashed the same file, so a refresh with nothing new reads no image
+data at all.
+
+Usage:
+    python image_catalog.py modelit_x_posts.json --missing
+    python image_catalog.py --over 1MB
+    python image_catalog.py --orphans --no-refresh
+"""
+
+import os
+import sqlite3
+import struct
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from build_graph import image_state, load_manifest, manifest_path
+from generate_images import DEFAULT_IMAGES_DIR
+from optimize_images import post_number_from_filename
+from post_store import iter_posts
+
+CATALOG_NAME = "catalog.sqlite3"
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_JPEG_NO_LENGTH = {0x01, *range(0xD0, 0xD8)}  # TEM and RSTn carry no length field
+
+def catalog_path(images_dir: str = DEFAULT_IMAGES_DIR) -> str:
+    return os.path.join(images_dir, CATALOG_NAME)
+
+def read_image_header(path: str) -> Tuple[Optional[str], Optional[int], Optional[int]]:
+    """(format, width, height) from a PNG or JPEG header; (None, None, None) for anything else
+
+    A truncated or corrupt header still gives its format, with no dimensions.
+    """
+    with open(path, "rb") as f:
+        head = f.read(24)
+        if head[:8] == PNG_SIGNATURE and head[12:16] == b"IHDR":
+            if len(head) < 24:
+                return "png", None, None
+            width, height = struct.unpack(">II", head[16:24])
+            return "png", width, height
+        if head[:2] != b"\xff\xd8":
+            return None, None, None
+        f.seek(2)
+        try:
+            while True:
+                byte = f.read(1)
+                while byte and byte != b"\xff":  # stray bytes between segments
+                    byte = f.read(1)
+                while byte == b"\xff":  # fill bytes before a marker
+                    byte = f.read(1)
+                if not byte or byte[0] in (0xD9, 0xDA):  # end of image or start of scan: no frame header
+                    return "jpeg", None, None
+                marker = byte[0]
+                if marker in _JPEG_NO_LENGTH:
+                    continue
+                (length,) = struct.unpack(">H", f.read(2))
+                if length < 2:  # would seek backwards and read the same segment forever
+                    return "jpeg", None, None
+                if marker in _JPEG_SOF:
+                    height, width = struct.unpack(">xHH", f.read(5))
+                    return "jpeg", width, height
+                f.seek(length - 2, os.SEEK_CUR)
+        except struct.error:  # the file ends inside a segment header
+            return "jpeg", None, None
+
+class ImageCatalog:
+    """images and posts tables in one SQLite file, joined on post_number"""
+
+    def __init__(self, path: str = None):
+        self.path = path or catalog_path()
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS images (
+                post_number INTEGER PRIMARY KEY,
+                file TEXT NOT NULL,
+                format TEXT,
+                width INTEGER,
+                height INTEGER,
+                bytes INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                sha256 TEXT NOT NULL,
+                scanned_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS images_bytes ON images (bytes);
+            CREATE TABLE IF NOT EXISTS posts (
+                post_number INTEGER PRIMARY KEY,
+                week_number INTEGER,
+                category TEXT,
+                scheduled_date TEXT
+            );
+            CREATE TABLE IF NOT EXISTS sources (
+                path TEXT PRIMARY KEY,
+                bytes INTEGER NOT NULL,
+                mtime REAL NOT NULL
+            );
+        """)
+        self._conn.commit()
+
+    def refresh_images(self, images_dir: str = DEFAULT_IMAGES_DIR, manifest: Optional[Dict] = None) -> Dict[str, int]:
+        """Bring the images table in line with images_dir, reading only new or changed files"""
+        manifest_posts = (manifest or {}).get("posts", {})
+        known = {row[0]: row[1:] for row in self._conn.execute("SELECT post_number, file, bytes, mtime FROM images")}
+        counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+        rows = []
+        seen = set()
+        with os.scandir(images_dir) as entries:
+            for entry in entries:
+                post_num = post_number_from_filename(entry.name)
+                if post_num is None or not entry.is_file():
+                    continue
+                seen.add(post_num)
+                stat = entry.stat()
+                if known.get(post_num) == (entry.path, stat.st_size, stat.st_mtime):
+                    counts["unchanged"] += 1
+                    continue
+                counts["updated" if post_num in known else "added"] += 1
+                record = (manifest_posts.get(str(post_num)) or {}).get("image")
+                state = image_state(entry.path, record if record and record.get("file") == entry.path else None)
+                rows.append((post_num, entry.path, *read_image_header(entry.path), state["bytes"], state["mtime"],
+                             state["hash"], time.time()))
+        removed = [(post_num,) for post_num in known if post_num not in seen]
+        counts["removed"] = len(removed)
+        with self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.executemany("DELETE FROM images WHERE post_number = ?", removed)
+        return counts
+
+    def refresh_posts(self, posts_file: str, fmt: str = None) -> bool:
+        """Copy the post store's posts in, unless the file is unchanged since the last copy"""
+        stat = os.stat(posts_file)
+        path = os.path.abspath(posts_file)
+        row = self._conn.execute("SELECT bytes, mtime FROM sources WHERE path = ?", (path,)).fetchone()
+        if row == (stat.st_size, stat.st_mtime):
+            return False
+        with self._conn:
+            self._conn.execute("DELETE FROM posts")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO posts VALUES (?, ?, ?, ?)",
+                ((post["post_number"], post.get("week_number"), post.get("category"), post.get("scheduled_date"))
+                 for post in iter_posts(posts_file, fmt))
+            )
+            self._conn.execute("DELETE FROM sources")
+            self._conn.execute("INSERT INTO sources VALUES (?, ?, ?)", (path, stat.st_size, stat.st_mtime))
+        return True
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict]:
+        cursor = self._conn.execute(sql, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def images(self) -> List[Dict]:
+        """Every cataloged image, by post_number"""
+        return self._query("SELECT * FROM images ORDER BY post_number")
+
+    def missing_images(self) -> List[Dict]:
+        """Posts with no image file"""
+        return self._query("SELECT p.* FROM posts p LEFT JOIN images i USING (post_number) "
+                           "WHERE i.post_number IS NULL ORDER BY p.post_number")
+
+    def images_over(self, min_bytes: int) -> List[Dict]:
+        """Images larger than min_bytes, largest first, with their post's details"""
+        return self._query("SELECT i.*, p.category, p.scheduled_date FROM images i "
+                           "LEFT JOIN posts p USING (post_number) WHERE i.bytes > ? ORDER BY i.bytes DESC",
+                           (min_bytes,))
+
+    def orphan_images(self) -> List[Dict]:
+        """Images whose post_number is not in the post store"""
+        return self._query("SELECT i.* FROM images i LEFT JOIN posts p USING (post_number) "
+                           "WHERE p.post_number IS NULL ORDER BY i.post_number")
+
+    def summary(self) -> Dict:
+        return self._query("SELECT (SELECT COUNT(*) FROM posts) AS posts, COUNT(*) AS images, "
+                           "COALESCE(SUM(bytes), 0) AS bytes FROM images")[0]
+
+    def close(self):
+        self._conn.close()
+
+def parse_size(text: str) -> int:
+    """'1MB', '500kb', '2.5M' or '1048576' -> bytes (decimal units, like the rest of the tools' output)"""
+    text = text.strip().upper().removesuffix("B")
+    for suffix, factor in (("K", 1e3), ("M", 1e6), ("G", 1e9)):
+        if text.endswith(suffix):
+            return int(float(text[:-1]) * factor)
+    return int(text)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Header-only SQLite catalog of post images")
+    parser.add_argument("posts_file", nargs="?", default="modelit_x_posts.json")
+    parser.add_argument("--images-dir", default=DEFAULT_IMAGES_DIR)
+    parser.add_argument("--catalog", default=None, help=f"Catalog database (default: IMAGES_DIR/{CATALOG_NAME})")
+    parser.add_argument("--format", choices=["json", "jsonl"], default=None)
+    parser.add_argument("--no-refresh", action="store_true", help="Query the catalog as it is")
+    parser.add_argument("--missing", action="store_true", help="List posts with no image")
+    parser.add_argument("--over", type=parse_size, default=None, metavar="SIZE",
+                        help="List images larger than SIZE (e.g. 1MB, 500KB)")
+    parser.add_argument("--orphans", action="store_true", help="List images with no post in the post store")
+    options = parser.parse_args()
+
+    catalog = ImageCatalog(options.catalog or catalog_path(options.images_dir))
+    if not options.no_refresh:
+        started = time.perf_counter()
+        counts = catalog.refresh_images(options.images_dir, load_manifest(manifest_path(options.images_dir)))
+        posts_changed = catalog.refresh_posts(options.posts_file, options.format)
+        print(f"🗂️  Refreshed in {(time.perf_counter() - started) * 1000:.0f}ms: "
+              + ", ".join(f"{count} {name}" for name, count in counts.items())
+              + (f", posts reloaded from {options.posts_file}" if posts_changed else ""))
+    summary = catalog.summary()
+    print(f"📊 {summary['images']} images ({summary['bytes'] / 1e6:.1f} MB) for {summary['posts']} posts")
+
+    def report(title: str, query: Callable[[], List[Dict]], describe: Callable[[Dict], str]):
+        started = time.perf_counter()
+        rows = query()
+        print(f"\n{title}: {len(rows)} ({(time.perf_counter() - started) * 1000:.1f}ms)")
+        for row in rows:
+            print(f"   {describe(row)}")
+
+    if options.missing:
+        report("🕳️  Posts missing images", catalog.missing_images,
+               lambda row: f"post {row['post_number']} ({row['category']}, {row['scheduled_date']})")
+    if options.over is not None:
+        report(f"🐘 Images over {options.over / 1e6:g} MB", lambda: catalog.images_over(options.over),
+               lambda row: f"post {row['post_number']}: {row['bytes'] / 1e6:.2f} MB, "
+                           f"{row['width']}x{row['height']} {row['format']}")
+    if options.orphans:
+        report("👻 Images with no post", catalog.orphan_images, lambda row: f"{row['file']}")
+    catalog.close()
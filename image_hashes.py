@@ -0,0 +1,220 @@
+"""
+Perceptual-hash index for near-duplicate post images
+Each image is decoded once (in a process pool) to a 32x32 and a 9x8
+grayscale thumbnail, and hashed for the whole set at once with NumPy:
+
+- dHash: 64 bits, is each pixel brighter than its right-hand neighbour
+- pHash: 64 bits, is each low-frequency DCT coefficient of the 32x32
+  thumbnail above the median
+
+Two images are near-duplicates when their hashes differ in at most
+threshold bits. Candidates are found by banding, the same idea as the LSH
+bands in near_duplicates.py: the 64 bits are cut into threshold + 1 bands,
+and two hashes within threshold bits must agree exactly on at least one
+band, so only hashes that share a band value are compared. That keeps the
+search exact and fast for tens of thousands of images. Matches are joined
+into groups.
+
+Hashes are stored with each image in images/build_manifest.json, next to
+the image's sha256, so unchanged images are never decoded again.
+--mark-stale keeps the first image of every group and marks the others
+for build_graph.py to regenerate.
+
+Usage:
+    python image_hashes.py
+    python image_hashes.py images --hash dhash --threshold 6
+    python image_hashes.py --mark-stale && python build_graph.py
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from build_graph import image_state, load_manifest, manifest_path, save_manifest
+from generate_images import DEFAULT_IMAGES_DIR
+from optimize_images import find_images
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+HASH_KINDS = ("phash", "dhash")
+DEFAULT_THRESHOLD = 8
+DUPLICATE_STATUS = "duplicate"
+_BLOCK = 2048  # rows per block when comparing a very large bucket
+
+def decode_thumbnails(path: str):
+    """32x32 and 9x8 grayscale thumbnails of an image, from a single decode"""
+    with Image.open(path) as image:
+        image.draft("L", (64, 64))  # JPEGs decode straight to a small size
+        gray = image.convert("L")
+    return (numpy.asarray(gray.resize((32, 32), Image.LANCZOS), dtype=numpy.float32),
+            numpy.asarray(gray.resize((9, 8), Image.LANCZOS), dtype=numpy.int16))
+
+def _dct_matrix(size: int):
+    k = numpy.arange(size)[:, None]
+    n = numpy.arange(size)[None, :]
+    matrix = numpy.cos(numpy.pi * (2 * n + 1) * k / (2 * size)) * numpy.sqrt(2 / size)
+    matrix[0] /= numpy.sqrt(2)
+    return matrix.astype(numpy.float32)
+
+def pack_bits(bits) -> "numpy.ndarray":
+    """(N, 64) booleans -> N uint64 hashes"""
+    return numpy.packbits(bits, axis=1).view(">u8").ravel().astype(numpy.uint64)
+
+def compute_hashes(thumbs32, thumbs9) -> Dict[str, "numpy.ndarray"]:
+    """pHash and dHash of every image at once from stacked (N, 32, 32) and (N, 8, 9) thumbnails"""
+    count = len(thumbs32)
+    dhash = pack_bits((thumbs9[:, :, 1:] > thumbs9[:, :, :-1]).reshape(count, 64))
+    dct = _dct_matrix(32)
+    low = (dct @ thumbs32 @ dct.T)[:, :8, :8].reshape(count, 64)
+    median = numpy.median(low[:, 1:], axis=1, keepdims=True)  # the DC term would skew the median
+    phash = pack_bits(low > median)
+    return {"phash": phash, "dhash": dhash}
+
+def popcount(values) -> "numpy.ndarray":
+    if hasattr(numpy, "bitwise_count"):
+        return numpy.bitwise_count(values)
+    table = numpy.array([bin(i).count("1") for i in range(256)], dtype=numpy.uint8)
+    return table[values.view(numpy.uint8)].reshape(*values.shape, 8).sum(axis=-1)
+
+def _pairs_in_bucket(members, hashes, threshold: int):
+    """Index pairs (i < j) within threshold bits among one bucket's members"""
+    found = []
+    values = hashes[members]
+    for start in range(0, len(members), _BLOCK):
+        block = values[start:start + _BLOCK]
+        distance = popcount(block[:, None] ^ values[None, :])
+        rows, cols = numpy.nonzero(distance <= threshold)
+        keep = cols > rows + start
+        found.append(numpy.stack([members[rows[keep] + start], members[cols[keep]]], axis=1))
+    return found
+
+def near_duplicate_pairs(hashes, threshold: int = DEFAULT_THRESHOLD):
+    """(M, 2) index pairs whose hashes differ in at most threshold bits"""
+    bands = min(threshold + 1, 64)
+    edges = numpy.linspace(0, 64, bands + 1).astype(int)
+    found = [numpy.empty((0, 2), dtype=numpy.int64)]
+    for low, high in zip(edges[:-1], edges[1:]):
+        keys = (hashes >> numpy.uint64(low)) & numpy.uint64((1 << int(high - low)) - 1)
+        order = numpy.argsort(keys, kind="stable")
+        starts = numpy.flatnonzero(numpy.r_[True, keys[order][1:] != keys[order][:-1]])
+        sizes = numpy.diff(numpy.r_[starts, len(order)])
+        for start, size in zip(starts[sizes > 1], sizes[sizes > 1]):
+            found.extend(_pairs_in_bucket(order[start:start + size], hashes, threshold))
+    return numpy.unique(numpy.concatenate(found), axis=0)
+
+def duplicate_groups(hashes, threshold: int = DEFAULT_THRESHOLD) -> List[List[int]]:
+    """Indexes of near-duplicate images, joined into groups (connected components)"""
+    parent = list(range(len(hashes)))
+
+    def root(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in near_duplicate_pairs(hashes, threshold).tolist():
+        parent[root(i)] = root(j)
+    groups = {}
+    for i in range(len(hashes)):
+        groups.setdefault(root(i), []).append(i)
+    return sorted((members for members in groups.values() if len(members) > 1), key=lambda g: g[0])
+
+def index_images(images_dir: str = DEFAULT_IMAGES_DIR, manifest: Optional[Dict] = None,
+                 workers: Optional[int] = None) -> Tuple[List[int], Dict[str, "numpy.ndarray"], int]:
+    """(post_numbers, {kind: uint64 hashes}, images decoded) for every post image
+
+    Hashes stored in the manifest are reused while the image's sha256
+    still matches; the others are decoded once and written back into the
+    manifest records.
+    """
+    manifest = manifest if manifest is not None else {"posts": {}}
+    sources = find_images(images_dir)
+    post_numbers = sorted(sources)
+    known = {}
+    missing = []
+    for post_num in post_numbers:
+        record = (manifest["posts"].get(str(post_num)) or {}).get("image") or {}
+        state = image_state(sources[post_num], record if record.get("file") == sources[post_num] else None)
+        stored = record.get("perceptual") or {}
+        if stored.get("sha256") == state["hash"]:
+            known[post_num] = stored
+        else:
+            missing.append((post_num, state["hash"]))
+
+    if missing:
+        if Image is None:
+            raise RuntimeError("Pillow is needed to decode images (pip install Pillow)")
+        paths = [sources[post_num] for post_num, _ in missing]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            thumbnails = list(executor.map(decode_thumbnails, paths, chunksize=16))
+        computed = compute_hashes(numpy.stack([t[0] for t in thumbnails]), numpy.stack([t[1] for t in thumbnails]))
+        for i, (post_num, sha) in enumerate(missing):
+            known[post_num] = {"sha256": sha, **{kind: f"{int(computed[kind][i]):016x}" for kind in HASH_KINDS}}
+            record = manifest["posts"].get(str(post_num))
+            if record and record.get("image"):
+                record["image"]["perceptual"] = known[post_num]  # carries its own sha256
+
+    hashes = {kind: numpy.array([int(known[n][kind], 16) for n in post_numbers], dtype=numpy.uint64)
+              for kind in HASH_KINDS}
+    return post_numbers, hashes, len(missing)
+
+def mark_duplicates(manifest: Dict, groups: List[List[int]]) -> int:
+    """Keep the first post of each group and mark the others' images for regeneration"""
+    marked = 0
+    for group in groups:
+        for post_num in group[1:]:
+            record = manifest["posts"].get(str(post_num))
+            if record and record.get("image"):
+                record["image"].update(status=DUPLICATE_STATUS, duplicate_of=group[0])
+                marked += 1
+    return marked
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Find near-duplicate post images with perceptual hashes")
+    parser.add_argument("images_dir", nargs="?", default=DEFAULT_IMAGES_DIR)
+    parser.add_argument("--manifest", default=None, help="Build manifest (default: IMAGES_DIR/build_manifest.json)")
+    parser.add_argument("--hash", choices=HASH_KINDS, default="phash", help="Hash to compare (default: phash)")
+    parser.add_argument("--threshold", type=int, default=DEFAULT_THRESHOLD,
+                        help=f"Max differing bits of 64 for a near-duplicate (default: {DEFAULT_THRESHOLD})")
+    parser.add_argument("--workers", type=int, default=None, help="Decoding processes (default: one per CPU)")
+    parser.add_argument("--mark-stale", action="store_true",
+                        help="Mark every image but the first of each group for build_graph.py to regenerate")
+    options = parser.parse_args()
+
+    if numpy is None:
+        sys.exit("❌ NumPy is needed for the hash index (pip install numpy)")
+    manifest_file = options.manifest or manifest_path(options.images_dir)
+    manifest = load_manifest(manifest_file)
+
+    started = time.perf_counter()
+    post_numbers, hashes, decoded = index_images(options.images_dir, manifest, options.workers)
+    hashed = time.perf_counter()
+    groups = [[post_numbers[i] for i in group] for group in duplicate_groups(hashes[options.hash], options.threshold)]
+    print(f"🔍 {len(post_numbers)} images hashed in {hashed - started:.2f}s ({decoded} decoded, "
+          f"{len(post_numbers) - decoded} from the manifest), compared in {time.perf_counter() - hashed:.3f}s")
+
+    position = {post_num: i for i, post_num in enumerate(post_numbers)}
+    print(f"🧬 {len(groups)} near-duplicate groups ({options.hash}, ≤ {options.threshold} bits)")
+    for group in groups:
+        first = hashes[options.hash][position[group[0]]]
+        distances = [int(popcount(numpy.array([first ^ hashes[options.hash][position[n]]]))[0]) for n in group[1:]]
+        print(f"   posts {', '.join(map(str, group))} (bits from post {group[0]}: {', '.join(map(str, distances))})")
+
+    if options.mark_stale and groups:
+        marked = mark_duplicates(manifest, groups)
+        print(f"♻️  {marked} images marked for regeneration - run python build_graph.py")
+    if os.path.exists(manifest_file) or decoded:
+        save_manifest(manifest_file, manifest)
+        print(f"💾 Hashes stored in {manifest_file}")
@@ -0,0 +1,597 @@
+"""
+LLM provider backends for post generation
+One registry of backends (OpenRouter, Gemini direct, offline stub). Each
+backend is initialised once per run and reused for every call; provider
+SDKs are only imported when their backend is first used.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError, classify_error
+from llm_cache import get_cache, prompt_cache_stats
+from llm_metrics import current_tags, metrics, percentile, request_context, status_code_of
+from rate_limiter import AdaptiveRateLimiter
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv(override=True)
+except ImportError:
+    pass
+
+# Provider configuration
+OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+OPENROUTER_MODEL = "google/gemini-2.5-flash-preview-09-2025"  # Nano Banana (Gemini 2.5 Flash)
+OPENROUTER_URL = os.getenv("OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
+
+# Google Gemini API key - Get free at https://aistudio.google.com/apikey
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_MODEL = "gemini-2.0-flash-exp"
+
+TEMPERATURE = 0.8
+MAX_TOKENS = 200
+DEFAULT_BACKEND = "openrouter"
+
+class RequestCancelled(Exception):
+    """Raised inside a request whose result is no longer wanted (e.g. a lost hedge)"""
+
+class OpenRouterClient:
+    """Long-lived OpenRouter client backed by a keep-alive connection pool
+
+    Uses httpx over HTTP/2 when httpx and h2 are installed, otherwise a
+    requests.Session. Headers are built once and connections are shared by
+    every call (generation, retries and test mode), so the TCP+TLS handshake
+    is only paid when the pool has to open a new connection.
+    """
+
+    def __init__(self, api_key: str = None, url: str = OPENROUTER_URL, pool_size: int = 10,
+                 timeout: float = 30, http2: bool = True):
+        import requests
+
+        self.url = url
+        self.timeout = timeout
+        self.headers = {
+            "Authorization": f"Bearer {api_key or OPENROUTER_API_KEY}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": "https://modelitk12.com",
+            "X-Title": "ModelIt K12 Content Generator"
+        }
+        self._lock = threading.Lock()
+        self._requests_sent = 0
+        self._connections_opened = 0
+        self._httpx = None
+
+        if http2:
+            try:
+                import httpx
+                import h2  # noqa: F401 - httpx needs it for HTTP/2
+                self._httpx = httpx
+            except ImportError:
+                pass
+
+        if self._httpx:
+            self.transport = "httpx (HTTP/2)"
+            self.errors = (requests.exceptions.RequestException, self._httpx.HTTPError)
+            self._session = self._httpx.Client(
+                http2=True,
+                headers=self.headers,
+                timeout=timeout,
+                limits=self._httpx.Limits(max_connections=pool_size,
+                                          max_keepalive_connections=pool_size)
+            )
+        else:
+            self.transport = "requests (HTTP/1.1 keep-alive)"
+            self.errors = (requests.exceptions.RequestException,)
+            self._session = requests.Session()
+            self._session.headers.update(self.headers)
+            self._adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            self._session.mount("https://", self._adapter)
+            self._session.mount("http://", self._adapter)
+
+    def _trace(self, event_name: str, info: Dict):
+        """httpcore trace hook - counts freshly opened connections"""
+        if event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self._connections_opened += 1
+
+    def post(self, payload: Dict, stream: bool = False):
+        """POST a chat completion payload, returning the raw response
+
+        stream=True leaves the body unread for iter_content() (requests
+        transport only, so the client must be created with http2=False).
+        """
+        with self._lock:
+            self._requests_sent += 1
+        if stream:
+            if self._httpx:
+                raise ValueError("Streaming responses need the requests transport (http2=False)")
+            return self._session.post(self.url, json=payload, timeout=self.timeout, stream=True)
+        if self._httpx:
+            return self._session.post(self.url, json=payload, extensions={"trace": self._trace})
+        return self._session.post(self.url, json=payload, timeout=self.timeout)
+
+    def stats(self) -> Dict:
+        """Connection reuse counters for this client"""
+        if self._httpx:
+            opened = self._connections_opened
+        else:
+            pools = self._adapter.poolmanager.pools
+            opened = sum(pools[key].num_connections for key in pools.keys())
+        sent = self._requests_sent
+        reused = max(sent - opened, 0)
+        return {
+            "transport": self.transport,
+            "requests": sent,
+            "connections_opened": opened,
+            "reused": reused,
+            "reuse_rate": reused / sent if sent else 0.0
+        }
+
+    def close(self):
+        self._session.close()
+
+class LLMBackend:
+    """A text-generation provider, set up once and reused for the whole run
+
+    Subclasses implement _complete(); complete() adds the shared response
+    cache, adaptive rate limiting, circuit breaker, retry loop and
+    per-request metrics so every provider behaves the same way.
+    """
+
+    name = ""
+    retryable_errors = (Exception,)
+
+    def __init__(self, model: str):
+        self.model = model
+        self.limiter = AdaptiveRateLimiter()
+        self.breaker = CircuitBreaker(self.name)
+
+    def complete(self, prompt: str, prefix: str = "", max_tokens: int = MAX_TOKENS,
+                 response_format: Dict = None, max_retries: int = 3, cancel: threading.Event = None,
+                 use_cache: bool = True) -> str:
+        """Generate text for prefix + prompt
+
+        The stable prefix is passed separately so backends can mark it for
+        provider-side prompt caching. Identical requests are answered from
+        the on-disk response cache unless use_cache is False - regenerations
+        must reach the provider, since the cached answer is the one being
+        replaced - but the new answer is still stored. Once cancel is set,
+        no further attempt or backoff is started and RequestCancelled is
+        raised.
+
+        Only transient errors (timeouts, connection errors, 408/429, 5xx)
+        are retried. Other 4xx responses fail at once, and 401/402/403 also
+        trip the circuit breaker for the rest of the run. While the breaker
+        is open, CircuitOpenError is raised instead of calling the provider.
+        """
+        cache = get_cache()
+        cached = cache.get(self.model, prefix + prompt, TEMPERATURE, max_tokens) if use_cache else None
+        if cached is not None:
+            metrics.record(backend=self.name, model=self.model, cache_hit=True)
+            return cached
+
+        started = time.perf_counter()
+        status_codes = []
+        info = {}
+        rate_limit_wait = 0.0
+
+        def record_failure(error: Exception, attempt: int):
+            metrics.record(backend=self.name, model=self.model, ok=False, error=str(error),
+                           time_to_response=time.perf_counter() - started,
+                           retries=attempt, status_codes=status_codes, rate_limit_wait=rate_limit_wait)
+
+        for attempt in range(max_retries):
+            if cancel is not None and cancel.is_set():
+                raise RequestCancelled(f"{self.name} request cancelled")
+            try:
+                self.breaker.before_request()
+            except CircuitOpenError as e:
+                if status_codes:
+                    record_failure(e, attempt - 1)
+                raise
+            rate_limit_wait += self.limiter.acquire()
+            try:
+                info = {}
+                text = self._complete(prompt, prefix, max_tokens, response_format, info)
+                status_codes.append(info.get("status_code", 200))
+                self.limiter.on_success(info.get("headers"))
+                self.breaker.record_success()
+                break
+            except self.retryable_errors as e:
+                status = status_code_of(e)
+                status_codes.append(status)
+                kind = classify_error(e)
+                if kind == "account":
+                    self.breaker.trip_fatal(f"HTTP {status} ({str(e).splitlines()[0]})")
+                elif kind == "fatal" or status == 429:
+                    self.breaker.record_success()  # The provider is up; 429s are the limiter's job
+                else:
+                    self.breaker.record_failure()
+                print(f"  ⚠️  Attempt {attempt + 1} failed ({kind}): {e}")
+                delay = self.limiter.on_error(status, getattr(getattr(e, "response", None), "headers", None), attempt)
+                if kind == "retryable" and attempt < max_retries - 1:
+                    # Jittered backoff, or the server's Retry-After
+                    if cancel is not None:
+                        cancel.wait(delay)
+                    else:
+                        time.sleep(delay)
+                else:
+                    record_failure(e, attempt)
+                    raise
+            except Exception as e:
+                # Unclassified (e.g. a malformed 200 body): still resolve a half-open probe
+                self.breaker.record_failure()
+                status_codes.append(status_code_of(e))
+                record_failure(e, attempt)
+                raise
+
+        metrics.record(backend=self.name, model=self.model,
+                       time_to_response=time.perf_counter() - started,
+                       retries=len(status_codes) - 1, status_codes=status_codes, rate_limit_wait=rate_limit_wait,
+                       prompt_tokens=info.get("prompt_tokens") or 0,
+                       completion_tokens=info.get("completion_tokens") or 0,
+                       cached_tokens=info.get("cached_tokens") or 0)
+        cache.put(self.model, prefix + prompt, TEMPERATURE, max_tokens, text)
+        return text
+
+    def _complete(self, prompt: str, prefix: str, max_tokens: int, response_format: Dict, info: Dict) -> str:
+        """Make one provider call; fill info with status_code and token usage"""
+        raise NotImplementedError
+
+    def print_stats(self):
+        """Print backend-specific statistics at the end of a run"""
+        breaker = self.breaker.stats()
+        if breaker["trips"]:
+            print(f"\n🔌 Circuit breaker ({self.name}): {breaker['trips']} trips, {breaker['probes']} probes, "
+                  f"{breaker['short_circuited']} requests refused, {breaker['outage_seconds']:.0f}s paused"
+                  + (f" - {breaker['fatal']}" if breaker["fatal"] else ""))
+        stats = self.limiter.stats()
+        if not stats["acquired"] or stats["rate"] is None:
+            return
+        print(f"\n🚦 Rate limiter ({self.name}): {stats['rate']:.2f} req/s at end of run, "
+              f"{stats['waited_seconds']:.1f}s waited, {stats['rate_limited']} rate-limited responses")
+
+    def close(self):
+        """Release connections or SDK resources"""
+
+def supports_cache_control(model: str) -> bool:
+    """Whether OpenRouter needs explicit cache_control breakpoints for this model
+
+    Anthropic and Gemini models only cache marked prefixes; OpenAI-style
+    providers cache long prefixes automatically.
+    """
+    return model.startswith(("anthropic/", "google/"))
+
+class OpenRouterBackend(LLMBackend):
+    """OpenRouter chat completions over a shared pooled client"""
+
+    name = "openrouter"
+
+    def __init__(self, model: str = OPENROUTER_MODEL, pool_size: int = 10, http2: bool = True, **client_options):
+        super().__init__(model)
+        self.client = OpenRouterClient(pool_size=pool_size, http2=http2, **client_options)
+        self.retryable_errors = self.client.errors
+
+    def _complete(self, prompt: str, prefix: str, max_tokens: int, response_format: Dict, info: Dict) -> str:
+        content = prompt
+        if prefix:
+            prefix_part = {"type": "text", "text": prefix}
+            if supports_cache_control(self.model):
+                prefix_part["cache_control"] = {"type": "ephemeral"}
+            content = [prefix_part, {"type": "text", "text": prompt}]
+
+        payload = {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": content
+                }
+            ],
+            "temperature": TEMPERATURE,
+            "max_tokens": max_tokens
+        }
+        if response_format:
+            payload["response_format"] = response_format
+
+        response = self.client.post(payload)
+        response.raise_for_status()
+
+        result = response.json()
+        usage = result.get('usage') or {}
+        info["status_code"] = response.status_code
+        info["headers"] = response.headers
+        info["prompt_tokens"] = usage.get('prompt_tokens')
+        info["completion_tokens"] = usage.get('completion_tokens')
+        info["cached_tokens"] = (usage.get('prompt_tokens_details') or {}).get('cached_tokens')
+        prompt_cache_stats.record(info["prompt_tokens"], info["cached_tokens"])
+
+        return result['choices'][0]['message']['content'].strip()
+
+    def print_stats(self):
+        """Print rate limiting and how often the client reused a pooled connection"""
+        super().print_stats()
+        stats = self.client.stats()
+        if not stats["requests"]:
+            return
+        print(f"\n🔌 Connections ({stats['transport']}): {stats['requests']} requests over "
+              f"{stats['connections_opened']} connections ({stats['reuse_rate']:.0%} reused)")
+
+    def close(self):
+        self.client.close()
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini API called directly through google-generativeai
+
+    The SDK is imported, configured and the GenerativeModel built once,
+    instead of on every call.
+    """
+
+    name = "gemini"
+
+    def __init__(self, model: str = GEMINI_MODEL, api_key: str = None):
+        super().__init__(model)
+        try:
+            import google.generativeai as genai
+        except ImportError:
+            raise ImportError("Google Generative AI library not installed. Run: pip install google-generativeai")
+
+        genai.configure(api_key=api_key or GEMINI_API_KEY)
+        self._model = genai.GenerativeModel(
+            model_name=model,
+            generation_config={
+                'temperature': TEMPERATURE,
+                'max_output_tokens': MAX_TOKENS,
+            }
+        )
+
+    def _complete(self, prompt: str, prefix: str, max_tokens: int, response_format: Dict, info: Dict) -> str:
+        # The stable prefix goes first so Gemini's implicit prefix caching can apply
+        contents = [prefix, prompt] if prefix else prompt
+
+        generation_config = None
+        if max_tokens != MAX_TOKENS or response_format:
+            generation_config = {'temperature': TEMPERATURE, 'max_output_tokens': max_tokens}
+            if response_format:
+                generation_config['response_mime_type'] = 'application/json'
+
+        response = self._model.generate_content(contents, generation_config=generation_config)
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is not None:
+            info["prompt_tokens"] = getattr(usage, 'prompt_token_count', 0)
+            info["completion_tokens"] = getattr(usage, 'candidates_token_count', 0)
+            info["cached_tokens"] = getattr(usage, 'cached_content_token_count', 0)
+            prompt_cache_stats.record(info["prompt_tokens"], info["cached_tokens"])
+        return response.text.strip()
+
+class StubBackend(LLMBackend):
+    """Offline stand-in that returns canned text without any network calls
+
+    Output is derived from a hash of the prompt, so runs are deterministic.
+    Useful for dry runs of the pipeline and for checking output files.
+    """
+
+    name = "stub"
+    retryable_errors = ()
+
+    def __init__(self, model: str = "stub"):
+        super().__init__(model)
+        self.limiter = AdaptiveRateLimiter(rate=None)
+
+    def _text(self, seed: str) -> str:
+        digest = hashlib.sha256(seed.encode("utf-8")).hexdigest()[:8]
+        return (f"Imagine your students building a live model of a food web in minutes ({digest}). "
+                "Try ModelIt K12 free today!")
+
+    def _complete(self, prompt: str, prefix: str, max_tokens: int, response_format: Dict, info: Dict) -> str:
+        if response_format:
+            match = re.search(r"Generate (\d+) different posts", prompt)
+            count = int(match.group(1)) if match else 1
+            return json.dumps({"posts": [self._text(f"{prefix}{prompt}{i}") for i in range(count)]})
+        return self._text(prefix + prompt)
+
+class HedgedBackend:
+    """Races a second provider against slow or failing calls to the primary
+
+    Each request goes to the primary backend. If it has not answered by the
+    hedge delay (a percentile of the primary's recent latencies, or
+    hedge_after until enough samples exist) - or it fails outright - the same
+    request is sent to the secondary backend. The first successful answer
+    wins and the other request is cancelled: it makes no further retries,
+    and a call already in flight is left to finish and its answer dropped.
+    """
+
+    def __init__(self, primary: LLMBackend, secondary: LLMBackend, hedge_percentile: float = 95,
+                 hedge_after: float = 8.0, min_samples: int = 20, max_workers: int = 64):
+        self.primary = primary
+        self.secondary = secondary
+        self.name = f"{primary.name}+{secondary.name}"
+        self.model = primary.model
+        self.hedge_percentile = hedge_percentile
+        self.hedge_after = hedge_after
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=500)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedged = 0
+        self.failovers = 0
+        self.secondary_wins = 0
+        self.time_saved = 0.0
+
+    @property
+    def limiter(self):
+        return self.primary.limiter
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for the primary before sending the hedge"""
+        with self._lock:
+            latencies = list(self._latencies)
+        if len(latencies) < self.min_samples:
+            return self.hedge_after
+        return percentile(latencies, self.hedge_percentile)
+
+    def _submit(self, backend: LLMBackend, cancel: threading.Event, args, tags: Dict, use_cache: bool = True):
+        def run():
+            # Worker threads don't inherit the caller's request_context
+            with request_context(**tags):
+                return backend.complete(*args, cancel=cancel, use_cache=use_cache)
+        return self._executor.submit(run)
+
+    def complete(self, prompt: str, prefix: str = "", max_tokens: int = MAX_TOKENS,
+                 response_format: Dict = None, max_retries: int = 3, use_cache: bool = True) -> str:
+        """Same contract as LLMBackend.complete(), with hedging and failover"""
+        args = (prompt, prefix, max_tokens, response_format, max_retries)
+        tags = current_tags()
+        cancel = threading.Event()
+        started = time.perf_counter()
+        with self._lock:
+            self.requests += 1
+
+        primary = self._submit(self.primary, cancel, args, tags, use_cache)
+
+        def primary_done(future):
+            if not future.cancelled() and future.exception() is None:
+                with self._lock:
+                    self._latencies.append(time.perf_counter() - started)
+        primary.add_done_callback(primary_done)
+
+        secondary = None
+        pending = {primary}
+        wait(pending, timeout=self.hedge_delay())
+        error = None
+        while pending:
+            if secondary is None and (not primary.done() or primary.exception() is not None):
+                # Hedge a slow primary, or fail over from a failed one
+                failover = primary.done()
+                with self._lock:
+                    self.hedged += 1
+                    self.failovers += failover
+                secondary = self._submit(self.secondary, cancel, args,
+                                         {**tags, "hedge": "failover" if failover else "hedge"}, use_cache)
+                pending.add(secondary)
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+
+                cancel.set()
+                if future is secondary:
+                    self._count_secondary_win(primary, time.perf_counter())
+                return future.result()
+
+        cancel.set()
+        raise error
+
+    def _count_secondary_win(self, primary, won_at: float):
+        """Credit the time the primary would have kept us waiting, once it finishes"""
+        with self._lock:
+            self.secondary_wins += 1
+
+        def saved(future):
+            if not future.cancelled() and future.exception() is None:
+                with self._lock:
+                    self.time_saved += time.perf_counter() - won_at
+        primary.add_done_callback(saved)
+
+    def stats(self) -> Dict:
+        hedge_delay = self.hedge_delay()
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "hedge_rate": self.hedged / self.requests if self.requests else 0.0,
+                "failovers": self.failovers,
+                "secondary_wins": self.secondary_wins,
+                "time_saved_seconds": round(self.time_saved, 3),
+                "hedge_delay": round(hedge_delay, 3)
+            }
+
+    def print_stats(self):
+        stats = self.stats()
+        if not stats["requests"]:
+            return
+        print(f"\n🪁 Hedging ({self.name}): {stats['hedged']}/{stats['requests']} requests hedged "
+              f"({stats['hedge_rate']:.0%}), {stats['failovers']} failovers, {stats['secondary_wins']} won by "
+              f"{self.secondary.name}, {stats['time_saved_seconds']:.1f}s saved (hedge after {stats['hedge_delay']:.2f}s)")
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+BACKENDS = {
+    "openrouter": OpenRouterBackend,
+    "gemini": GeminiBackend,
+    "stub": StubBackend,
+}
+
+_backends = {}
+_active = DEFAULT_BACKEND
+_hedged = None
+_backends_lock = threading.Lock()
+
+def configure_backend(name: str, **options) -> LLMBackend:
+    """Create (once) the named backend and make it the active one"""
+    global _active
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend {name!r}. Choose from: {', '.join(BACKENDS)}")
+    with _backends_lock:
+        if name not in _backends:
+            _backends[name] = BACKENDS[name](**options)
+        _active = name
+        return _backends[name]
+
+def get_backend(name: str = None) -> LLMBackend:
+    """Return a backend (the active one by default), creating it on first use
+
+    With hedging configured, the default is the hedged active backend.
+    """
+    if name is None and _hedged is not None:
+        return _hedged
+    name = name or _active
+    with _backends_lock:
+        if name not in _backends:
+            if name not in BACKENDS:
+                raise ValueError(f"Unknown backend {name!r}. Choose from: {', '.join(BACKENDS)}")
+            _backends[name] = BACKENDS[name]()
+        return _backends[name]
+
+def configure_hedging(secondary: str, **options) -> HedgedBackend:
+    """Hedge the active backend's calls against the named secondary backend"""
+    global _hedged
+    primary = get_backend(_active)
+    if secondary == primary.name:
+        raise ValueError("The hedge backend must differ from the primary backend")
+    hedged = HedgedBackend(primary, get_backend(secondary), **options)
+    with _backends_lock:
+        if _hedged is not None:
+            _hedged.close()
+        _hedged = hedged
+    return hedged
+
+def reset_backends():
+    """Close and forget every backend so the next run starts fresh"""
+    global _active, _hedged
+    with _backends_lock:
+        if _hedged is not None:
+            _hedged.close()
+            _hedged = None
+        for backend in _backends.values():
+            backend.close()
+        _backends.clear()
+        _active = DEFAULT_BACKEND
+
+def print_backend_stats():
+    """Print statistics for every backend used in this run"""
+    for backend in list(_backends.values()):
+        backend.print_stats()
+    if _hedged is not None:
+        _hedged.print_stats()
@@ -0,0 +1,231 @@
+"""
+Caching for LLM calls
+- Persistent on-disk cache for completions, content-addressed on
+  (model, prompt, temperature, max_tokens) and stored in SQLite
+- Counters for provider-side prompt (prefix) caching
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+DEFAULT_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".llm_cache.sqlite3")
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_AGE_DAYS = 30
+EVICT_EVERY = 100  # puts between eviction passes
+
+def make_cache_key(model: str, prompt: str, temperature: float, max_tokens: int) -> str:
+    """Hash every input that affects the completion into a stable key"""
+    material = json.dumps(
+        {"model": model, "prompt": prompt, "temperature": temperature, "max_tokens": max_tokens},
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """SQLite-backed completion cache with age and size based eviction
+
+    Entries older than max_age_days are dropped, then the least recently
+    used entries are dropped until the cache fits max_entries/max_bytes.
+    A disabled cache never reads or writes, which is how --no-cache works.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: Optional[int] = None, max_age_days: float = DEFAULT_MAX_AGE_DAYS,
+                 enabled: bool = True):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+        if enabled:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            self._conn.commit()
+            self.evict()
+
+    def get(self, model: str, prompt: str, temperature: float, max_tokens: int) -> Optional[str]:
+        """Return the cached completion, or None on a miss"""
+        if not self.enabled:
+            return None
+
+        key = make_cache_key(model, prompt, temperature, max_tokens)
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, model: str, prompt: str, temperature: float, max_tokens: int, response: str):
+        """Store a completion"""
+        if not self.enabled:
+            return
+
+        key = make_cache_key(model, prompt, temperature, max_tokens)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, len(response.encode("utf-8")), now, now)
+            )
+            self._conn.commit()
+            self._puts += 1
+            due = self._puts % EVICT_EVERY == 0
+
+        if due:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop expired entries, then least recently used ones over the size limits"""
+        if not self.enabled:
+            return 0
+
+        with self._lock:
+            before = self._conn.total_changes
+
+            if self.max_age_days is not None:
+                cutoff = time.time() - self.max_age_days * 86400
+                self._conn.execute("DELETE FROM responses WHERE created_at < ?", (cutoff,))
+
+            if self.max_entries is not None:
+                self._conn.execute("""
+                    DELETE FROM responses WHERE key IN (
+                        SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                    )
+                """, (self.max_entries,))
+
+            if self.max_bytes is not None:
+                self._conn.execute("""
+                    DELETE FROM responses WHERE key IN (
+                        SELECT key FROM (
+                            SELECT key, SUM(size) OVER (ORDER BY last_used DESC) AS running
+                            FROM responses
+                        ) WHERE running > ?
+                    )
+                """, (self.max_bytes,))
+
+            self._conn.commit()
+            return self._conn.total_changes - before
+
+    def stats(self) -> Dict:
+        """Hit/miss counters plus current size on disk"""
+        entries, total = 0, 0
+        if self.enabled:
+            with self._lock:
+                entries, total = self._conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"enabled": self.enabled, "hits": self.hits, "misses": self.misses,
+                "entries": entries, "bytes": total}
+
+    def close(self):
+        if self._conn is not None:
+            self.evict()
+            self._conn.close()
+            self._conn = None
+            self.enabled = False
+
+def add_cache_arguments(parser):
+    """Register the --no-cache/--cache-* flags on an argparse parser"""
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the on-disk response cache")
+    parser.add_argument("--cache-path", default=DEFAULT_CACHE_PATH, help="SQLite response cache file")
+    parser.add_argument("--cache-max-entries", type=int, default=DEFAULT_MAX_ENTRIES,
+                        help="Evict least recently used responses beyond this many entries")
+    parser.add_argument("--cache-max-bytes", type=int, default=None,
+                        help="Evict least recently used responses beyond this many bytes")
+    parser.add_argument("--cache-max-age-days", type=float, default=DEFAULT_MAX_AGE_DAYS,
+                        help="Evict cached responses older than this")
+
+def cache_options(args) -> Dict:
+    """ResponseCache keyword arguments from parsed command-line flags"""
+    return {
+        "path": args.cache_path,
+        "max_entries": args.cache_max_entries,
+        "max_bytes": args.cache_max_bytes,
+        "max_age_days": args.cache_max_age_days,
+        "enabled": not args.no_cache
+    }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache(**kwargs) -> ResponseCache:
+    """Return the shared response cache, creating it on first use"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(**kwargs)
+        return _cache
+
+def configure_cache(**kwargs) -> ResponseCache:
+    """Replace the shared response cache (e.g. to disable it for a benchmark)"""
+    global _cache
+    with _cache_lock:
+        if _cache is not None:
+            _cache.close()
+        _cache = ResponseCache(**kwargs)
+        return _cache
+
+def print_cache_stats():
+    """Print cache hit rate for the shared cache"""
+    if _cache is None or not _cache.enabled:
+        return
+    stats = _cache.stats()
+    lookups = stats["hits"] + stats["misses"]
+    rate = stats["hits"] / lookups if lookups else 0.0
+    print(f"🗄️  Response cache: {stats['hits']}/{lookups} hits ({rate:.0%}), "
+          f"{stats['entries']} entries on disk")
+
+class PromptCacheStats:
+    """Tracks how many prompt tokens the provider served from its prefix cache"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hits = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    def record(self, prompt_tokens: int, cached_tokens: int):
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens or 0
+            self.cached_tokens += cached_tokens or 0
+            if cached_tokens:
+                self.hits += 1
+
+prompt_cache_stats = PromptCacheStats()
+
+def print_prompt_cache_stats():
+    """Print provider prefix-cache hits for this run"""
+    stats = prompt_cache_stats
+    if not stats.requests:
+        return
+    share = stats.cached_tokens / stats.prompt_tokens if stats.prompt_tokens else 0.0
+    print(f"🧩 Prompt prefix cache: {stats.hits}/{stats.requests} requests hit, "
+          f"{stats.cached_tokens}/{stats.prompt_tokens} input tokens cached ({share:.0%})")
@@ -0,0 +1,218 @@
+"""
+Per-request LLM metrics
+Every backend call records queue wait, time to response, retries, status codes,
+token usage and model. Records are aggregated per run, per category and per
+model, written as JSON next to the output file and optionally exported in
+Prometheus textfile format.
+"""
+
+import json
+import os
+import statistics
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterable, List
+
+_context = threading.local()
+
+@contextmanager
+def request_context(**tags):
+    """Attach tags (category, post_numbers, queue_wait, ...) to calls made inside"""
+    previous = getattr(_context, "tags", {})
+    _context.tags = {**previous, **tags}
+    try:
+        yield
+    finally:
+        _context.tags = previous
+
+def current_tags() -> Dict:
+    return dict(getattr(_context, "tags", {}))
+
+def status_code_of(error: Exception):
+    """HTTP status code carried by a requests/httpx or provider SDK error, if any"""
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    if status is None:
+        # google.api_core exceptions carry the HTTP status as .code
+        code = getattr(error, "code", None)
+        status = code if isinstance(code, int) else None
+    return status
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100 * len(ordered))) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+def summarize(records: Iterable[Dict]) -> Dict:
+    """Aggregate a group of request records"""
+    records = list(records)
+    network = [r for r in records if not r["cache_hit"]]
+    latencies = [r["time_to_response"] for r in network]
+    waits = [r["queue_wait"] for r in records if r["queue_wait"] is not None]
+    statuses = Counter(str(code) for r in network for code in r["status_codes"])
+
+    return {
+        "requests": len(records),
+        "ok": sum(1 for r in network if r["ok"]),
+        "failed": sum(1 for r in network if not r["ok"]),
+        "cache_hits": len(records) - len(network),
+        "retries": sum(r["retries"] for r in network),
+        "status_codes": dict(sorted(statuses.items())),
+        "prompt_tokens": sum(r["prompt_tokens"] for r in network),
+        "completion_tokens": sum(r["completion_tokens"] for r in network),
+        "cached_tokens": sum(r["cached_tokens"] for r in network),
+        "time_to_response": {
+            "mean": round(statistics.fmean(latencies), 4) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50), 4),
+            "p95": round(percentile(latencies, 95), 4),
+            "max": round(max(latencies), 4) if latencies else 0.0,
+            "sum": round(sum(latencies), 4)
+        },
+        "queue_wait": {
+            "p50": round(percentile(waits, 50), 4),
+            "p95": round(percentile(waits, 95), 4),
+            "max": round(max(waits), 4) if waits else 0.0,
+            "sum": round(sum(waits), 4)
+        },
+        "rate_limit_wait": round(sum(r["rate_limit_wait"] for r in network), 4)
+    }
+
+def _label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class MetricsRecorder:
+    """Thread-safe collector of per-request records for one run"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.records = []
+        self.started_at = time.time()
+
+    def reset(self):
+        with self._lock:
+            self.records = []
+            self.started_at = time.time()
+
+    def record(self, **fields):
+        """Store one request; tags from request_context() fill in missing fields"""
+        entry = {
+            "category": None,
+            "post_numbers": [],
+            "backend": None,
+            "model": None,
+            "queue_wait": None,
+            "rate_limit_wait": 0.0,
+            "time_to_response": 0.0,
+            "retries": 0,
+            "status_codes": [],
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "cached_tokens": 0,
+            "cache_hit": False,
+            "ok": True,
+            "error": None
+        }
+        entry.update(current_tags())
+        entry.update(fields)
+        with self._lock:
+            self.records.append(entry)
+
+    def snapshot(self) -> List[Dict]:
+        with self._lock:
+            return list(self.records)
+
+    def summary(self) -> Dict:
+        """Aggregates for the whole run, per category and per model"""
+        records = self.snapshot()
+        by_category, by_model = {}, {}
+        for r in records:
+            by_category.setdefault(r["category"] or "uncategorized", []).append(r)
+            by_model.setdefault(r["model"] or "unknown", []).append(r)
+
+        return {
+            "started_at": self.started_at,
+            "wall_seconds": round(time.time() - self.started_at, 3),
+            "run": summarize(records),
+            "by_category": {name: summarize(group) for name, group in sorted(by_category.items())},
+            "by_model": {name: summarize(group) for name, group in sorted(by_model.items())}
+        }
+
+    def write_json(self, path: str):
+        """Write the summary plus every raw record"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"summary": self.summary(), "requests": self.snapshot()}, f, indent=2, ensure_ascii=False)
+
+    def write_prometheus(self, path: str, prefix: str = "modelit_llm"):
+        """Write a node_exporter textfile-collector file (atomically)"""
+        summary = self.summary()
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+
+        def sample(name: str, labels: Dict, value):
+            rendered = ",".join(f'{k}="{_label_value(v)}"' for k, v in labels.items())
+            lines.append(f"{prefix}_{name}{{{rendered}}} {value}")
+
+        categories = summary["by_category"].items()
+
+        metric("requests_total", "counter", "LLM requests by category and outcome")
+        for category, stats in categories:
+            for outcome in ("ok", "failed", "cache_hits"):
+                sample("requests_total", {"category": category, "outcome": outcome}, stats[outcome])
+
+        metric("retries_total", "counter", "Retried LLM attempts by category")
+        for category, stats in categories:
+            sample("retries_total", {"category": category}, stats["retries"])
+
+        metric("tokens_total", "counter", "Tokens by category and kind")
+        for category, stats in categories:
+            for kind in ("prompt", "completion", "cached"):
+                sample("tokens_total", {"category": category, "kind": kind}, stats[f"{kind}_tokens"])
+
+        metric("responses_total", "counter", "HTTP status codes seen, by model")
+        for model, stats in summary["by_model"].items():
+            for code, count in stats["status_codes"].items():
+                sample("responses_total", {"model": model, "code": code}, count)
+
+        for name, key, help_text in (
+            ("request_duration_seconds", "time_to_response", "Time to response per LLM request, retries included"),
+            ("queue_wait_seconds", "queue_wait", "Time a post waited for a worker before its request started"),
+        ):
+            metric(name, "summary", help_text)
+            for category, stats in categories:
+                for quantile in ("p50", "p95"):
+                    sample(name, {"category": category, "quantile": f"0.{quantile[1:]}"}, stats[key][quantile])
+                sample(f"{name}_sum", {"category": category}, stats[key]["sum"])
+                sample(f"{name}_count", {"category": category}, stats["requests"])
+
+        metric("run_wall_seconds", "gauge", "Wall time of the generation run")
+        lines.append(f"{prefix}_run_wall_seconds {summary['wall_seconds']}")
+
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp_path, path)
+
+metrics = MetricsRecorder()
+
+def metrics_path(output_file: str) -> str:
+    """Metrics file that sits next to an output file"""
+    root, _ = os.path.splitext(output_file)
+    return f"{root}.metrics.json"
+
+def print_metrics_summary(recorder: MetricsRecorder = metrics):
+    """Print the headline numbers for a run"""
+    run = recorder.summary()["run"]
+    if not run["requests"]:
+        return
+    latency = run["time_to_response"]
+    print(f"⏱️  Requests: {run['requests']} ({run['cache_hits']} cached, {run['failed']} failed, "
+          f"{run['retries']} retries) | p50 {latency['p50']:.2f}s p95 {latency['p95']:.2f}s | "
+          f"tokens in/out {run['prompt_tokens']}/{run['completion_tokens']}")
@@ -0,0 +1,310 @@
+"""
+Resumable parallel upload of post images to Google Drive
+Each image goes up as a Drive resumable upload: one POST opens a session
+and returns its URI, then the file is PUT in fixed-size chunks, each
+answered 308 with the range received so far. A dropped connection or a 5xx
+only costs the chunk in flight - the uploader asks the session how much
+arrived and carries on from there. Session URIs are saved as soon as they
+are opened, so even a killed run resumes its half-finished files.
+
+Uploads run over a small thread pool. Files are tracked by content hash
+(from the image catalog, see image_catalog.py) in <posts>.media.json, so
+an image already uploaded is never sent again and two posts with the same
+image share one file. upload_posts_to_sheets.py --media runs this next to
+the Sheets upload and writes the links into column K.
+
+Usage:
+    python media_upload.py modelit_x_posts.json
+    MEDIA_UPLOAD_URL=http://127.0.0.1:8090/upload/drive/v3/files python media_upload.py   # mock_storage_server.py
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from build_graph import load_manifest, manifest_path
+from generate_images import DEFAULT_IMAGES_DIR
+from image_catalog import ImageCatalog, catalog_path
+from rate_limiter import AdaptiveRateLimiter
+
+DRIVE_UPLOAD_URL = "https://www.googleapis.com/upload/drive/v3/files"
+MEDIA_UPLOAD_URL = os.getenv("MEDIA_UPLOAD_URL", DRIVE_UPLOAD_URL)
+DRIVE_SCOPE = "https://www.googleapis.com/auth/drive.file"  # only files this app created
+CHUNK_ALIGN = 256 * 1024  # every chunk but the last must be a multiple of this
+DEFAULT_CHUNK_SIZE = 4 * CHUNK_ALIGN
+DEFAULT_WORKERS = 4
+UPLOAD_ATTEMPTS = 5  # failed requests in a row before a file is given up on
+UPLOAD_TIMEOUT = 60
+MIME_TYPES = {"png": "image/png", "jpeg": "image/jpeg"}
+
+def file_url(file_id: str) -> str:
+    return f"https://drive.google.com/file/d/{file_id}/view"
+
+def media_state_path(posts_file: str) -> str:
+    """Where uploaded files are remembered for a post store"""
+    return os.path.splitext(posts_file)[0] + ".media.json"
+
+def load_media_state(path: str) -> Dict:
+    if not os.path.exists(path):
+        return {"files": {}, "sessions": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_media_state(path: str, state: Dict):
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(temp_path, path)
+
+def media_session(creds=None, pool_size: int = DEFAULT_WORKERS):
+    """requests session for uploads, authorized (and refreshed) with creds when given"""
+    import requests
+
+    if creds is not None:
+        from google.auth.transport.requests import AuthorizedSession
+        session = AuthorizedSession(creds)
+    else:
+        session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def _received(response) -> int:
+    """Bytes the server holds, from a 308's Range header (absent when nothing arrived)"""
+    match = re.match(r"bytes=0-(\d+)", response.headers.get("Range", ""))
+    return int(match.group(1)) + 1 if match else 0
+
+class ResumableUploader:
+    """Chunked Drive resumable uploads over one shared session"""
+
+    def __init__(self, session, upload_url: str = MEDIA_UPLOAD_URL, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 folder_id: str = None, limiter: AdaptiveRateLimiter = None, timeout: float = UPLOAD_TIMEOUT):
+        import requests
+
+        if chunk_size <= 0 or chunk_size % CHUNK_ALIGN:
+            raise ValueError(f"chunk_size must be a multiple of {CHUNK_ALIGN} bytes")
+        self.session = session
+        self.upload_url = upload_url
+        self.chunk_size = chunk_size
+        self.folder_id = folder_id
+        self.limiter = limiter or AdaptiveRateLimiter(rate=None)
+        self.timeout = timeout
+        self._errors = (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError,
+                        requests.exceptions.Timeout)
+        self._lock = threading.Lock()
+        self.chunks = 0
+        self.resumed = 0
+
+    def open_session(self, name: str, size: int, mime_type: str) -> str:
+        """Start a resumable upload; returns the session URI"""
+        metadata = {"name": name}
+        if self.folder_id:
+            metadata["parents"] = [self.folder_id]
+        self.limiter.acquire()
+        response = self.session.post(f"{self.upload_url}?uploadType=resumable", json=metadata, timeout=self.timeout,
+                                     headers={"X-Upload-Content-Type": mime_type, "X-Upload-Content-Length": str(size)})
+        response.raise_for_status()
+        return response.headers["Location"]
+
+    def upload(self, path: str, mime_type: str, session_uri: str = None,
+               on_session: Callable[[str], None] = None) -> Dict:
+        """Upload a file, resuming session_uri if given; returns the server's file resource
+
+        on_session(uri) is called whenever a new session is opened, so the
+        caller can save it and resume after a crash.
+        """
+        size = os.path.getsize(path)
+        resume = session_uri is not None
+        failures = 0
+        with open(path, "rb") as f:
+            while True:
+                if session_uri is None:
+                    session_uri = self.open_session(os.path.basename(path), size, mime_type)
+                    if on_session:
+                        on_session(session_uri)
+                try:
+                    if resume:
+                        # Ask how much of the file the session already has
+                        response = self.session.put(session_uri, data=b"", timeout=self.timeout,
+                                                    headers={"Content-Range": f"bytes */{size}"})
+                    else:
+                        offset = f.tell()
+                        chunk = f.read(self.chunk_size)
+                        self.limiter.acquire()
+                        response = self.session.put(session_uri, data=chunk, timeout=self.timeout, headers={
+                            "Content-Range": f"bytes {offset}-{offset + len(chunk) - 1}/{size}"})
+                        with self._lock:
+                            self.chunks += 1
+                except self._errors:
+                    failures += 1
+                    if failures >= UPLOAD_ATTEMPTS:
+                        raise
+                    with self._lock:
+                        self.resumed += 1
+                    time.sleep(self.limiter.backoff(failures))
+                    resume = True
+                    continue
+
+                status = response.status_code
+                if status in (200, 201):
+                    self.limiter.on_success(response.headers)
+                    return response.json()
+                if status == 308:
+                    f.seek(_received(response))
+                    resume = False
+                    failures = 0
+                    continue
+                if status in (404, 410):
+                    failures += 1
+                    if failures >= UPLOAD_ATTEMPTS:
+                        response.raise_for_status()
+                    session_uri = None  # the session expired; start the file over
+                    f.seek(0)
+                    resume = False
+                    continue
+                if status == 429 or status >= 500:
+                    delay = self.limiter.on_error(status, response.headers, failures)
+                    failures += 1
+                    if failures >= UPLOAD_ATTEMPTS:
+                        response.raise_for_status()
+                    time.sleep(delay)
+                    resume = True
+                    continue
+                response.raise_for_status()
+                raise ValueError(f"Unexpected upload response {status}")
+
+class MediaStage:
+    """Background pool of image uploads, skipping content uploaded before
+
+    submit() images while the sheet is being read or written; finish()
+    waits and returns {post_number: link}, with None for posts whose
+    upload failed. Finished files and open sessions are saved to
+    state_path as they happen.
+    """
+
+    def __init__(self, session, state_path: str, workers: int = DEFAULT_WORKERS,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, upload_url: str = MEDIA_UPLOAD_URL, folder_id: str = None):
+        self.state_path = state_path
+        self.state = load_media_state(state_path)
+        self.uploader = ResumableUploader(session, upload_url, chunk_size, folder_id)
+        self._executor = ThreadPoolExecutor(max_workers=max(workers, 1))
+        self._lock = threading.Lock()
+        self._futures = {}
+        self._by_hash = {}
+        self.links: Dict[int, Optional[str]] = {}
+        self.failed: Dict[int, str] = {}
+        self.skipped = 0
+        self.uploaded_bytes = 0
+        self._started = time.perf_counter()
+
+    @property
+    def queued(self) -> int:
+        """Distinct files being uploaded"""
+        return len(self._futures)
+
+    def submit(self, post_number: int, path: str, sha256: str, mime_type: str):
+        known = self.state["files"].get(sha256)
+        if known:
+            self.links[post_number] = known["url"]
+            self.skipped += 1
+            return
+        future = self._by_hash.get(sha256)
+        if future is None:
+            future = self._by_hash[sha256] = self._executor.submit(self._upload, path, sha256, mime_type)
+            self._futures[future] = []
+        self._futures[future].append(post_number)
+
+    def _save(self):
+        save_media_state(self.state_path, self.state)
+
+    def _upload(self, path: str, sha256: str, mime_type: str) -> Dict:
+        def remember(session_uri: str):
+            with self._lock:
+                self.state["sessions"][sha256] = session_uri
+                self._save()
+
+        resource = self.uploader.upload(path, mime_type, self.state["sessions"].get(sha256), remember)
+        entry = {"id": resource["id"], "url": file_url(resource["id"]), "name": os.path.basename(path),
+                 "bytes": os.path.getsize(path), "uploaded_at": datetime.now().isoformat(timespec="seconds")}
+        with self._lock:
+            self.state["files"][sha256] = entry
+            self.state["sessions"].pop(sha256, None)
+            self.uploaded_bytes += entry["bytes"]
+            self._save()
+        return entry
+
+    def finish(self) -> Dict[int, Optional[str]]:
+        """Wait for every upload; returns {post_number: link or None if it failed}"""
+        try:
+            for future in as_completed(self._futures):
+                post_numbers = self._futures[future]
+                try:
+                    url = future.result()["url"]
+                except Exception as e:
+                    for post_num in post_numbers:
+                        self.links[post_num] = None
+                        self.failed[post_num] = str(e)
+                    print(f"  ❌ Image upload for post {', '.join(map(str, post_numbers))}: {e}")
+                    continue
+                for post_num in post_numbers:
+                    self.links[post_num] = url
+        finally:
+            self._executor.shutdown()
+
+        elapsed = time.perf_counter() - self._started
+        uploaded = self.queued - len({future for future in self._futures if future.exception()})
+        resumed = f", {self.uploader.resumed} chunks resumed" if self.uploader.resumed else ""
+        print(f"🖼️  {uploaded} images uploaded ({self.uploaded_bytes / 1e6:.1f} MB in {elapsed:.1f}s), "
+              f"{self.skipped} already uploaded, {len(self.failed)} failed{resumed}")
+        return dict(self.links)
+
+def catalog_images(images_dir: str = DEFAULT_IMAGES_DIR) -> List[Dict]:
+    """Catalog rows (path, sha256, format, ...) for every post image, refreshing the catalog first"""
+    catalog = ImageCatalog(catalog_path(images_dir))
+    try:
+        catalog.refresh_images(images_dir, load_manifest(manifest_path(images_dir)))
+        return catalog.images()
+    finally:
+        catalog.close()
+
+def start_media_upload(session, posts_file: str, images_dir: str = DEFAULT_IMAGES_DIR,
+                       workers: int = DEFAULT_WORKERS, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                       upload_url: str = MEDIA_UPLOAD_URL, folder_id: str = None) -> MediaStage:
+    """Submit every post image for upload and return the running stage"""
+    stage = MediaStage(session, media_state_path(posts_file), workers, chunk_size, upload_url, folder_id)
+    for image in catalog_images(images_dir):
+        stage.submit(image["post_number"], image["file"], image["sha256"],
+                     MIME_TYPES.get(image["format"], "application/octet-stream"))
+    print(f"📤 Uploading images from {images_dir} to {upload_url} ({stage.queued} new, "
+          f"{stage.skipped} already uploaded)")
+    return stage
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Upload post images with resumable chunked uploads")
+    parser.add_argument("posts_file", nargs="?", default="modelit_x_posts.json",
+                        help="Post store the uploads are remembered for")
+    parser.add_argument("--images-dir", default=DEFAULT_IMAGES_DIR)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Upload threads (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"Bytes per request, a multiple of {CHUNK_ALIGN} (default: {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument("--upload-url", default=MEDIA_UPLOAD_URL, help="Resumable upload endpoint")
+    parser.add_argument("--folder-id", default=None, help="Drive folder to upload into")
+    options = parser.parse_args()
+
+    creds = None
+    if options.upload_url == DRIVE_UPLOAD_URL:
+        from upload_posts_to_sheets import get_credentials
+        creds = get_credentials([DRIVE_SCOPE])
+    stage = start_media_upload(media_session(creds, options.workers), options.posts_file, options.images_dir,
+                               options.workers, options.chunk_size, options.upload_url, options.folder_id)
+    links = stage.finish()
+    print(f"💾 Links for {sum(1 for url in links.values() if url)} posts in {stage.state_path}")
@@ -0,0 +1,344 @@
+"""
+Offline stand-in for the OpenRouter chat completions API
+Serves the /api/v1/chat/completions shape the OpenRouter backend expects, with
+configurable latency, error rate, 429 injection and an optional enforced
+quota (with OpenRouter-style X-RateLimit-* headers), so generation
+throughput can be measured without spending API credits.
+
+Requests with "modalities": ["image", ...] get a generated PNG back, as a
+base64 data URL like OpenRouter's or (--image-urls) as a link to download
+from this server, with Range support. --image-failure-rate answers some of
+them with text only ("No images in response"); --drop-rate cuts some
+downloads off halfway, to exercise resumed downloads.
+
+Usage:
+    python mock_openrouter_server.py --port 8089 --latency lognormal:0.6,0.4 --rate-limit-rate 0.05
+    python mock_openrouter_server.py --port 8089 --quota 20/10   # 20 requests per 10 s window
+    OPENROUTER_URL=http://127.0.0.1:8089/api/v1/chat/completions python generate_modelit_x_posts.py test 5
+    python mock_openrouter_server.py --port 8089 --image-size 1024 --image-failure-rate 0.05
+"""
+
+import base64
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict
+
+COMPLETIONS_PATH = "/api/v1/chat/completions"
+IMAGES_PATH = "/images/"
+
+SENTENCES = [
+    "Imagine your students building a live model of a food web in minutes.",
+    "Watch abstract ideas click as learners drag, connect and test their own systems.",
+    "ModelIt K12 turns any NGSS lesson into an interactive modeling lab.",
+    "Try a free ready-to-use model in class tomorrow and see the questions start flowing.",
+    "Students explain cause and effect better when they can see it move.",
+    "Discover how quick it is to launch a systems thinking activity your whole class will love.",
+]
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Build a latency sampler (seconds) from a spec string
+
+    fixed:S            always S seconds
+    uniform:A,B        uniformly between A and B
+    lognormal:M,SIGMA  log-normal with median M (heavy right tail)
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        import math
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1])
+    raise ValueError(f"Unknown latency spec {spec!r} (use fixed:S, uniform:A,B or lognormal:M,SIGMA)")
+
+def make_png(seed: str, size: int) -> bytes:
+    """Deterministic size x size RGB noise PNG (noise keeps it about as large as a real image)"""
+    rng = random.Random(seed)
+    rows = b"".join(b"\x00" + rng.randbytes(size * 3) for _ in range(size))
+
+    def chunk(kind: bytes, body: bytes) -> bytes:
+        return len(body).to_bytes(4, "big") + kind + body + zlib.crc32(kind + body).to_bytes(4, "big")
+
+    header = size.to_bytes(4, "big") * 2 + bytes([8, 2, 0, 0, 0])
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(rows, 1))
+            + chunk(b"IEND", b""))
+
+def parse_quota(spec: str):
+    """'20/10' -> (20 requests, 10.0 second window)"""
+    limit, _, window = spec.partition("/")
+    return int(limit), float(window or 60)
+
+class MockOpenRouterServer:
+    """Threaded local HTTP server that imitates OpenRouter chat completions"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: str = "fixed:0.05",
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, retry_after: float = 1.0,
+                 seed: int = 0, quota: str = None, image_size: int = 256, image_failure_rate: float = 0.0,
+                 image_urls: bool = False, drop_rate: float = 0.0):
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.quota = parse_quota(quota) if quota else None
+        self.image_size = image_size
+        self.image_failure_rate = image_failure_rate
+        self.image_urls = image_urls
+        self.drop_rate = drop_rate
+        self._images = {}
+        self._window_reset = 0.0
+        self._window_used = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = {"requests": 0, "ok": 0, "errors": 0, "rate_limited": 0, "images": 0, "no_image": 0,
+                       "downloads": 0, "dropped": 0}
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.path != COMPLETIONS_PATH:
+                    self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+                    return
+                status, payload, headers = server.handle_completion(json.loads(body or b"{}"))
+                self._send(status, payload, headers)
+
+            def do_GET(self):
+                data = server._images.get(self.path[len(IMAGES_PATH):]) if self.path.startswith(IMAGES_PATH) else None
+                if data is None:
+                    self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+                    return
+                server._count("downloads")
+                start = 0
+                match = re.match(r"bytes=(\d+)-$", self.headers.get("Range", ""))
+                if match:
+                    start = int(match.group(1))
+                    if start >= len(data):
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{len(data)}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                self.send_response(206 if match else 200)
+                self.send_header("Content-Type", "image/png")
+                self.send_header("Content-Length", str(len(data) - start))
+                if match:
+                    self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+                self.end_headers()
+                body = data[start:]
+                if server._roll() < server.drop_rate:
+                    server._count("dropped")
+                    self.wfile.write(body[:len(body) // 2])
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+            def _send(self, status: int, payload: Dict, headers: Dict = None):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}{COMPLETIONS_PATH}"
+
+    def _draw(self):
+        with self._lock:
+            self.counts["requests"] += 1
+            return self.sample_latency(self._rng), self._rng.random(), self.counts["requests"]
+
+    def _roll(self) -> float:
+        with self._lock:
+            return self._rng.random()
+
+    def _count(self, key: str):
+        with self._lock:
+            self.counts[key] += 1
+
+    def _take_quota(self):
+        """Count a request against the fixed quota window -> (allowed, headers)"""
+        if not self.quota:
+            return True, {}
+        limit, window = self.quota
+        with self._lock:
+            now = time.time()
+            if now >= self._window_reset:
+                self._window_reset = now + window
+                self._window_used = 0
+            self._window_used += 1
+            remaining = limit - self._window_used
+            headers = {
+                "X-RateLimit-Limit": str(limit),
+                "X-RateLimit-Remaining": str(max(remaining, 0)),
+                "X-RateLimit-Reset": str(int(self._window_reset * 1000))
+            }
+            if remaining < 0:
+                headers["Retry-After"] = f"{self._window_reset - now:.2f}"
+            return remaining >= 0, headers
+
+    def handle_completion(self, request: Dict):
+        """Return (status, body, headers) for one chat completion request"""
+        allowed, quota_headers = self._take_quota()
+        latency, roll, request_id = self._draw()
+        if not allowed:
+            self._count("rate_limited")
+            return 429, {"error": {"code": 429, "message": "Rate limit exceeded (mock quota)"}}, quota_headers
+        time.sleep(max(latency, 0.0))
+
+        if roll < self.rate_limit_rate:
+            self._count("rate_limited")
+            return 429, {"error": {"code": 429, "message": "Rate limit exceeded (mock)"}}, \
+                {**quota_headers, "Retry-After": str(self.retry_after)}
+        if roll < self.rate_limit_rate + self.error_rate:
+            self._count("errors")
+            return 500, {"error": {"code": 500, "message": "Internal error (mock)"}}, quota_headers
+
+        prompt = self._prompt_text(request)
+        if "image" in request.get("modalities", []):
+            return 200, self._image_completion(prompt, request, request_id), quota_headers
+        content = self._content(prompt, request)
+        prompt_tokens = max(len(prompt) // 4, 1)
+        self._count("ok")
+        return 200, {
+            "id": f"gen-mock-{request_id}",
+            "object": "chat.completion",
+            "model": request.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content}
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": max(len(content) // 4, 1),
+                "total_tokens": prompt_tokens + max(len(content) // 4, 1),
+                "prompt_tokens_details": {"cached_tokens": 0}
+            }
+        }, quota_headers
+
+    def _image_completion(self, prompt: str, request: Dict, request_id: int) -> Dict:
+        message = {"role": "assistant", "content": "Here is your image."}
+        if self._roll() < self.image_failure_rate:
+            self._count("no_image")
+            message["content"] = "I can't generate that image right now."
+        else:
+            self._count("images")
+            data = make_png(prompt, self.image_size)
+            if self.image_urls:
+                name = f"{request_id}.png"
+                with self._lock:
+                    self._images[name] = data
+                host, port = self._httpd.server_address[:2]
+                url = f"http://{host}:{port}{IMAGES_PATH}{name}"
+            else:
+                url = "data:image/png;base64," + base64.b64encode(data).decode("ascii")
+            message["images"] = [{"type": "image_url", "image_url": {"url": url}}]
+        self._count("ok")
+        return {
+            "id": f"gen-mock-{request_id}",
+            "object": "chat.completion",
+            "model": request.get("model", "mock"),
+            "choices": [{"index": 0, "finish_reason": "stop", "message": message}]
+        }
+
+    @staticmethod
+    def _prompt_text(request: Dict) -> str:
+        parts = []
+        for message in request.get("messages", []):
+            content = message.get("content", "")
+            if isinstance(content, list):
+                parts.extend(part.get("text", "") for part in content)
+            else:
+                parts.append(content)
+        return "".join(parts)
+
+    @staticmethod
+    def _post_text(seed: str) -> str:
+        digest = hashlib.sha256(seed.encode("utf-8")).digest()
+        first = SENTENCES[digest[0] % len(SENTENCES)]
+        second = SENTENCES[(digest[0] + 1 + digest[1] % (len(SENTENCES) - 1)) % len(SENTENCES)]
+        return f"{first} {second}"
+
+    def _content(self, prompt: str, request: Dict) -> str:
+        if request.get("response_format"):
+            match = re.search(r"Generate (\d+) different posts", prompt)
+            count = int(match.group(1)) if match else 1
+            return json.dumps({"posts": [self._post_text(f"{prompt}#{i}") for i in range(count)]})
+        return self._post_text(prompt)
+
+    def start(self) -> "MockOpenRouterServer":
+        """Serve in a background thread"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Serve in the calling thread"""
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local mock of the OpenRouter chat completions API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", default="lognormal:0.6,0.4",
+                        help="fixed:S | uniform:A,B | lognormal:MEDIAN,SIGMA (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--quota", default=None,
+                        help="Enforce LIMIT/WINDOW_SECONDS (e.g. 20/10) with X-RateLimit-* headers and 429s")
+    parser.add_argument("--image-size", type=int, default=256, help="Side of generated PNGs in pixels")
+    parser.add_argument("--image-failure-rate", type=float, default=0.0,
+                        help="Fraction of image requests answered without an image")
+    parser.add_argument("--image-urls", action="store_true",
+                        help="Return images as download links instead of base64 data URLs")
+    parser.add_argument("--drop-rate", type=float, default=0.0,
+                        help="Fraction of image downloads cut off halfway")
+    options = parser.parse_args()
+
+    mock = MockOpenRouterServer(options.host, options.port, options.latency, options.error_rate,
+                                options.rate_limit_rate, options.retry_after, options.seed, options.quota,
+                                options.image_size, options.image_failure_rate, options.image_urls, options.drop_rate)
+    print(f"🧪 Mock OpenRouter listening on {mock.url}")
+    try:
+        mock.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n📊 {mock.counts}")
@@ -0,0 +1,223 @@
+"""
+Offline stand-in for Google Drive resumable uploads
+Speaks the part of the Drive v3 upload protocol media_upload.py uses:
+
+- POST /upload/drive/v3/files?uploadType=resumable with the file's JSON
+  metadata and X-Upload-Content-Length opens a session and answers with its
+  URI in the Location header
+- PUT <session URI> with Content-Range: bytes A-B/TOTAL stores a chunk and
+  answers 308 with Range: bytes=0-N, or 200 with the file once the last
+  byte is in
+- PUT <session URI> with Content-Range: bytes */TOTAL asks how much was
+  received, which is how an interrupted upload resumes
+
+--drop-rate cuts some chunks off halfway, keeping only what "arrived", and
+--error-rate answers some chunks with 503, to exercise resumed uploads.
+Uploaded files can be read back from /download/drive/v3/files/<id>.
+
+Usage:
+    python mock_storage_server.py --port 8090 --drop-rate 0.2
+    MEDIA_UPLOAD_URL=http://127.0.0.1:8090/upload/drive/v3/files python media_upload.py
+"""
+
+import hashlib
+import json
+import random
+import re
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+from urllib.parse import parse_qs, urlparse
+
+UPLOAD_PATH = "/upload/drive/v3/files"
+DOWNLOAD_PATH = "/download/drive/v3/files/"
+
+class MockStorageServer:
+    """Threaded local HTTP server that imitates Drive resumable uploads"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, drop_rate: float = 0.0, error_rate: float = 0.0,
+                 seed: int = 0):
+        self.drop_rate = drop_rate
+        self.error_rate = error_rate
+        self.sessions: Dict[str, Dict] = {}
+        self.files: Dict[str, Dict] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = {"sessions": 0, "chunks": 0, "status_queries": 0, "files": 0, "bytes": 0, "dropped": 0,
+                       "errors": 0}
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                url = urlparse(self.path)
+                if url.path != UPLOAD_PATH or parse_qs(url.query).get("uploadType") != ["resumable"]:
+                    self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+                    return
+                size = self.headers.get("X-Upload-Content-Length")
+                upload_id = server.open_session(json.loads(body or b"{}"), int(size) if size else None,
+                                                self.headers.get("X-Upload-Content-Type"))
+                host, port = self.server.server_address[:2]
+                self._send(200, {}, {"Location": f"http://{host}:{port}{UPLOAD_PATH}?uploadType=resumable"
+                                                 f"&upload_id={upload_id}"})
+
+            def do_PUT(self):
+                length = int(self.headers.get("Content-Length", 0))
+                upload_id = (parse_qs(urlparse(self.path).query).get("upload_id") or [None])[0]
+                session = server.sessions.get(upload_id)
+                if session is None:
+                    self.rfile.read(length)
+                    self._send(404, {"error": {"message": "upload session not found"}})
+                    return
+                content_range = self.headers.get("Content-Range", "")
+                query = re.match(r"bytes \*/(\d+|\*)$", content_range)
+                chunk = re.match(r"bytes (\d+)-(\d+)/(\d+|\*)$", content_range)
+                if query:
+                    server._count("status_queries")
+                    self._progress(session)
+                    return
+                if not chunk or int(chunk.group(2)) - int(chunk.group(1)) + 1 != length:
+                    self.rfile.read(length)
+                    self._send(400, {"error": {"message": f"bad Content-Range {content_range!r}"}})
+                    return
+
+                server._count("chunks")
+                roll = server._roll()
+                if roll < server.error_rate:
+                    self.rfile.read(length)
+                    server._count("errors")
+                    self._send(503, {"error": {"message": "backend error"}})
+                    return
+                if roll < server.error_rate + server.drop_rate:
+                    # Half the chunk arrives, then the connection is lost
+                    server.receive(session, int(chunk.group(1)), self.rfile.read(length // 2))
+                    server._count("dropped")
+                    self.close_connection = True
+                    return
+                data = self.rfile.read(length)
+                server.receive(session, int(chunk.group(1)), data)
+                if chunk.group(3) != "*":
+                    session["size"] = int(chunk.group(3))
+                if session["size"] is not None and len(session["data"]) >= session["size"]:
+                    self._send(200, server.finish(upload_id))
+                else:
+                    self._progress(session)
+
+            def do_GET(self):
+                entry = server.files.get(self.path[len(DOWNLOAD_PATH):]) if self.path.startswith(DOWNLOAD_PATH) else None
+                if entry is None:
+                    self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", entry["mimeType"])
+                self.send_header("Content-Length", str(len(entry["data"])))
+                self.end_headers()
+                self.wfile.write(entry["data"])
+
+            def _progress(self, session: Dict):
+                """308 Resume Incomplete, with the received range if any"""
+                received = len(session["data"])
+                self.send_response(308)
+                if received:
+                    self.send_header("Range", f"bytes=0-{received - 1}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def _send(self, status: int, payload: Dict, headers: Dict = None):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}{UPLOAD_PATH}"
+
+    def _roll(self) -> float:
+        with self._lock:
+            return self._rng.random()
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self.counts[key] += amount
+
+    def open_session(self, metadata: Dict, size: int = None, mime_type: str = None) -> str:
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self.sessions[upload_id] = {"metadata": metadata, "size": size, "data": bytearray(),
+                                        "mimeType": mime_type or "application/octet-stream"}
+            self.counts["sessions"] += 1
+        return upload_id
+
+    def receive(self, session: Dict, offset: int, data: bytes):
+        """Keep the part of data that continues what was already received"""
+        with self._lock:
+            received = len(session["data"])
+            if offset <= received < offset + len(data):
+                session["data"] += data[received - offset:]
+
+    def finish(self, upload_id: str) -> Dict:
+        with self._lock:
+            session = self.sessions.pop(upload_id)
+            file_id = uuid.uuid4().hex[:20]
+            data = bytes(session["data"][:session["size"]])
+            self.files[file_id] = {"data": data, "mimeType": session["mimeType"],
+                                   "name": session["metadata"].get("name"), "sha256": hashlib.sha256(data).hexdigest()}
+            self.counts["files"] += 1
+            self.counts["bytes"] += len(data)
+        return {"kind": "drive#file", "id": file_id, "name": session["metadata"].get("name"),
+                "mimeType": session["mimeType"]}
+
+    def start(self) -> "MockStorageServer":
+        """Serve in a background thread"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Serve in the calling thread"""
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local mock of Google Drive resumable uploads")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Fraction of chunks cut off halfway")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of chunks answered with 503")
+    parser.add_argument("--seed", type=int, default=0)
+    options = parser.parse_args()
+
+    mock = MockStorageServer(options.host, options.port, options.drop_rate, options.error_rate, options.seed)
+    print(f"🧪 Mock storage listening on {mock.url}")
+    try:
+        mock.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n📊 {mock.counts}")
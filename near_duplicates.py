@@ -0,0 +1,190 @@
+"""
+Near-duplicate detection for post text
+MinHash signatures over character shingles, bucketed with LSH banding, so
+each new post is only compared with the handful of posts that share a band
+instead of every post ever written. Candidates are confirmed with the exact
+Jaccard similarity of their shingle sets. Signatures are computed with
+NumPy when it is installed (same values, much faster for large archives).
+
+Usage:
+    python near_duplicates.py modelit_x_posts.json
+    python near_duplicates.py modelit_x_posts.json archive/*.jsonl --threshold 0.4
+"""
+
+import hashlib
+import random
+import re
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from post_store import iter_posts
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+DEFAULT_THRESHOLD = 0.5
+_PRIME = (1 << 31) - 1  # a * hash + b stays below 2**63 for 32-bit shingle hashes
+
+def shingles(text: str, size: int = 5) -> Set[str]:
+    """Character shingles of the lower-cased, whitespace-normalised text"""
+    text = " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def choose_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """Pick (bands, rows) so pairs a little below the threshold still collide
+
+    The LSH S-curve crosses 50% near (1/bands) ** (1/rows); aiming it at 75%
+    of the threshold keeps recall high, and exact Jaccard on the candidates
+    removes the extra false positives.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if (1 / bands) ** (1 / rows) <= threshold * 0.75:
+            best = (bands, rows)
+    return best
+
+class MinHasher:
+    """num_perm universal hash functions applied to 32-bit shingle hashes"""
+
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        rng = random.Random(seed)
+        self.params = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+        if numpy is not None:
+            self._a = numpy.array([a for a, _ in self.params], dtype=numpy.uint64)[:, None]
+            self._b = numpy.array([b for _, b in self.params], dtype=numpy.uint64)[:, None]
+
+    def signature(self, shingle_set: Set[str]) -> Tuple[int, ...]:
+        hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "big")
+                  for s in shingle_set]
+        if numpy is not None:
+            values = numpy.array(hashes, dtype=numpy.uint64)[None, :]
+            return tuple(((self._a * values + self._b) % _PRIME).min(axis=1).tolist())
+        return tuple(min([(a * h + b) % _PRIME for h in hashes]) for a, b in self.params)
+
+class NearDuplicateIndex:
+    """Incremental MinHash/LSH index over post texts
+
+    Keys are whatever identifies a post (a post_number, or "path#n" for
+    archived posts).
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, num_perm: int = 128, shingle_size: int = 5):
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.hasher = MinHasher(num_perm)
+        self.bands, self.rows = choose_bands(threshold, num_perm)
+        self._buckets: List[Dict[Tuple[int, ...], Set[Hashable]]] = [{} for _ in range(self.bands)]
+        self._entries: Dict[Hashable, Tuple[str, Set[str], Tuple[int, ...]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def _band_keys(self, signature: Tuple[int, ...]):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows]
+
+    def text(self, key: Hashable) -> str:
+        return self._entries[key][0]
+
+    def query(self, text: str, exclude: Optional[Hashable] = None) -> List[Tuple[Hashable, float]]:
+        """Indexed posts at or above the threshold, most similar first"""
+        shingle_set = shingles(text, self.shingle_size)
+        signature = self.hasher.signature(shingle_set)
+        return self._matches(shingle_set, signature, exclude)
+
+    def _matches(self, shingle_set, signature, exclude) -> List[Tuple[Hashable, float]]:
+        candidates = set()
+        for band, key in self._band_keys(signature):
+            candidates.update(self._buckets[band].get(key, ()))
+        candidates.discard(exclude)
+
+        matches = []
+        for candidate in candidates:
+            similarity = jaccard(shingle_set, self._entries[candidate][1])
+            if similarity >= self.threshold:
+                matches.append((candidate, similarity))
+        return sorted(matches, key=lambda match: -match[1])
+
+    def add(self, key: Hashable, text: str) -> List[Tuple[Hashable, float]]:
+        """Index a post (replacing any previous text under key); return its matches"""
+        self.remove(key)
+        shingle_set = shingles(text, self.shingle_size)
+        signature = self.hasher.signature(shingle_set)
+        matches = self._matches(shingle_set, signature, key)
+
+        self._entries[key] = (text, shingle_set, signature)
+        for band, band_key in self._band_keys(signature):
+            self._buckets[band].setdefault(band_key, set()).add(key)
+        return matches
+
+    def remove(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for band, band_key in self._band_keys(entry[2]):
+            bucket = self._buckets[band].get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band][band_key]
+
+    def load_archive(self, path: str, skip_text: Iterable[str] = ()) -> int:
+        """Index every real post of an earlier campaign's post store"""
+        skip_text = set(skip_text)
+        count = 0
+        for post in iter_posts(path):
+            if post["main_text"] in skip_text:
+                continue
+            self.add(f"{path}#{post['post_number']}", post["main_text"])
+            count += 1
+        return count
+
+def find_near_duplicates(posts: Iterable[Dict], threshold: float = DEFAULT_THRESHOLD,
+                         index: NearDuplicateIndex = None,
+                         skip_text: Iterable[str] = ()) -> List[Tuple[Hashable, Hashable, float]]:
+    """(earlier key, post_number, similarity) for every near-duplicate pair, in post order"""
+    if index is None:
+        index = NearDuplicateIndex(threshold)
+    skip_text = set(skip_text)
+    pairs = []
+    for post in posts:
+        if post["main_text"] in skip_text:
+            continue
+        for key, similarity in index.add(post["post_number"], post["main_text"]):
+            pairs.append((key, post["post_number"], similarity))
+    return pairs
+
+def describe_key(key: Hashable) -> str:
+    return f"post {key}" if isinstance(key, int) else str(key)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="List near-duplicate posts")
+    parser.add_argument("posts_file", help="Post store to check (.json or .jsonl)")
+    parser.add_argument("archive", nargs="*", help="Earlier campaigns' post stores to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Jaccard similarity of 5-character shingles (default: {DEFAULT_THRESHOLD})")
+    options = parser.parse_args()
+
+    index = NearDuplicateIndex(options.threshold)
+    for path in options.archive:
+        print(f"📚 Archive {path}: {index.load_archive(path)} posts")
+
+    pairs = find_near_duplicates(iter_posts(options.posts_file), index=index)
+    print(f"🔍 {len(pairs)} near-duplicate pairs at ≥{options.threshold:.0%} similarity "
+          f"(LSH: {index.bands} bands x {index.rows} rows)")
+    for key, post_number, similarity in pairs:
+        print(f"  post {post_number} ~ {describe_key(key)}: {similarity:.0%}")
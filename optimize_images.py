@@ -0,0 +1,284 @@
+"""
+Image optimisation stage for the post images
+The generated PNGs are ~1 MB each, far more than X displays. This resizes
+every image to fit X's recommended size for its shape (1600x900 landscape,
+1200x1200 square, 1080x1350 portrait; never upscaled) and writes compressed
+JPEG and WebP variants next to a lossless, optimised PNG in
+images/optimized/. Images run in a process pool. Sources whose content hash
+and settings match the manifest are skipped, so reruns only touch new or
+changed images.
+
+images/optimized/manifest.json maps each post_number to its variants with
+their sizes and byte savings, so upload and sync jobs can pick the smallest.
+
+Pillow does the resizing and encoding. Without it only the lossless PNGs
+are written (the PNG data is recompressed with zlib, pixels untouched).
+
+Usage:
+    python optimize_images.py
+    python optimize_images.py images --formats webp jpeg --workers 8
+    python optimize_images.py --force --jpeg-quality 80
+"""
+
+import hashlib
+import io
+import json
+import os
+import re
+import struct
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from PIL import Image, features
+except ImportError:
+    Image = None
+
+DEFAULT_IMAGES_DIR = "images"
+OPTIMIZED_DIRNAME = "optimized"
+MANIFEST_NAME = "manifest.json"
+FORMATS = ("jpeg", "webp", "png")
+EXTENSIONS = {"jpeg": ".jpg", "webp": ".webp", "png": ".png"}
+DEFAULT_JPEG_QUALITY = 85
+DEFAULT_WEBP_QUALITY = 80
+DEFAULT_PNG_LEVEL = 9  # zlib level; lossless photos gain ~20% at 9 but take ~8x longer than at 6
+
+# X's recommended in-stream sizes by shape
+X_SIZES = {"landscape": (1600, 900), "square": (1200, 1200), "portrait": (1080, 1350)}
+
+_IMAGE_NAME = re.compile(r"Twitter_Post_(\d+)_Image\.(?:png|jpe?g|webp)$", re.IGNORECASE)
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Chunks that change how pixels look; everything else (text, time, EXIF...) is dropped
+_PNG_KEEP = {b"IHDR", b"PLTE", b"tRNS", b"gAMA", b"cHRM", b"sRGB", b"iCCP", b"IDAT", b"IEND"}
+
+def post_number_from_filename(filename: str) -> Optional[int]:
+    match = _IMAGE_NAME.search(os.path.basename(filename))
+    return int(match.group(1)) if match else None
+
+def x_target_size(width: int, height: int, box: Optional[Tuple[int, int]] = None) -> Tuple[int, int]:
+    """Size that fits X's recommended box for this shape, keeping aspect ratio and never upscaling"""
+    if box is None:
+        ratio = width / height
+        box = X_SIZES["landscape" if ratio >= 1.2 else "portrait" if ratio <= 0.9 else "square"]
+    scale = min(box[0] / width, box[1] / height, 1.0)
+    return max(round(width * scale), 1), max(round(height * scale), 1)
+
+def recompress_png(data: bytes, level: int = DEFAULT_PNG_LEVEL) -> bytes:
+    """The same pixels recompressed at the given zlib level, minus ancillary metadata (no Pillow needed)"""
+    if not data.startswith(_PNG_SIGNATURE):
+        raise ValueError("not a PNG file")
+    chunks = []
+    idat = []
+    position = len(_PNG_SIGNATURE)
+    while position < len(data):
+        length, kind = struct.unpack(">I4s", data[position:position + 8])
+        body = data[position + 8:position + 8 + length]
+        position += 12 + length
+        if kind == b"IDAT":
+            idat.append(body)
+        elif kind in _PNG_KEEP:
+            chunks.append((kind, body))
+
+    compressed = zlib.compress(zlib.decompress(b"".join(idat)), level)
+    output = [_PNG_SIGNATURE]
+    for kind, body in chunks:
+        if kind == b"IEND":
+            output.append(_png_chunk(b"IDAT", compressed))
+        output.append(_png_chunk(kind, body))
+    return b"".join(output)
+
+def _png_chunk(kind: bytes, body: bytes) -> bytes:
+    return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+
+def _encode(image, fmt: str, settings: Dict) -> bytes:
+    buffer = io.BytesIO()
+    if fmt == "jpeg":
+        if image.mode in ("RGBA", "LA", "P"):
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.getchannel("A"))
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        image.save(buffer, "JPEG", quality=settings["jpeg_quality"], optimize=True, progressive=True)
+    elif fmt == "webp":
+        image.save(buffer, "WEBP", quality=settings["webp_quality"], method=6)
+    else:
+        level = settings["png_level"]
+        image.save(buffer, "PNG", optimize=level == 9, compress_level=level)
+    return buffer.getvalue()
+
+def _write_atomic(path: str, data: bytes):
+    temp_path = f"{path}.tmp{os.getpid()}"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+def optimize_image(source: str, output_dir: str, settings: Dict, known: Optional[Dict] = None) -> Dict:
+    """Write the variants of one image and return its manifest entry
+
+    If known (the previous manifest entry) has the same content hash and
+    settings and its variant files still exist, nothing is written and
+    known comes back with status "unchanged".
+    """
+    with open(source, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    if (known and known.get("sha256") == digest and known.get("settings") == settings
+            and all(os.path.exists(variant["path"]) for variant in known["variants"].values())):
+        return dict(known, status="unchanged")
+
+    stem = os.path.splitext(os.path.basename(source))[0]
+    box = tuple(settings["size"]) if settings.get("size") else None
+    encoded = {}
+    if Image is not None:
+        with Image.open(io.BytesIO(data)) as image:
+            image.load()
+            source_size = image.size
+            size = x_target_size(*image.size, box)
+            if size != image.size:
+                image = image.resize(size, Image.LANCZOS)
+            for fmt in settings["formats"]:
+                encoded[fmt] = _encode(image, fmt, settings)
+    else:
+        width, height = struct.unpack(">II", data[16:24])
+        source_size = size = (width, height)
+        encoded["png"] = recompress_png(data, settings["png_level"])
+
+    variants = {}
+    for fmt, variant_data in encoded.items():
+        path = os.path.join(output_dir, stem + EXTENSIONS[fmt])
+        _write_atomic(path, variant_data)
+        variants[fmt] = {
+            "path": path,
+            "bytes": len(variant_data),
+            "saved_bytes": len(data) - len(variant_data),
+            "saved_percent": round(100 * (1 - len(variant_data) / len(data)), 1)
+        }
+    return {
+        "source": source,
+        "sha256": digest,
+        "source_bytes": len(data),
+        "source_size": list(source_size),
+        "size": list(size),
+        "settings": settings,
+        "variants": variants,
+        "status": "optimized"
+    }
+
+def find_images(images_dir: str) -> Dict[int, str]:
+    """{post_number: path} for the post images directly inside images_dir"""
+    found = {}
+    for name in sorted(os.listdir(images_dir)):
+        post_number = post_number_from_filename(name)
+        if post_number is not None and os.path.isfile(os.path.join(images_dir, name)):
+            found[post_number] = os.path.join(images_dir, name)
+    return found
+
+def manifest_path(images_dir: str = DEFAULT_IMAGES_DIR) -> str:
+    return os.path.join(images_dir, OPTIMIZED_DIRNAME, MANIFEST_NAME)
+
+def load_manifest(path: str) -> Dict:
+    if not os.path.exists(path):
+        return {"posts": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def manifest_totals(posts: Dict[str, Dict]) -> Dict:
+    source_bytes = sum(entry["source_bytes"] for entry in posts.values())
+    totals = {"images": len(posts), "source_bytes": source_bytes, "variants": {}}
+    for fmt in FORMATS:
+        sizes = [entry["variants"][fmt]["bytes"] for entry in posts.values() if fmt in entry["variants"]]
+        if not sizes:
+            continue
+        covered = sum(entry["source_bytes"] for entry in posts.values() if fmt in entry["variants"])
+        totals["variants"][fmt] = {
+            "bytes": sum(sizes),
+            "saved_bytes": covered - sum(sizes),
+            "saved_percent": round(100 * (1 - sum(sizes) / covered), 1) if covered else 0.0
+        }
+    return totals
+
+def optimize_images(images_dir: str = DEFAULT_IMAGES_DIR, formats: List[str] = FORMATS,
+                    jpeg_quality: int = DEFAULT_JPEG_QUALITY, webp_quality: int = DEFAULT_WEBP_QUALITY,
+                    png_level: int = DEFAULT_PNG_LEVEL, size: Optional[Tuple[int, int]] = None,
+                    workers: Optional[int] = None, force: bool = False) -> Dict:
+    """Optimise every post image in a process pool and write the manifest"""
+    formats = [fmt for fmt in FORMATS if fmt in formats]
+    if Image is None:
+        print("⚠️  Pillow not installed: writing recompressed lossless PNGs only (pip install Pillow)")
+        formats = ["png"]
+    elif "webp" in formats and not features.check("webp"):
+        print("⚠️  This Pillow build has no WebP support: skipping WebP variants")
+        formats.remove("webp")
+    settings = {"formats": formats, "jpeg_quality": jpeg_quality, "webp_quality": webp_quality,
+                "png_level": png_level, "size": list(size) if size else None, "pillow": Image is not None}
+
+    output_dir = os.path.join(images_dir, OPTIMIZED_DIRNAME)
+    os.makedirs(output_dir, exist_ok=True)
+    path = manifest_path(images_dir)
+    previous = load_manifest(path)["posts"]
+    sources = find_images(images_dir)
+
+    posts = {}
+    counts = {"optimized": 0, "unchanged": 0, "failed": 0}
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(optimize_image, source, output_dir, settings,
+                            None if force else previous.get(str(post_number))): post_number
+            for post_number, source in sources.items()
+        }
+        for future in as_completed(futures):
+            post_number = futures[future]
+            try:
+                entry = future.result()
+            except Exception as e:
+                print(f"❌ Post {post_number}: {sources[post_number]}: {e}")
+                counts["failed"] += 1
+                continue
+            counts[entry.pop("status")] += 1
+            posts[str(post_number)] = entry
+
+    manifest = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "settings": settings,
+        "totals": manifest_totals(posts),
+        "posts": {key: posts[key] for key in sorted(posts, key=int)}
+    }
+    _write_atomic(path, json.dumps(manifest, indent=2).encode("utf-8"))
+
+    print(f"🖼️  {len(sources)} images in {time.perf_counter() - started:.1f}s: {counts['optimized']} optimized, "
+          f"{counts['unchanged']} unchanged, {counts['failed']} failed")
+    totals = manifest["totals"]
+    print(f"   source: {totals['source_bytes'] / 1e6:.1f} MB")
+    for fmt, total in totals["variants"].items():
+        print(f"   {fmt:<5} {total['bytes'] / 1e6:>6.1f} MB  (saves {total['saved_percent']:.0f}%)")
+    print(f"💾 Manifest written to {path}")
+    return manifest
+
+if __name__ == "__main__":
+    import argparse
+
+    def parse_size(value: str) -> Tuple[int, int]:
+        width, _, height = value.lower().partition("x")
+        return int(width), int(height)
+
+    parser = argparse.ArgumentParser(description="Resize post images for X and write compressed variants")
+    parser.add_argument("images_dir", nargs="?", default=DEFAULT_IMAGES_DIR,
+                        help=f"Folder with the Twitter_Post_NNN_Image files (default: {DEFAULT_IMAGES_DIR})")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS))
+    parser.add_argument("--jpeg-quality", type=int, default=DEFAULT_JPEG_QUALITY)
+    parser.add_argument("--webp-quality", type=int, default=DEFAULT_WEBP_QUALITY)
+    parser.add_argument("--png-level", type=int, choices=range(10), default=DEFAULT_PNG_LEVEL, metavar="0-9",
+                        help=f"zlib level for the lossless PNGs; 6 is much faster (default: {DEFAULT_PNG_LEVEL})")
+    parser.add_argument("--size", type=parse_size, default=None,
+                        help="Fit inside this WxH box instead of X's recommended size for each shape")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--force", action="store_true", help="Re-encode images whose content hash is unchanged")
+    options = parser.parse_args()
+
+    optimize_images(options.images_dir, options.formats, options.jpeg_quality, options.webp_quality,
+                    options.png_level, options.size, options.workers, options.force)
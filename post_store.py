@@ -0,0 +1,205 @@
+"""
+Storage helpers for generated posts
+- JSON ({"metadata", "posts"}) and streaming JSONL post stores
+- Append-only checkpoint journal used to resume interrupted generation runs
+
+JSONL layout: the first line is {"metadata": {...}}, every following line
+is one post record.
+"""
+
+import json
+import os
+import threading
+from typing import Dict, Iterator, List, Optional
+
+JSONL_EXTENSIONS = (".jsonl", ".ndjson")
+
+def detect_format(path: str, fmt: Optional[str] = None) -> str:
+    """Return "json" or "jsonl", from fmt if given or else the file extension"""
+    if fmt:
+        return fmt
+    return "jsonl" if path.lower().endswith(JSONL_EXTENSIONS) else "json"
+
+def write_posts(path: str, metadata: Dict, posts: List[Dict], fmt: Optional[str] = None):
+    """Write a complete post store in either format"""
+    if detect_format(path, fmt) == "jsonl":
+        with JsonlPostWriter(path, metadata) as writer:
+            for post in posts:
+                writer.write(post)
+        return
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"metadata": metadata, "posts": posts}, f, indent=2, ensure_ascii=False)
+
+def read_metadata(path: str, fmt: Optional[str] = None) -> Dict:
+    """Read only the metadata block of a post store"""
+    if detect_format(path, fmt) == "jsonl":
+        with open(path, 'r', encoding='utf-8') as f:
+            first = json.loads(f.readline() or "{}")
+        return first.get("metadata", {})
+
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f).get("metadata", {})
+
+def iter_posts(path: str, fmt: Optional[str] = None) -> Iterator[Dict]:
+    """Yield post records one at a time
+
+    JSONL stores are read line by line, so memory use stays flat no matter
+    how many posts the file holds. JSON stores have to be parsed whole.
+    """
+    if detect_format(path, fmt) == "jsonl":
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                if "metadata" in record and "post_number" not in record:
+                    continue
+                yield record
+        return
+
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    yield from data['posts']
+
+def convert_posts(source: str, destination: str, source_fmt: Optional[str] = None,
+                  destination_fmt: Optional[str] = None) -> int:
+    """Convert a post store between the JSON and JSONL layouts"""
+    metadata = read_metadata(source, source_fmt)
+    count = 0
+
+    if detect_format(destination, destination_fmt) == "jsonl":
+        with JsonlPostWriter(destination, metadata) as writer:
+            for post in iter_posts(source, source_fmt):
+                writer.write(post)
+                count += 1
+        return count
+
+    posts = list(iter_posts(source, source_fmt))
+    write_posts(destination, metadata, posts, "json")
+    return len(posts)
+
+class JsonlPostWriter:
+    """Streams posts to a JSONL store in post_number order
+
+    Posts can be added in any order (e.g. as concurrent workers finish);
+    each one is held only until every lower-numbered post has been written,
+    so the file grows by one line per post instead of being rewritten.
+    """
+
+    def __init__(self, path: str, metadata: Dict, first_post: int = 1):
+        self.path = path
+        self._next = first_post
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._file = open(path, 'w', encoding='utf-8')
+        self._file.write(json.dumps({"metadata": metadata}, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def write(self, post: Dict):
+        """Append a post immediately, bypassing the ordering buffer"""
+        with self._lock:
+            self._write(post)
+            self._file.flush()
+
+    def add(self, post: Dict):
+        """Queue a post and write every post that is now next in order"""
+        with self._lock:
+            self._pending[post["post_number"]] = post
+            while self._next in self._pending:
+                self._write(self._pending.pop(self._next))
+                self._next += 1
+            self._file.flush()
+
+    def _write(self, post: Dict):
+        self._file.write(json.dumps(post, ensure_ascii=False) + "\n")
+
+    def close(self):
+        """Write any posts still buffered behind a gap, then close"""
+        with self._lock:
+            if self._file is None:
+                return
+            for post_number in sorted(self._pending):
+                self._write(self._pending[post_number])
+            self._pending.clear()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def journal_path(output_file: str) -> str:
+    """Journal file that sits next to an output file"""
+    root, _ = os.path.splitext(output_file)
+    return f"{root}.journal.jsonl"
+
+class PostJournal:
+    """Append-only log of finished posts, one JSON record per line
+
+    Every append is flushed and fsynced before returning, so a crash never
+    loses a post whose completion has already been paid for. A torn final
+    line (crash mid-write) is ignored on load.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def load(self) -> Dict[int, Dict]:
+        """Rebuild {post_number: post} from the journal; later records win"""
+        posts = {}
+        if not os.path.exists(self.path):
+            return posts
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    post = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                posts[post["post_number"]] = post
+        return posts
+
+    def reset(self):
+        """Start a fresh journal, discarding previous records"""
+        with self._lock:
+            self._close()
+            open(self.path, 'w', encoding='utf-8').close()
+
+    def append(self, post: Dict):
+        """Durably record a finished post"""
+        line = json.dumps(post, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 4 or sys.argv[1] != "convert":
+        print("Usage: python post_store.py convert <source> <destination>")
+        print("Format is taken from the extension (.json or .jsonl/.ndjson)")
+        sys.exit(1)
+
+    converted = convert_posts(sys.argv[2], sys.argv[3])
+    print(f"✅ Converted {converted} posts: {sys.argv[2]} → {sys.argv[3]}")
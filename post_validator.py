@@ -0,0 +1,121 @@
+"""
+Post validation
+Checks every post of a store against the rules the prompts ask for but
+nothing enforced: 2-3 sentences, main_text under 200 characters, full_post
+within X's 280 weighted characters (t.co counts every URL as 23, emoji and
+most non-Latin characters as 2), 4-5 hashtags and no ERROR placeholders.
+
+Usage:
+    python post_validator.py modelit_x_posts.json
+"""
+
+import re
+import unicodedata
+from typing import Dict, Iterable, List
+
+MAX_MAIN_TEXT = 200
+MAX_WEIGHTED_LENGTH = 280
+URL_LENGTH = 23
+SENTENCES = (2, 3)
+HASHTAGS = (4, 5)
+PLACEHOLDER_PREFIX = "ERROR"
+PLACEHOLDER_PROBLEM = "ERROR placeholder"
+
+# twitter-text v3: code points outside these ranges weigh 2, emoji sequences 2 in total
+_HEAVY = re.compile("[^\u0000-\u10ff\u2000-\u200d\u2010-\u201f\u2032-\u2037]")
+_URL = re.compile(r"(?:https?://|www\.)\S*[^\s.,!?;:)\]]")
+_EMOJI_CHAR = "\u2600-\u27bf\U0001f000-\U0001faff"
+_EMOJI = re.compile(
+    f"[\U0001f1e6-\U0001f1ff]{{2}}"
+    f"|[{_EMOJI_CHAR}][\ufe0f\U0001f3fb-\U0001f3ff]?(?:\u200d[{_EMOJI_CHAR}][\ufe0f\U0001f3fb-\U0001f3ff]?)*"
+)
+_HASHTAG = re.compile(r"#(?<![\w&#]#)\w+")
+_ABBREVIATION = re.compile(r"(?:^|\W)(?:e\.g|i\.e|etc|vs|dr|mrs?|ms|st)$", re.IGNORECASE)
+_SENTENCE_END = re.compile(r"[.!?…]+(?=[\"'”’)\]]*(?:\s+[^a-z\s]|\s*$))")  # 'said "Aha!" and' is one sentence
+_LETTER = re.compile(r"[^\W\d_]")
+
+def _text_weight(text: str) -> int:
+    if text.isascii():
+        return len(text)
+    text, emoji = _EMOJI.subn("", text)
+    return len(text) + len(_HEAVY.findall(text)) + 2 * emoji
+
+def weighted_length(text: str) -> int:
+    """Length of text as X counts it against the 280 limit"""
+    text = unicodedata.normalize("NFC", text)
+    weight = 0
+    position = 0
+    for match in _URL.finditer(text):
+        weight += _text_weight(text[position:match.start()]) + URL_LENGTH
+        position = match.end()
+    return weight + _text_weight(text[position:])
+
+def count_sentences(text: str) -> int:
+    """Sentences with at least one letter (a trailing emoji is not a sentence)"""
+    text = _URL.sub("link", text)
+    sentences = 0
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        if match.group() == "." and _ABBREVIATION.search(text, max(match.start() - 4, 0), match.start()):
+            continue
+        sentences += bool(_LETTER.search(text, start, match.start()))
+        start = match.end()
+    return sentences + bool(_LETTER.search(text, start))
+
+def count_hashtags(text: str) -> int:
+    return len(_HASHTAG.findall(_URL.sub(" ", text)))
+
+def validate_post(post: Dict) -> List[str]:
+    """Problems with one post, as readable messages ([] if it is valid)"""
+    main_text = post.get("main_text", "")
+    full_post = post.get("full_post", "")
+    if main_text.startswith(PLACEHOLDER_PREFIX) or full_post.startswith(PLACEHOLDER_PREFIX):
+        return [PLACEHOLDER_PROBLEM]
+    if not main_text.strip():
+        return ["empty main_text"]
+
+    problems = []
+    sentences = count_sentences(main_text)
+    if not SENTENCES[0] <= sentences <= SENTENCES[1]:
+        problems.append(f"{sentences} sentences (want {SENTENCES[0]}-{SENTENCES[1]})")
+    if len(main_text) > MAX_MAIN_TEXT:
+        problems.append(f"main_text is {len(main_text)} characters (max {MAX_MAIN_TEXT})")
+    length = weighted_length(full_post)
+    if length > MAX_WEIGHTED_LENGTH:
+        problems.append(f"full_post weighs {length} on X (max {MAX_WEIGHTED_LENGTH})")
+    hashtags = count_hashtags(full_post)
+    if not HASHTAGS[0] <= hashtags <= HASHTAGS[1]:
+        problems.append(f"{hashtags} hashtags (want {HASHTAGS[0]}-{HASHTAGS[1]})")
+    return problems
+
+def validate_posts(posts: Iterable[Dict]) -> Dict[int, List[str]]:
+    """{post_number: problems} for every invalid post"""
+    invalid = {}
+    for post in posts:
+        problems = validate_post(post)
+        if problems:
+            invalid[post["post_number"]] = problems
+    return invalid
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    from collections import Counter
+
+    from post_store import iter_posts
+
+    parser = argparse.ArgumentParser(description="Check posts against the length, sentence and hashtag rules")
+    parser.add_argument("posts_file", help="Post store to check (.json or .jsonl)")
+    parser.add_argument("--format", choices=["json", "jsonl"], default=None)
+    options = parser.parse_args()
+
+    posts = list(iter_posts(options.posts_file, options.format))
+    invalid = validate_posts(posts)
+
+    print(f"🔎 {len(invalid)}/{len(posts)} posts invalid in {options.posts_file}")
+    kinds = Counter(re.sub(r"\d+", "N", problem) for problems in invalid.values() for problem in problems)
+    for kind, count in kinds.most_common():
+        print(f"  {count:>4} x {kind}")
+    for post_number, problems in sorted(invalid.items()):
+        print(f"  post {post_number}: {'; '.join(problems)}")
+    sys.exit(1 if invalid else 0)
@@ -0,0 +1,186 @@
+"""
+Adaptive client-side rate limiting for provider calls
+A token bucket shared by every worker of a backend. The refill rate adapts
+while the run goes: X-RateLimit-* response headers set it directly (the
+remaining quota spread over the time left in the window), a 429 halves it
+and pauses the bucket for Retry-After, and each clean success nudges it up
+again. Retry delays use full jitter so parallel workers don't retry in step.
+"""
+
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+DEFAULT_RATE = 1.0      # requests/second to start with
+DEFAULT_MAX_RATE = 20.0
+MIN_RATE = 0.05
+
+def _header(headers, name: str) -> Optional[str]:
+    if not headers:
+        return None
+    value = headers.get(name)
+    if value is None:
+        value = headers.get(name.lower())
+    return value
+
+def parse_retry_after(headers) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    value = _header(headers, "Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime  # rare; keeps imports light for short-lived scripts
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+def parse_reset(value: str) -> Optional[float]:
+    """Seconds until an X-RateLimit-Reset value
+
+    Providers send either a delay in seconds, a Unix timestamp in seconds
+    or (OpenRouter) a Unix timestamp in milliseconds.
+    """
+    try:
+        reset = float(value)
+    except (TypeError, ValueError):
+        return None
+    if reset > 1e12:
+        reset = reset / 1000 - time.time()
+    elif reset > 1e9:
+        reset = reset - time.time()
+    return max(reset, 0.0)
+
+class AdaptiveRateLimiter:
+    """Thread-safe token bucket whose rate follows the provider's limits
+
+    rate=None disables limiting (acquire() never waits) until a rate is
+    configured or learned from headers.
+    """
+
+    def __init__(self, rate: Optional[float] = DEFAULT_RATE, max_rate: float = DEFAULT_MAX_RATE,
+                 burst: float = 1.0, increase: float = 0.25, decrease: float = 0.5,
+                 backoff_base: float = 1.0, backoff_cap: float = 30.0, seed: int = None):
+        self.rate = rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self.acquired = 0
+        self.waited = 0.0
+        self.rate_limited = 0
+        self.header_updates = 0
+
+    def configure(self, rate: Optional[float] = None, max_rate: Optional[float] = None):
+        """Change the starting rate and/or ceiling; a rate of 0 turns limiting off"""
+        with self._lock:
+            if max_rate is not None:
+                self.max_rate = max_rate
+            if rate is not None:
+                self.rate = min(rate, self.max_rate) if rate > 0 else None
+
+    def _refill(self, now: float):
+        if self.rate is not None:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """Block until a request may be sent; return the seconds waited"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                pause = self._paused_until - now
+                if pause <= 0 and (self.rate is None or self._tokens >= 1):
+                    if self.rate is not None:
+                        self._tokens -= 1
+                    self.acquired += 1
+                    self.waited += waited
+                    return waited
+                delay = pause if pause > 0 else (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def _set_rate(self, rate: float):
+        self.rate = min(max(rate, MIN_RATE), self.max_rate)
+
+    def _pause(self, seconds: float):
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = 0.0
+        self._updated = now
+
+    def update_from_headers(self, headers) -> bool:
+        """Adopt the provider's quota from X-RateLimit-* headers, if present"""
+        remaining = _header(headers, "X-RateLimit-Remaining")
+        reset = parse_reset(_header(headers, "X-RateLimit-Reset"))
+        if remaining is None or reset is None:
+            return False
+        try:
+            remaining = float(remaining)
+        except ValueError:
+            return False
+
+        with self._lock:
+            self.header_updates += 1
+            if remaining <= 0:
+                self._pause(reset)
+            elif reset > 0:
+                self._set_rate(remaining / reset)
+        return True
+
+    def on_success(self, headers=None):
+        """A request went through: follow the headers, else probe a little faster"""
+        if self.update_from_headers(headers):
+            return
+        with self._lock:
+            if self.rate is not None:
+                self._set_rate(self.rate + self.increase)
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Jittered delay before retry number attempt+1
+
+        Honors Retry-After (plus up to 10% jitter); otherwise full jitter
+        over an exponential window capped at backoff_cap.
+        """
+        with self._lock:
+            if retry_after is not None:
+                return retry_after * (1 + self._rng.uniform(0, 0.1))
+            return self._rng.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** (attempt + 1)))
+
+    def on_error(self, status_code: Optional[int], headers, attempt: int) -> float:
+        """Record a failed attempt and return how long to wait before retrying
+
+        A 429 slows the shared bucket down and pauses every worker for the
+        Retry-After period, not just the one that was rejected.
+        """
+        retry_after = parse_retry_after(headers)
+        delay = self.backoff(attempt, retry_after)
+        if status_code == 429:
+            with self._lock:
+                self.rate_limited += 1
+                self._set_rate((self.rate or self.max_rate) * self.decrease)
+                self._pause(retry_after if retry_after is not None else delay)
+            self.update_from_headers(headers)
+        return delay
+
+    def stats(self) -> Dict:
+        return {
+            "rate": round(self.rate, 3) if self.rate is not None else None,
+            "acquired": self.acquired,
+            "waited_seconds": round(self.waited, 3),
+            "rate_limited": self.rate_limited,
+            "header_updates": self.header_updates
+        }
@@ -0,0 +1,195 @@
+"""
+Sharded campaign generation over a shared lease queue
+Queue every post slot of a campaign spec file, then start as many workers
+as you like - several processes here, more on other machines pointed at
+the same queue file. Each worker claims a few slots at a time, generates
+them with the normal pipeline and stores the results; slots held by a
+worker that died are reclaimed when their lease expires. Finished
+campaigns are merged into the output file named in their spec.
+
+Usage:
+    python run_campaigns.py init campaigns.json
+    python run_campaigns.py work --processes 4 --concurrency 4
+    python run_campaigns.py status
+    python run_campaigns.py merge
+    python run_campaigns.py retry-failed
+"""
+
+import argparse
+import multiprocessing
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+import generate_modelit_x_posts as pipeline
+from campaigns import Campaign, load_campaigns
+from circuit_breaker import CircuitOpenError
+from llm_backends import BACKENDS, DEFAULT_BACKEND, configure_backend, print_backend_stats
+from llm_cache import add_cache_arguments, cache_options, configure_cache
+from llm_metrics import request_context
+from work_queue import DEFAULT_LEASE_SECONDS, DEFAULT_QUEUE_PATH, LeaseQueue, LeaseRenewer, worker_id
+
+POLL_SECONDS = 0.25  # how often an idle worker checks for slots freed by others
+
+def queue_campaigns(queue: LeaseQueue) -> Dict[str, Campaign]:
+    """Campaign objects for every spec stored in the queue"""
+    return {name: Campaign.from_dict(spec, pipeline.DEFAULT_CAMPAIGN)
+            for name, spec in queue.campaign_specs().items()}
+
+def generate_claimed(batch: List[Tuple[int, int, int, str]], campaign: Campaign, seed: int) -> List[Dict]:
+    """Generate one same-category batch of claimed slots with the pipeline"""
+    with request_context(category=batch[0][3], post_numbers=[slot[0] for slot in batch], campaign=campaign.name):
+        if len(batch) > 1:
+            return pipeline.generate_post_batch(batch, seed, campaign)
+        post_num, week_num, post_order, category = batch[0]
+        return [pipeline.generate_post_or_placeholder(category, post_num, week_num, post_order, seed, campaign)]
+
+def work(options, worker_number: int = 0) -> Dict[str, int]:
+    """Claim and generate slots until the queue is drained"""
+    backend = configure_backend(options.backend)
+    backend.limiter.configure(rate=options.rate_limit)
+    configure_cache(**cache_options(options))
+
+    queue = LeaseQueue(options.queue, lease_seconds=options.lease_seconds)
+    campaigns = queue_campaigns(queue)
+    owner = worker_id()
+    counts = {"done": 0, "failed": 0}
+    print(f"👷 Worker {worker_number} ({owner}) started")
+
+    try:
+        with LeaseRenewer(queue, owner), ThreadPoolExecutor(max_workers=options.concurrency) as executor:
+            while True:
+                slots = queue.claim(owner, limit=options.claim, campaign=options.campaign)
+                if not slots:
+                    remaining = queue.progress()
+                    if not any(p["pending"] or p["leased"] for p in remaining.values()):
+                        break
+                    # Other workers hold the rest; poll for their results or for a lease to expire
+                    expiry = queue.next_lease_expiry()
+                    time.sleep(POLL_SECONDS if expiry is None else min(expiry + 0.01, POLL_SECONDS))
+                    continue
+
+                by_slot = {(slot["campaign"], slot["post_number"]): slot for slot in slots}
+                futures = []
+                for name in sorted({slot["campaign"] for slot in slots}):
+                    claimed = [(s["post_number"], s["week_number"], s["post_order"], s["category"])
+                               for s in slots if s["campaign"] == name]
+                    for batch in pipeline.batch_slots(claimed, options.posts_per_call):
+                        futures.append((name, executor.submit(generate_claimed, batch, campaigns[name], options.seed)))
+
+                stopped = None
+                for name, future in futures:
+                    if stopped and future.cancel():
+                        continue
+                    try:
+                        posts = future.result()
+                    except CircuitOpenError as e:
+                        # Store the batches that did finish before stopping; release() requeues the rest
+                        stopped = stopped or e
+                        continue
+                    for post in posts:
+                        slot = by_slot[(name, post["post_number"])]
+                        if post["main_text"] == pipeline.ERROR_TEXT:
+                            if queue.fail(owner, slot, "generation failed", post) == "failed":
+                                counts["failed"] += 1
+                        elif queue.complete(owner, slot, post):
+                            counts["done"] += 1
+                if stopped:
+                    raise stopped
+    except CircuitOpenError as e:
+        print(f"🛑 Worker {worker_number} stopping: {e}")
+    finally:
+        queue.release(owner)
+        queue.close()
+
+    print(f"👷 Worker {worker_number} finished: {counts['done']} posts, {counts['failed']} failed for good")
+    print_backend_stats()
+    return counts
+
+def _work_process(options, worker_number: int):
+    work(options, worker_number)
+
+def merge(queue: LeaseQueue, only: str = None, fmt: str = None) -> Dict[str, int]:
+    """Write each campaign's stored posts to its output with save_posts"""
+    progress = queue.progress()
+    merged = {}
+    for name, campaign in queue_campaigns(queue).items():
+        if only and name != only:
+            continue
+        posts = queue.results(name)
+        if not posts:
+            continue
+        counts = progress.get(name, {})
+        pipeline.save_posts(posts, campaign.output, fmt, campaign)
+        missing = campaign.total_posts - len(posts)
+        note = f" ({missing} still missing)" if missing else ""
+        if counts.get("failed"):
+            note += f" ({counts['failed']} failed - placeholders included)"
+        print(f"💾 {name}: {len(posts)} posts → {campaign.output}{note}")
+        merged[name] = len(posts)
+    return merged
+
+def print_status(queue: LeaseQueue):
+    print(f"📋 Queue {queue.path}")
+    for name, counts in sorted(queue.progress().items()):
+        total = sum(counts.values())
+        print(f"  {name}: {counts['done']}/{total} done, {counts['leased']} leased, "
+              f"{counts['pending']} pending, {counts['failed']} failed")
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Generate many campaigns with a shared lease queue")
+    parser.add_argument("command", choices=["init", "work", "status", "merge", "retry-failed"])
+    parser.add_argument("spec", nargs="?", help="Campaign spec file (init only)")
+    parser.add_argument("--queue", default=DEFAULT_QUEUE_PATH, help=f"Queue database (default: {DEFAULT_QUEUE_PATH})")
+    parser.add_argument("--campaign", default=None, help="Only work on / merge this campaign")
+    parser.add_argument("--processes", type=int, default=1, help="Worker processes to start on this machine")
+    parser.add_argument("--concurrency", type=int, default=4, help="Requests in flight per worker process")
+    parser.add_argument("--claim", type=int, default=None, help="Slots leased per claim (default: 2 x concurrency)")
+    parser.add_argument("--lease-seconds", type=float, default=DEFAULT_LEASE_SECONDS,
+                        help=f"Lease length; slots of a dead worker are reclaimed after this (default: {DEFAULT_LEASE_SECONDS})")
+    parser.add_argument("--posts-per-call", type=int, default=1,
+                        help="Request this many same-category posts per API call as structured JSON")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=DEFAULT_BACKEND)
+    parser.add_argument("--rate-limit", type=float, default=None, help="Starting request rate per process in req/s")
+    parser.add_argument("--seed", type=int, default=None, help="Seed hashtag selection for reproducible reruns")
+    parser.add_argument("--format", choices=["json", "jsonl"], default=None,
+                        help="Merged output format (default: from each output file's extension)")
+    add_cache_arguments(parser)
+    options = parser.parse_args(argv)
+    options.claim = options.claim or options.concurrency * 2
+
+    queue = LeaseQueue(options.queue, lease_seconds=options.lease_seconds)
+
+    if options.command == "init":
+        if not options.spec:
+            parser.error("init needs a campaign spec file")
+        for name, campaign in load_campaigns(options.spec, pipeline.DEFAULT_CAMPAIGN).items():
+            added = queue.enqueue(campaign)
+            print(f"🗂️  {name}: {added} new slots queued ({campaign.total_posts} posts → {campaign.output})")
+    elif options.command == "status":
+        print_status(queue)
+    elif options.command == "retry-failed":
+        print(f"♻️  {queue.retry_failed(options.campaign)} failed slots queued again")
+    elif options.command == "merge":
+        merge(queue, options.campaign, options.format)
+    else:
+        queue.close()
+        started = time.perf_counter()
+        if options.processes <= 1:
+            work(options)
+        else:
+            processes = [multiprocessing.Process(target=_work_process, args=(options, n))
+                         for n in range(options.processes)]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+        print(f"\n⏱️  Workers finished in {time.perf_counter() - started:.1f}s\n")
+        queue = LeaseQueue(options.queue, lease_seconds=options.lease_seconds)
+        print_status(queue)
+        merge(queue, options.campaign, options.format)
+
+    queue.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+import generate_modelit_x_posts as pipeline
+from campaigns import Campaign
+from circuit_breaker import CircuitOpenError
+from llm_backends import LLMBackend, StubBackend
+from llm_cache import configure_cache
+from post_store import iter_posts
+
+class MalformedBackend(LLMBackend):
+    """Answers every call with a body the backend cannot parse"""
+
+    name = "malformed"
+    retryable_errors = (ConnectionError,)
+
+    def _complete(self, prompt, prefix, max_tokens, response_format, info):
+        raise KeyError("choices")
+
+@pytest.fixture(autouse=True)
+def no_cache():
+    configure_cache(enabled=False)
+
+def test_unclassified_error_resolves_half_open_probe():
+    backend = MalformedBackend("test")
+    backend.limiter.configure(rate=0)
+    backend.breaker.configure(failure_threshold=1, cooldown=0.05)
+    backend.breaker.record_failure()  # open the circuit
+    assert backend.breaker.state == "open"
+
+    with pytest.raises(KeyError):
+        backend.complete("prompt")  # this call is the half-open probe
+
+    assert backend.breaker.state == "open"
+
+    # Another worker gets its own probe after the cooldown instead of waiting for max_outage
+    finished = threading.Event()
+
+    def second_call():
+        with pytest.raises(KeyError):
+            backend.complete("prompt")
+        finished.set()
+    threading.Thread(target=second_call, daemon=True).start()
+    assert finished.wait(2)
+
+class OutageBackend(StubBackend):
+    """Stub that answers ok_calls requests, then fails like a provider that went down"""
+
+    def __init__(self, ok_calls):
+        super().__init__()
+        self.ok_calls = ok_calls
+        self.calls = 0
+        self._calls_lock = threading.Lock()
+
+    def _complete(self, prompt, prefix, max_tokens, response_format, info):
+        with self._calls_lock:
+            self.calls += 1
+            call = self.calls
+        time.sleep(0.01)
+        if call > self.ok_calls:
+            raise ConnectionError("provider down")
+        return super()._complete(prompt, prefix, max_tokens, response_format, info)
+
+    def complete(self, *args, **kwargs):
+        try:
+            return super().complete(*args, **kwargs)
+        except CircuitOpenError:
+            time.sleep(0.05)  # hold the worker so batches are still queued when the run sees the open circuit
+            raise
+
+def test_abort_mode_stops_a_concurrent_run(tmp_path, monkeypatch):
+    backend = OutageBackend(ok_calls=3)
+    backend.breaker.configure(failure_threshold=1, mode="abort")
+    monkeypatch.setattr(pipeline, "get_backend", lambda: backend)
+    output = str(tmp_path / "posts.json")
+    campaign = Campaign("outage", {"Quick Win": 20}, datetime(2026, 1, 5), output=output)
+
+    run = threading.Thread(target=pipeline.generate_all_posts,
+                           kwargs={"output_file": output, "concurrency": 4, "campaign": campaign}, daemon=True)
+    run.start()
+    run.join(10)
+
+    assert not run.is_alive()
+    saved = [post for post in iter_posts(output) if post["main_text"] != pipeline.ERROR_TEXT]
+    # Every post that was generated before the circuit opened is kept
+    assert len(saved) == 3
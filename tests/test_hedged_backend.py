@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+from llm_backends import HedgedBackend, StubBackend
+from llm_cache import configure_cache
+
+class TimedBackend(StubBackend):
+    """Stub that answers with its own name after latency seconds, noting when each call started"""
+
+    def __init__(self, name, latency):
+        super().__init__(model=name)
+        self.name = name
+        self.latency = latency
+        self.started = []
+
+    def _complete(self, prompt, prefix, max_tokens, response_format, info):
+        self.started.append(time.perf_counter())
+        time.sleep(self.latency)
+        return self.name
+
+@pytest.fixture(autouse=True)
+def no_cache():
+    configure_cache(enabled=False)
+
+@pytest.fixture
+def hedged():
+    backends = []
+
+    def make(primary_latency, secondary_latency, hedge_after=0.1):
+        primary, secondary = TimedBackend("primary", primary_latency), TimedBackend("secondary", secondary_latency)
+        backend = HedgedBackend(primary, secondary, hedge_after=hedge_after)
+        backends.append(backend)
+        return backend
+    yield make
+    for backend in backends:
+        backend.close()
+
+def test_slow_primary_is_hedged_after_the_delay_and_the_first_answer_wins(hedged):
+    backend = hedged(primary_latency=1.0, secondary_latency=0.01)
+
+    started = time.perf_counter()
+    assert backend.complete("prompt") == "secondary"
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.5  # did not wait for the primary
+    hedge_sent = backend.secondary.started[0] - started
+    assert 0.1 <= hedge_sent < 0.4
+    assert backend.stats()["hedged"] == 1
+    assert backend.stats()["secondary_wins"] == 1
+    assert backend.stats()["failovers"] == 0
+
+def test_fast_primary_is_not_hedged(hedged):
+    backend = hedged(primary_latency=0.01, secondary_latency=0.01)
+
+    assert backend.complete("prompt") == "primary"
+    time.sleep(0.15)  # past the hedge delay
+
+    assert backend.secondary.started == []
+    assert backend.stats()["hedged"] == 0
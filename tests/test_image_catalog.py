@@ -0,0 +1,35 @@
+import pytest
+
+from image_catalog import ImageCatalog, read_image_header
+
+# SOI, then a baseline SOF0 segment: length 17, precision 8, height 16, width 32
+JPEG_HEADER = b"\xff\xd8\xff\xc0\x00\x11\x08\x00\x10\x00\x20" + bytes(12)
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+def test_jpeg_dimensions_come_from_the_frame_header(tmp_path):
+    assert read_image_header(write(tmp_path, "ok.jpg", JPEG_HEADER)) == ("jpeg", 32, 16)
+
+@pytest.mark.parametrize("data", [
+    JPEG_HEADER[:5],                       # ends inside the segment length
+    JPEG_HEADER[:9],                       # ends inside the frame header
+    b"\xff\xd8\xff\xe0\x00\x01" + bytes(8),  # segment length shorter than its own field
+])
+def test_truncated_or_corrupt_jpeg_has_no_dimensions(tmp_path, data):
+    assert read_image_header(write(tmp_path, "bad.jpg", data)) == ("jpeg", None, None)
+
+def test_one_bad_image_does_not_abort_the_refresh(tmp_path):
+    images = tmp_path / "images"
+    images.mkdir()
+    write(images, "Twitter_Post_001_Image.jpg", JPEG_HEADER)
+    write(images, "Twitter_Post_002_Image.jpg", JPEG_HEADER[:7])
+    catalog = ImageCatalog(str(tmp_path / "catalog.sqlite3"))
+    try:
+        assert catalog.refresh_images(str(images))["added"] == 2
+        assert [(row["post_number"], row["width"], row["height"]) for row in catalog.images()] == \
+            [(1, 32, 16), (2, None, None)]
+    finally:
+        catalog.close()
@@ -0,0 +1,61 @@
+import functools
+import os
+import random
+
+import pytest
+
+import media_upload
+from media_upload import CHUNK_ALIGN, media_session, start_media_upload
+from mock_storage_server import MockStorageServer
+from rate_limiter import AdaptiveRateLimiter
+
+PNG_HEADER = b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x04\x00\x00\x00\x04\x00"
+
+@pytest.fixture
+def images(tmp_path):
+    """Six post images of one to three chunks; post 6 is a copy of post 1"""
+    images_dir = tmp_path / "images"
+    images_dir.mkdir()
+    rng = random.Random(0)
+    contents = {}
+    for post_num in range(1, 6):
+        size = rng.randrange(CHUNK_ALIGN // 2, CHUNK_ALIGN * 3)
+        contents[post_num] = PNG_HEADER + rng.randbytes(size)
+    contents[6] = contents[1]
+    for post_num, data in contents.items():
+        (images_dir / f"Twitter_Post_{post_num:03d}_Image.png").write_bytes(data)
+    return str(images_dir), contents
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(media_upload, "AdaptiveRateLimiter",
+                        functools.partial(AdaptiveRateLimiter, backoff_base=0.01))
+
+def test_uploads_survive_faults_and_skip_known_content(tmp_path, images):
+    images_dir, contents = images
+    posts_file = str(tmp_path / "posts.json")
+
+    with MockStorageServer(drop_rate=0.15, error_rate=0.05, seed=1) as server:
+        def upload():
+            return start_media_upload(media_session(), posts_file, images_dir, workers=4, chunk_size=CHUNK_ALIGN,
+                                      upload_url=server.url)
+
+        stage = upload()
+        assert stage.queued == 5  # post 6 shares post 1's file
+        links = stage.finish()
+
+        assert server.counts["dropped"] + server.counts["errors"] > 0
+        assert stage.failed == {}
+        assert sorted(links) == [1, 2, 3, 4, 5, 6]
+        assert links[6] == links[1]
+        uploaded = {entry["name"]: entry["data"] for entry in server.files.values()}
+        for post_num in range(1, 6):
+            assert uploaded[f"Twitter_Post_{post_num:03d}_Image.png"] == contents[post_num]
+        assert len(server.files) == 5
+
+        sessions = server.counts["sessions"]
+        again = upload()
+        assert (again.queued, again.skipped) == (0, 6)
+        assert again.finish() == links
+        assert server.counts["sessions"] == sessions
+    assert os.path.exists(media_upload.media_state_path(posts_file))
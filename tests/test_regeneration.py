@@ -0,0 +1,114 @@
+import json
+import os
+import shutil
+import threading
+import time
+
+import pytest
+
+import generate_modelit_x_posts as pipeline
+from circuit_breaker import CircuitOpenError
+from llm_backends import StubBackend
+from llm_cache import configure_cache
+from near_duplicates import NearDuplicateIndex
+from post_store import iter_posts
+
+VALID_TEXT = "Imagine your students building a live model of a food web in minutes ({n}). Try ModelIt K12 free today!"
+
+class CountingBackend(StubBackend):
+    """Stub that counts provider calls and answers with texts(call number)"""
+
+    def __init__(self, texts):
+        super().__init__()
+        self.texts = texts
+        self.calls = 0
+
+    def _complete(self, prompt, prefix, max_tokens, response_format, info):
+        self.calls += 1
+        return self.texts(self.calls)
+
+@pytest.fixture
+def use_backend(tmp_path, monkeypatch):
+    configure_cache(path=str(tmp_path / "cache.sqlite3"))
+
+    def install(backend):
+        monkeypatch.setattr(pipeline, "get_backend", lambda: backend)
+        return backend
+    yield install
+    configure_cache(enabled=False)
+
+@pytest.fixture
+def posts():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(root, "modelit_x_posts.json"), encoding="utf-8") as f:
+        return json.load(f)["posts"]
+
+def test_duplicate_retries_reach_the_provider(use_backend, posts):
+    original, duplicate = posts[0], dict(posts[1], main_text=posts[0]["main_text"])
+    backend = use_backend(CountingBackend(lambda n: original["main_text"]))
+    index = NearDuplicateIndex()
+    index.add(original["post_number"], original["main_text"])
+
+    pipeline.regenerate_if_duplicate(duplicate, index, max_attempts=2)
+
+    # Both attempts send the same avoid-list; the second must not replay the first from the cache
+    assert backend.calls == 2
+
+def test_second_invalid_attempt_reaches_the_provider(use_backend, posts):
+    backend = use_backend(CountingBackend(lambda n: "Too short #tag"))
+
+    pipeline.regenerate_if_invalid(posts[0], max_attempts=2, force=True)
+
+    assert backend.calls == 2
+
+def test_forced_regeneration_is_not_replayed_from_cache(use_backend, posts):
+    backend = use_backend(CountingBackend(lambda n: VALID_TEXT.format(n=n)))
+
+    first = pipeline.regenerate_if_invalid(posts[0], seed=1, force=True)
+    second = pipeline.regenerate_if_invalid(posts[0], seed=1, force=True)
+
+    assert backend.calls == 2
+    assert first["main_text"] != second["main_text"]
+
+class OutageBackend(StubBackend):
+    """Stub that answers ok_calls requests with valid posts, then fails like a provider that went down"""
+
+    def __init__(self, ok_calls):
+        super().__init__()
+        self.ok_calls = ok_calls
+        self.calls = 0
+        self._calls_lock = threading.Lock()
+
+    def _complete(self, prompt, prefix, max_tokens, response_format, info):
+        with self._calls_lock:
+            self.calls += 1
+            call = self.calls
+        time.sleep(0.01)
+        if call > self.ok_calls:
+            raise ConnectionError("provider down")
+        return VALID_TEXT.format(n=call)
+
+    def complete(self, *args, **kwargs):
+        try:
+            return super().complete(*args, **kwargs)
+        except CircuitOpenError:
+            time.sleep(0.05)  # hold the worker so posts are still queued when the run sees the open circuit
+            raise
+
+def test_abort_during_regeneration_returns_and_keeps_fixed_posts(use_backend, tmp_path):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    posts_file = str(tmp_path / "posts.json")
+    shutil.copy(os.path.join(root, "modelit_x_posts.json"), posts_file)
+    backend = use_backend(OutageBackend(ok_calls=3))
+    backend.breaker.configure(failure_threshold=1, mode="abort")
+    replaced = []
+
+    run = threading.Thread(target=lambda: replaced.append(
+        pipeline.regenerate_posts(posts_file, list(range(1, 21)), concurrency=4)), daemon=True)
+    run.start()
+    run.join(10)
+
+    assert not run.is_alive()
+    assert replaced == [3]
+    texts = {post["main_text"] for post in iter_posts(posts_file)}
+    assert {VALID_TEXT.format(n=n) for n in (1, 2, 3)} <= texts
@@ -0,0 +1,51 @@
+import pytest
+
+import upload_posts_to_sheets as sheets
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    def called(name, result=None):
+        def record(*args, **kwargs):
+            calls.append(name)
+            return result
+        return record
+    monkeypatch.setattr(sheets, "get_credentials", called("get_credentials"))
+    monkeypatch.setattr(sheets, "build_sheets_service", called("build_sheets_service"))
+    monkeypatch.setattr(sheets, "create_spreadsheet", called("create_spreadsheet", "new-sheet"))
+    monkeypatch.setattr(sheets, "format_sheet", called("format_sheet"))
+    monkeypatch.setattr(sheets, "save_spreadsheet_id", called("save_spreadsheet_id"))
+    monkeypatch.setattr(sheets, "sync_posts", called("sync_posts", {}))
+    monkeypatch.setattr(sheets, "load_spreadsheet_id", lambda posts_file: None)
+    return calls
+
+def test_dry_run_without_a_known_sheet_creates_nothing(calls):
+    sheets.main("modelit_x_posts.json", dry_run=True)
+
+    assert calls == []
+
+def test_dry_run_neither_formats_nor_records_the_sheet(calls):
+    sheets.main("modelit_x_posts.json", "existing-sheet", dry_run=True, reformat=True)
+
+    assert calls == ["get_credentials", "build_sheets_service", "sync_posts"]
+
+def test_service_is_built_from_the_cached_document(tmp_path, monkeypatch):
+    from google.auth.credentials import AnonymousCredentials
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sheets, "_discovery_document", None)
+
+    assert sheets.build_sheets_service(AnonymousCredentials()).spreadsheets
+    assert (tmp_path / sheets.DISCOVERY_CACHE).exists()
+
+def test_service_falls_back_to_discovery(tmp_path, monkeypatch):
+    import googleapiclient.discovery
+
+    def unavailable():
+        raise OSError("no discovery document")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sheets, "_discovery_document", None)
+    monkeypatch.setattr(sheets, "load_discovery_document", unavailable)
+    monkeypatch.setattr(googleapiclient.discovery, "build", lambda *args, **kwargs: "discovered service")
+
+    assert sheets.build_sheets_service(None) == "discovered service"
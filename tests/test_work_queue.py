@@ -0,0 +1,70 @@
+import argparse
+import time
+from datetime import datetime
+
+import pytest
+
+import run_campaigns
+from campaigns import Campaign
+from circuit_breaker import CircuitOpenError
+from work_queue import LeaseQueue, LeaseRenewer
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = LeaseQueue(str(tmp_path / "queue.sqlite3"), lease_seconds=0.05, max_attempts=2)
+    queue.enqueue(Campaign("spring", {"Tips": 1}, datetime(2026, 1, 5)))
+    yield queue
+    queue.close()
+
+def test_expired_lease_is_reissued_until_attempts_run_out(queue):
+    assert [slot["attempt"] for slot in queue.claim("worker-a")] == [1]
+    time.sleep(0.1)
+    assert [slot["attempt"] for slot in queue.claim("worker-b")] == [2]
+    time.sleep(0.1)
+    assert queue.progress()["spring"]["failed"] == 1
+
+    assert queue.claim("worker-c") == []
+    assert queue.progress()["spring"] == {"pending": 0, "leased": 0, "done": 0, "failed": 1}
+    error = queue._conn.execute("SELECT error FROM slots").fetchone()[0]
+    assert error == "lease expired"
+
+def test_retry_failed_gives_an_expired_slot_a_fresh_budget(queue):
+    queue.claim("worker-a")
+    time.sleep(0.1)
+    queue.claim("worker-b")
+    time.sleep(0.1)
+    assert queue.claim("worker-c") == []
+
+    assert queue.retry_failed() == 1
+    assert [slot["attempt"] for slot in queue.claim("worker-c")] == [1]
+
+def test_renewer_keeps_leases_alive_while_the_worker_is_blocked(queue):
+    with LeaseRenewer(queue, "worker-a", interval=0.01):
+        queue.claim("worker-a")
+        time.sleep(0.2)  # four lease lengths, e.g. a breaker pausing requests
+        assert queue.claim("worker-b") == []
+    assert queue.progress()["spring"]["leased"] == 1
+
+def test_open_circuit_keeps_the_posts_that_finished(tmp_path, monkeypatch):
+    queue_path = str(tmp_path / "queue.sqlite3")
+    queue = LeaseQueue(queue_path)
+    queue.enqueue(Campaign("spring", {"Quick Win": 4}, datetime(2026, 1, 5), output=str(tmp_path / "spring.json")))
+    queue.close()
+
+    def generate_claimed(batch, campaign, seed):
+        post_num = batch[0][0]
+        if post_num == 2:
+            time.sleep(0.1)  # the other batches finish while this one waits on the provider
+            raise CircuitOpenError("provider down")
+        return [{"post_number": post_num, "main_text": f"post {post_num}"}]
+    monkeypatch.setattr(run_campaigns, "generate_claimed", generate_claimed)
+    options = argparse.Namespace(backend="stub", rate_limit=None, no_cache=True, cache_path=str(tmp_path / "cache"),
+                                 cache_max_entries=None, cache_max_bytes=None, cache_max_age_days=None,
+                                 queue=queue_path, lease_seconds=300, claim=4, campaign=None, concurrency=2,
+                                 posts_per_call=1, seed=None)
+
+    assert run_campaigns.work(options)["done"] == 3
+
+    queue = LeaseQueue(queue_path)
+    assert queue.progress()["spring"] == {"pending": 1, "leased": 0, "done": 3, "failed": 0}
+    queue.close()
@@ -1,34 +1,98 @@
 """
 Upload ModelIt K12 X posts from JSON to Google Sheets
+
+Rows are written in size-bounded chunks from a few threads, paced to the
+Sheets write quota, so archives with tens of thousands of posts upload
+without hitting request-size or per-minute limits.
+
+With --sync the sheet is read once and only rows whose content hash
+differs from the local post store are rewritten, in a single
+values.batchUpdate request.
+
+With --media the post images are uploaded to Drive (see media_upload.py)
+while the sheet is read or prepared, and their links go into column K
+of the same values write.
 """
 
+import hashlib
 import json
 import os
-from google.oauth2.credentials import Credentials
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from post_store import iter_posts
+from rate_limiter import AdaptiveRateLimiter
 
 # Scopes for Google Sheets API
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
 
-def get_credentials():
-    """Get Google API credentials"""
+# Sheets v4 discovery document, saved on first use so later runs never fetch it
+DISCOVERY_CACHE = 'sheets_v4_discovery.json'
+DISCOVERY_URL = 'https://sheets.googleapis.com/$discovery/rest?version=v4'
+
+COLUMNS = 11  # A:K; K (image link) is only written with --media
+
+HEADERS = [
+    "Post #",
+    "Week #",
+    "Post Order",
+    "Category",
+    "Main Text",
+    "Hashtags",
+    "Website Link",
+    "TPT Link",
+    "Full Post",
+    "Scheduled Date",
+    "Image"
+]
+COLUMN_WIDTHS = [60, 60, 80, 150, 400, 260, 180, 260, 400, 110, 300]  # pixels
+HEADER_FORMAT = {
+    "backgroundColor": {"red": 0.2, "green": 0.6, "blue": 0.9},
+    "textFormat": {"bold": True, "foregroundColor": {"red": 1.0, "green": 1.0, "blue": 1.0}}
+}
+
+# Bulk upload: Sheets allows 60 write requests per minute per user and
+# recommends request payloads under 2 MB
+DEFAULT_WORKERS = 4
+DEFAULT_CHUNK_ROWS = 1000
+DEFAULT_CHUNK_BYTES = 1_000_000
+DEFAULT_WRITES_PER_MINUTE = 60
+MIN_GRID_ROWS = 1000
+
+def get_credentials(scopes: List[str] = SCOPES):
+    """Get Google API credentials
+
+    The Google client libraries are imported here rather than at module
+    load, and only as far as needed: a valid token.json never touches the
+    HTTP transport or the OAuth flow machinery. Only a token that records
+    its scopes and lacks one of scopes (a Sheets-only token when --media
+    needs Drive) means logging in again; an older token.json with no scopes
+    field is used for scopes as it always was.
+    """
+    from google.oauth2.credentials import Credentials
+
     creds = None
 
     # Token file stores the user's access and refresh tokens
     if os.path.exists('token.json'):
-        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
+        with open('token.json') as token:
+            granted = json.load(token).get('scopes')
+        if isinstance(granted, str):
+            granted = granted.split()
+        if granted is None or set(scopes) <= set(granted):
+            creds = Credentials.from_authorized_user_file('token.json', scopes)
 
     # If there are no (valid) credentials available, let the user log in
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
+            from google.auth.transport.requests import Request
             creds.refresh(Request())
         else:
+            from google_auth_oauthlib.flow import InstalledAppFlow
             flow = InstalledAppFlow.from_client_secrets_file(
-                'credentials.json', SCOPES)
+                'credentials.json', scopes)
             creds = flow.run_local_server(port=0)
 
         # Save the credentials for the next run
@@ -37,13 +101,85 @@ def get_credentials():
 
     return creds
 
-def create_spreadsheet(service, title: str = "ModelIt K12 X Posts - 2025"):
-    """Create a new Google Sheet"""
+_discovery_document = None
+_discovery_lock = threading.Lock()
+
+def load_discovery_document() -> Dict:
+    """The Sheets v4 discovery document bundled with google-api-python-client 2.x, or fetched once"""
+    try:
+        from googleapiclient.discovery_cache import get_static_doc
+        content = get_static_doc('sheets', 'v4')
+    except ImportError:
+        content = None  # google-api-python-client < 2.0 bundles no documents
+    if content is None:
+        import requests
+        response = requests.get(DISCOVERY_URL, timeout=30)
+        response.raise_for_status()
+        content = response.text
+    return json.loads(content)
+
+def build_sheets_service(creds):
+    """Build a Sheets service without fetching the discovery document
+
+    Uses the cached document when there is one (parsed once per process,
+    so per-thread services are cheap), otherwise the copy bundled with
+    google-api-python-client 2.x. Older clients without bundled documents
+    fetch it once and it is cached for the next run. If the document
+    cannot be loaded or used, a plain build() does the discovery itself.
+    """
+    global _discovery_document
+    from googleapiclient.discovery import build, build_from_document
+
+    try:
+        with _discovery_lock:
+            if _discovery_document is None and os.path.exists(DISCOVERY_CACHE):
+                with open(DISCOVERY_CACHE, 'r', encoding='utf-8') as f:
+                    _discovery_document = json.load(f)
+            if _discovery_document is None:
+                _discovery_document = load_discovery_document()
+                with open(DISCOVERY_CACHE, 'w', encoding='utf-8') as f:
+                    json.dump(_discovery_document, f)
+            document = _discovery_document
+        return build_from_document(document, credentials=creds)
+    except Exception as e:
+        print(f"⚠️  Could not build from the Sheets discovery document ({e}), using discovery")
+        return build('sheets', 'v4', credentials=creds, cache_discovery=False)
+
+def header_cells() -> List[Dict]:
+    return [{"userEnteredValue": {"stringValue": header}, "userEnteredFormat": HEADER_FORMAT} for header in HEADERS]
+
+def create_spreadsheet(service, title: str = "ModelIt K12 X Posts - 2025", sheet_name: str = "X Posts",
+                       row_count: int = MIN_GRID_ROWS):
+    """Create a new Google Sheet, already named, formatted and sized, in one request
+
+    The header row, its styling, the frozen row, column widths and a grid
+    big enough for row_count rows are all part of the create call, so no
+    separate formatting round trips are needed.
+    """
+    from googleapiclient.errors import HttpError
+
     try:
         spreadsheet = {
             'properties': {
                 'title': title
-            }
+            },
+            'sheets': [{
+                'properties': {
+                    'sheetId': 0,
+                    'title': sheet_name,
+                    'gridProperties': {
+                        'rowCount': max(row_count, MIN_GRID_ROWS),
+                        'columnCount': 26,
+                        'frozenRowCount': 1
+                    }
+                },
+                'data': [{
+                    'startRow': 0,
+                    'startColumn': 0,
+                    'rowData': [{'values': header_cells()}],
+                    'columnMetadata': [{'pixelSize': width} for width in COLUMN_WIDTHS]
+                }]
+            }]
         }
         spreadsheet = service.spreadsheets().create(
             body=spreadsheet,
@@ -57,107 +193,49 @@ def create_spreadsheet(service, title: str = "ModelIt K12 X Posts - 2025"):
         print(f"❌ An error occurred: {error}")
         return None
 
-def format_sheet(service, spreadsheet_id: str, sheet_name: str = "X Posts"):
-    """Format the sheet with headers and styling"""
-
-    # Define header row
-    headers = [
-        "Post #",
-        "Week #",
-        "Post Order",
-        "Category",
-        "Main Text",
-        "Hashtags",
-        "Website Link",
-        "TPT Link",
-        "Full Post",
-        "Scheduled Date"
-    ]
-
-    # Create header row
-    header_data = [headers]
+def format_sheet(service, spreadsheet_id: str, sheet_name: str = "X Posts", sheet_id: int = 0):
+    """Format an existing sheet with headers and styling, in one batchUpdate"""
+    from googleapiclient.errors import HttpError
 
-    # Update the sheet
     requests = [
         {
-            # Rename Sheet1 to "X Posts"
+            # Rename the sheet and freeze the header row
             "updateSheetProperties": {
                 "properties": {
-                    "sheetId": 0,
-                    "title": sheet_name
-                },
-                "fields": "title"
-            }
-        },
-        {
-            # Format header row (bold, frozen)
-            "repeatCell": {
-                "range": {
-                    "sheetId": 0,
-                    "startRowIndex": 0,
-                    "endRowIndex": 1
-                },
-                "cell": {
-                    "userEnteredFormat": {
-                        "backgroundColor": {
-                            "red": 0.2,
-                            "green": 0.6,
-                            "blue": 0.9
-                        },
-                        "textFormat": {
-                            "bold": True,
-                            "foregroundColor": {
-                                "red": 1.0,
-                                "green": 1.0,
-                                "blue": 1.0
-                            }
-                        }
+                    "sheetId": sheet_id,
+                    "title": sheet_name,
+                    "gridProperties": {
+                        "frozenRowCount": 1
                     }
                 },
-                "fields": "userEnteredFormat(backgroundColor,textFormat)"
+                "fields": "title,gridProperties.frozenRowCount"
             }
         },
         {
-            # Freeze header row
-            "updateSheetProperties": {
-                "properties": {
-                    "sheetId": 0,
-                    "gridProperties": {
-                        "frozenRowCount": 1
-                    }
-                },
-                "fields": "gridProperties.frozenRowCount"
+            # Header values and styling together
+            "updateCells": {
+                "rows": [{"values": header_cells()}],
+                "start": {"sheetId": sheet_id, "rowIndex": 0, "columnIndex": 0},
+                "fields": "userEnteredValue,userEnteredFormat(backgroundColor,textFormat)"
             }
         },
         {
             # Auto-resize columns
             "autoResizeDimensions": {
                 "dimensions": {
-                    "sheetId": 0,
+                    "sheetId": sheet_id,
                     "dimension": "COLUMNS",
                     "startIndex": 0,
-                    "endIndex": 10
+                    "endIndex": COLUMNS
                 }
             }
         }
     ]
 
-    body = {
-        'requests': requests
-    }
-
     try:
         service.spreadsheets().batchUpdate(
             spreadsheetId=spreadsheet_id,
-            body=body
-        ).execute()
-
-        # Add header row
-        service.spreadsheets().values().update(
-            spreadsheetId=spreadsheet_id,
-            range=f'{sheet_name}!A1:J1',
-            valueInputOption='RAW',
-            body={'values': header_data}
+            body={'requests': requests}
         ).execute()
 
         print(f"✅ Formatted sheet with headers")
@@ -165,83 +243,356 @@ def format_sheet(service, spreadsheet_id: str, sheet_name: str = "X Posts"):
     except HttpError as error:
         print(f"❌ Error formatting sheet: {error}")
 
-def upload_posts(service, spreadsheet_id: str, posts_file: str, sheet_name: str = "X Posts"):
-    """Upload posts from JSON to Google Sheet"""
-
-    # Load posts from JSON
-    with open(posts_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
-    posts = data['posts']
-
-    print(f"📝 Uploading {len(posts)} posts...")
-
-    # Convert posts to rows
-    rows = []
-    for post in posts:
-        row = [
-            post['post_number'],
-            post['week_number'],
-            post['post_order'],
-            post['category'],
-            post['main_text'],
-            post['hashtags'],
-            post['website_link'],
-            post['tpt_link'],
-            post['full_post'],
-            post['scheduled_date']
-        ]
-        rows.append(row)
+def post_to_row(post: Dict) -> List:
+    """One sheet row (columns A:J) for a post record"""
+    return [
+        post['post_number'],
+        post['week_number'],
+        post['post_order'],
+        post['category'],
+        post['main_text'],
+        post['hashtags'],
+        post['website_link'],
+        post['tpt_link'],
+        post['full_post'],
+        post['scheduled_date']
+    ]
+
+def post_rows(posts_file: str, image_links: Optional[Dict[int, Optional[str]]] = None) -> List[List]:
+    """Rows for every post in the store, plus column K when image_links are given
+
+    Posts without an image get an empty K cell; a None link (failed
+    upload) is sent as null, which leaves the cell as it is.
+    """
+    rows = [post_to_row(post) for post in iter_posts(posts_file)]
+    if image_links is not None:
+        for row in rows:
+            row.append(image_links.get(row[0], ""))
+    return rows
+
+def row_hash(row: List) -> str:
+    """Content hash of a row as the sheet stores it
+
+    Cells are compared as text (None as an empty cell) and trailing empty
+    cells are dropped, since the Sheets API omits them when reading.
+    """
+    cells = ["" if c is None else str(int(c) if isinstance(c, float) and c.is_integer() else c) for c in row]
+    while cells and cells[-1] == "":
+        cells.pop()
+    return hashlib.sha1("\x1f".join(cells).encode("utf-8")).hexdigest()
+
+def diff_rows(current: List[List], desired: List[List]) -> Tuple[List[Tuple[int, List[List]]], Dict[str, int]]:
+    """Compare sheet rows with local rows, position by position
+
+    Returns ([(first row index, rows to write)], counts). Consecutive
+    changed rows are merged into one range; rows the store no longer has
+    are overwritten with empty cells.
+    """
+    counts = {"changed": 0, "added": 0, "removed": 0, "unchanged": 0}
+    updates = []
+    for i in range(max(len(current), len(desired))):
+        if i >= len(desired):
+            if not any(cell != "" for cell in current[i]):
+                continue  # already cleared
+            row, kind = [""] * max(COLUMNS, len(current[i])), "removed"
+        elif i >= len(current):
+            row, kind = desired[i], "added"
+        elif row_hash(current[i]) != row_hash(desired[i]):
+            row, kind = desired[i], "changed"
+        else:
+            counts["unchanged"] += 1
+            continue
+
+        counts[kind] += 1
+        if updates and updates[-1][0] + len(updates[-1][1]) == i:
+            updates[-1][1].append(row)
+        else:
+            updates.append((i, [row]))
+    return updates, counts
+
+def sync_posts(service, spreadsheet_id: str, posts_file: str, sheet_name: str = "X Posts",
+               dry_run: bool = False, media=None) -> Dict[str, int]:
+    """Bring the sheet in line with the post store, rewriting only rows that differ
+
+    media is a running media_upload.MediaStage; its links are compared and
+    written as column K.
+    """
+    from googleapiclient.errors import HttpError
+
+    print(f"🔄 Syncing posts from {posts_file}...")
+    last_column = 'K' if media else 'J'
 
-    # Upload data
     try:
-        service.spreadsheets().values().update(
+        # One read of the whole data range (while the images upload)...
+        result = service.spreadsheets().values().get(
             spreadsheetId=spreadsheet_id,
-            range=f'{sheet_name}!A2:J{len(rows)+1}',
-            valueInputOption='RAW',
-            body={'values': rows}
+            range=f'{sheet_name}!A2:{last_column}',
+            valueRenderOption='UNFORMATTED_VALUE'
+        ).execute()
+        rows = post_rows(posts_file, media.finish() if media else None)
+        updates, counts = diff_rows(result.get('values', []), rows)
+
+        print(f"  {counts['changed']} changed, {counts['added']} added, {counts['removed']} removed, "
+              f"{counts['unchanged']} unchanged")
+        if not updates:
+            print("✅ Sheet already up to date")
+            return counts
+        if dry_run:
+            for start, values in updates:
+                print(f"  would write {sheet_name}!A{start + 2}:{last_column}{start + len(values) + 1}")
+            return counts
+
+        if counts['added'] and len(rows) + 1 > MIN_GRID_ROWS:
+            ensure_grid_rows(service, spreadsheet_id, sheet_name, len(rows) + 1)
+
+        # ...and one write of just the rows that differ
+        data = [
+            {'range': f'{sheet_name}!A{start + 2}', 'values': values}
+            for start, values in updates
+        ]
+        service.spreadsheets().values().batchUpdate(
+            spreadsheetId=spreadsheet_id,
+            body={'valueInputOption': 'RAW', 'data': data}
         ).execute()
 
-        print(f"✅ Uploaded {len(posts)} posts to Google Sheet")
+        print(f"✅ Synced {sum(len(values) for _, values in updates)} rows in {len(data)} ranges")
+        return counts
 
-        # Get the spreadsheet URL
-        spreadsheet = service.spreadsheets().get(
-            spreadsheetId=spreadsheet_id
-        ).execute()
+    except HttpError as error:
+        print(f"❌ Error syncing posts: {error}")
+        return None
+
+def chunk_rows(rows: List[List], max_rows: int = DEFAULT_CHUNK_ROWS,
+               max_bytes: int = DEFAULT_CHUNK_BYTES) -> Iterator[Tuple[int, List[List]]]:
+    """Split rows into (first row index, rows) chunks bounded by row count and JSON size"""
+    start, chunk, size = 0, [], 0
+    for i, row in enumerate(rows):
+        row_bytes = len(json.dumps(row, ensure_ascii=False).encode("utf-8"))
+        if chunk and (len(chunk) >= max_rows or size + row_bytes > max_bytes):
+            yield start, chunk
+            start, chunk, size = i, [], 0
+        chunk.append(row)
+        size += row_bytes
+    if chunk:
+        yield start, chunk
+
+def http_status(error: Exception) -> Optional[int]:
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'resp', None), 'status', None)
+    return int(status) if status is not None else None
+
+def execute_with_backoff(request, limiter: AdaptiveRateLimiter, max_retries: int = 6):
+    """Execute a Sheets request inside the write quota, retrying 429s and 5xx with backoff"""
+    from googleapiclient.errors import HttpError
+
+    for attempt in range(max_retries + 1):
+        limiter.acquire()
+        try:
+            result = request.execute()
+            limiter.on_success()
+            return result
+        except HttpError as error:
+            status = http_status(error)
+            if attempt >= max_retries or not (status == 429 or (status or 0) >= 500):
+                raise
+            delay = limiter.on_error(status, getattr(error, 'resp', None), attempt)
+            print(f"  ⏳ Sheets answered {status}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+_thread_local = threading.local()
+
+def thread_service(service_factory):
+    """One Sheets service per worker thread (service objects are not thread-safe)"""
+    service = getattr(_thread_local, 'service', None)
+    if service is None:
+        service = _thread_local.service = service_factory()
+    return service
+
+def ensure_grid_rows(service, spreadsheet_id: str, sheet_name: str, row_count: int):
+    """Grow the sheet's grid so row_count rows fit (values writes fail past the grid)"""
+    spreadsheet = service.spreadsheets().get(
+        spreadsheetId=spreadsheet_id,
+        fields='sheets.properties(sheetId,title,gridProperties.rowCount)'
+    ).execute()
+    for sheet in spreadsheet.get('sheets', []):
+        properties = sheet['properties']
+        if properties['title'] != sheet_name:
+            continue
+        missing = row_count - properties['gridProperties']['rowCount']
+        if missing > 0:
+            service.spreadsheets().batchUpdate(
+                spreadsheetId=spreadsheet_id,
+                body={'requests': [{'appendDimension': {
+                    'sheetId': properties['sheetId'], 'dimension': 'ROWS', 'length': missing
+                }}]}
+            ).execute()
+        return
+    raise ValueError(f"No sheet named {sheet_name!r} in spreadsheet {spreadsheet_id}")
+
+def upload_rows(service_factory, spreadsheet_id: str, rows: List[List], sheet_name: str = "X Posts",
+                workers: int = DEFAULT_WORKERS, max_rows: int = DEFAULT_CHUNK_ROWS,
+                max_bytes: int = DEFAULT_CHUNK_BYTES, writes_per_minute: int = DEFAULT_WRITES_PER_MINUTE) -> Dict:
+    """Write rows from A2 down as size-bounded chunks over a small thread pool
+
+    Every chunk goes through one shared token bucket set to the Sheets
+    write quota; a 429 slows it down and pauses all workers for
+    Retry-After.
+    """
+    rate = writes_per_minute / 60
+    limiter = AdaptiveRateLimiter(rate=rate, max_rate=rate, burst=max(1, min(workers, writes_per_minute)))
+    chunks = list(chunk_rows(rows, max_rows, max_bytes))
+
+    def send(start: int, chunk: List[List]) -> int:
+        service = thread_service(service_factory)
+        execute_with_backoff(service.spreadsheets().values().update(
+            spreadsheetId=spreadsheet_id,
+            range=f'{sheet_name}!A{start + 2}',
+            valueInputOption='RAW',
+            body={'values': chunk}
+        ), limiter)
+        return len(chunk)
+
+    started = time.perf_counter()
+    done = 0
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        futures = [executor.submit(send, start, chunk) for start, chunk in chunks]
+        for future in as_completed(futures):
+            done += future.result()
+            elapsed = time.perf_counter() - started
+            print(f"  ✅ {done}/{len(rows)} rows ({done / elapsed:.0f} rows/s)")
+
+    elapsed = time.perf_counter() - started
+    return {
+        "rows": len(rows),
+        "chunks": len(chunks),
+        "seconds": round(elapsed, 2),
+        "rows_per_second": round(len(rows) / elapsed, 1) if elapsed > 0 else None,
+        "rate_limited": limiter.rate_limited
+    }
+
+def upload_posts(service, spreadsheet_id: str, posts_file: str, sheet_name: str = "X Posts",
+                 service_factory=None, workers: int = DEFAULT_WORKERS, max_rows: int = DEFAULT_CHUNK_ROWS,
+                 max_bytes: int = DEFAULT_CHUNK_BYTES, writes_per_minute: int = DEFAULT_WRITES_PER_MINUTE,
+                 grid_rows: int = None, media=None):
+    """Upload posts from a JSON or JSONL post store to Google Sheet
+
+    Large stores are sent in chunks; pass service_factory to send them
+    from several threads (each builds its own service). grid_rows is the
+    sheet's known row count, which saves looking it up. With media (a
+    running media_upload.MediaStage) the rows carry image links in column K.
+    """
+    from googleapiclient.errors import HttpError
 
-        print(f"\n🔗 Spreadsheet URL: {spreadsheet['spreadsheetUrl']}")
+    print(f"📝 Uploading posts from {posts_file}...")
 
-        return spreadsheet['spreadsheetUrl']
+    row_count = sum(1 for _ in iter_posts(posts_file))
+    if service_factory is None:
+        service_factory, workers = (lambda: service), 1
+
+    # Upload data
+    try:
+        if grid_rows is None or grid_rows < row_count + 1:
+            ensure_grid_rows(service, spreadsheet_id, sheet_name, row_count + 1)
+        # Convert posts to rows once the image links are in, streaming records from the store
+        rows = post_rows(posts_file, media.finish() if media else None)
+        stats = upload_rows(service_factory, spreadsheet_id, rows, sheet_name, workers, max_rows, max_bytes,
+                            writes_per_minute)
+
+        print(f"✅ Uploaded {stats['rows']} posts to Google Sheet in {stats['chunks']} chunks, "
+              f"{stats['seconds']}s ({stats['rows_per_second']} rows/s, {stats['rate_limited']} rate-limited)")
+
+        url = f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}/edit"
+        print(f"\n🔗 Spreadsheet URL: {url}")
+
+        return url
 
     except HttpError as error:
         print(f"❌ Error uploading posts: {error}")
         return None
 
-def main(posts_file: str = "modelit_x_posts.json", spreadsheet_id: str = None):
-    """Main function to upload posts to Google Sheets"""
+def sheet_state_path(posts_file: str) -> str:
+    """Where the spreadsheet ID used for a post store is remembered"""
+    return os.path.splitext(posts_file)[0] + ".sheet.json"
+
+def load_spreadsheet_id(posts_file: str):
+    path = sheet_state_path(posts_file)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f).get('spreadsheet_id')
+
+def save_spreadsheet_id(posts_file: str, spreadsheet_id: str):
+    with open(sheet_state_path(posts_file), 'w', encoding='utf-8') as f:
+        json.dump({'spreadsheet_id': spreadsheet_id}, f, indent=2)
+
+def main(posts_file: str = "modelit_x_posts.json", spreadsheet_id: str = None, sync: bool = False,
+         dry_run: bool = False, reformat: bool = False, workers: int = DEFAULT_WORKERS,
+         max_rows: int = DEFAULT_CHUNK_ROWS, max_bytes: int = DEFAULT_CHUNK_BYTES,
+         writes_per_minute: int = DEFAULT_WRITES_PER_MINUTE, media_options: Optional[Dict] = None):
+    """Main function to upload posts to Google Sheets
+
+    Without a spreadsheet ID the one used last time for this post store is
+    reused; a new spreadsheet is only created the first time. media_options
+    (keyword arguments for media_upload.start_media_upload) turns on the
+    image upload stage.
+    """
 
     print("🚀 Starting upload to Google Sheets...\n")
 
+    # A dry run only reads: it needs a sheet to compare against and never creates, formats or records one
+    spreadsheet_id = spreadsheet_id or load_spreadsheet_id(posts_file)
+    if dry_run and not spreadsheet_id:
+        print(f"❌ No spreadsheet known for {posts_file} - pass its ID or upload once without --dry-run")
+        return
+
+    media = None
+    use_media = media_options is not None and not dry_run
+    drive = False
+    if use_media:
+        from media_upload import DRIVE_SCOPE, DRIVE_UPLOAD_URL, MEDIA_UPLOAD_URL, media_session, start_media_upload
+        drive = media_options.get('upload_url', MEDIA_UPLOAD_URL) == DRIVE_UPLOAD_URL
+
     # Get credentials
-    creds = get_credentials()
+    creds = get_credentials(SCOPES + [DRIVE_SCOPE] if drive else SCOPES)
+
+    # Start the image uploads first, so they run while the sheet is created, read or written
+    if use_media:
+        # Only Drive gets the Google token; a mock or other endpoint gets a plain session
+        session = media_session(creds if drive else None, media_options.get('workers', DEFAULT_WORKERS))
+        media = start_media_upload(session, posts_file, **media_options)
 
-    # Build the service
-    service = build('sheets', 'v4', credentials=creds)
+    # Build the service (and one more per upload thread)
+    def service_factory():
+        return build_sheets_service(creds)
+    service = service_factory()
 
-    # Create new spreadsheet or use existing
+    # Create new spreadsheet (formatted and sized in the same request) or use existing
+    grid_rows = None
     if not spreadsheet_id:
-        spreadsheet_id = create_spreadsheet(service)
+        row_count = sum(1 for _ in iter_posts(posts_file)) + 1
+        spreadsheet_id = create_spreadsheet(service, row_count=row_count)
         if not spreadsheet_id:
             print("❌ Failed to create spreadsheet")
             return
-
-        # Format the sheet
-        format_sheet(service, spreadsheet_id)
+        grid_rows = max(row_count, MIN_GRID_ROWS)
     else:
         print(f"📊 Using existing spreadsheet: {spreadsheet_id}")
+        if reformat and not dry_run:
+            format_sheet(service, spreadsheet_id)
+    if not dry_run:
+        save_spreadsheet_id(posts_file, spreadsheet_id)
+
+    if sync or dry_run:
+        counts = sync_posts(service, spreadsheet_id, posts_file, dry_run=dry_run, media=media)
+        if counts is not None:
+            print(f"\n🔗 Spreadsheet URL: https://docs.google.com/spreadsheets/d/{spreadsheet_id}/edit")
+        return
 
     # Upload posts
-    url = upload_posts(service, spreadsheet_id, posts_file)
+    url = upload_posts(service, spreadsheet_id, posts_file, service_factory=service_factory, workers=workers,
+                       max_rows=max_rows, max_bytes=max_bytes, writes_per_minute=writes_per_minute,
+                       grid_rows=grid_rows, media=media)
 
     if url:
         print(f"\n✨ Success! Your posts are ready for automation.")
@@ -252,9 +603,45 @@ def main(posts_file: str = "modelit_x_posts.json", spreadsheet_id: str = None):
         print(f"   4. Monitor engagement and iterate on top performers")
 
 if __name__ == "__main__":
-    import sys
-
-    posts_file = sys.argv[1] if len(sys.argv) > 1 else "modelit_x_posts.json"
-    spreadsheet_id = sys.argv[2] if len(sys.argv) > 2 else None
-
-    main(posts_file, spreadsheet_id)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Upload posts to Google Sheets")
+    parser.add_argument("posts_file", nargs="?", default="modelit_x_posts.json", help="Post store (.json or .jsonl)")
+    parser.add_argument("spreadsheet_id", nargs="?", default=None,
+                        help="Existing spreadsheet (default: the one used last time for this post store)")
+    parser.add_argument("--sync", action="store_true",
+                        help="Only rewrite rows that differ from the post store, in one batch request")
+    parser.add_argument("--dry-run", action="store_true", help="Show what --sync would change without writing")
+    parser.add_argument("--format-sheet", action="store_true",
+                        help="Re-apply the header row and styling to an existing spreadsheet")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Upload threads for large stores (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS,
+                        help=f"Max rows per write request (default: {DEFAULT_CHUNK_ROWS})")
+    parser.add_argument("--chunk-bytes", type=int, default=DEFAULT_CHUNK_BYTES,
+                        help=f"Max JSON payload per write request (default: {DEFAULT_CHUNK_BYTES})")
+    parser.add_argument("--writes-per-minute", type=int, default=DEFAULT_WRITES_PER_MINUTE,
+                        help=f"Sheets write quota to stay within (default: {DEFAULT_WRITES_PER_MINUTE})")
+    parser.add_argument("--media", action="store_true",
+                        help="Upload the post images (resumable, skipping ones already sent) and link them in column K")
+    parser.add_argument("--images-dir", default="images", help="Images for --media (default: images)")
+    parser.add_argument("--media-workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Image upload threads (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--media-chunk-size", type=int, default=None,
+                        help="Bytes per upload request, a multiple of 256 KiB (default: 1 MiB)")
+    parser.add_argument("--media-upload-url", default=None,
+                        help="Resumable upload endpoint (default: Drive, or MEDIA_UPLOAD_URL)")
+    parser.add_argument("--media-folder", default=None, help="Drive folder ID to upload the images into")
+    options = parser.parse_args()
+
+    media_options = None
+    if options.media:
+        media_options = {"images_dir": options.images_dir, "workers": options.media_workers,
+                         "folder_id": options.media_folder}
+        if options.media_chunk_size:
+            media_options["chunk_size"] = options.media_chunk_size
+        if options.media_upload_url:
+            media_options["upload_url"] = options.media_upload_url
+
+    main(options.posts_file, options.spreadsheet_id, options.sync, options.dry_run, options.format_sheet,
+         options.workers, options.chunk_rows, options.chunk_bytes, options.writes_per_minute, media_options)
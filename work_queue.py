@@ -0,0 +1,265 @@
+"""
+SQLite work queue with leases for sharded campaign generation
+Every post slot of every campaign is a row. Workers (threads, processes or
+machines sharing the database file) claim slots under a time-limited lease,
+so a worker that dies mid-run only delays its slots until the lease
+expires - the next claim picks them up again. Finished posts are stored in
+the queue and merged into each campaign's output at the end.
+
+Claims run in BEGIN IMMEDIATE transactions, so two workers can never lease
+the same slot. Machines must share the file over a filesystem with working
+SQLite locking (a local disk or a proper network block device, not NFS).
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from campaigns import Campaign
+
+DEFAULT_QUEUE_PATH = "campaigns.sqlite3"
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 3
+
+def worker_id() -> str:
+    """Identifier that is unique across machines, processes and threads"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+class LeaseQueue:
+    """Post slots with pending -> leased -> done/failed states"""
+
+    def __init__(self, path: str = DEFAULT_QUEUE_PATH, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=30000")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS campaigns (
+                name TEXT PRIMARY KEY,
+                spec TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS slots (
+                campaign TEXT NOT NULL,
+                post_number INTEGER NOT NULL,
+                week_number INTEGER NOT NULL,
+                post_order INTEGER NOT NULL,
+                category TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                lease_owner TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                result TEXT,
+                PRIMARY KEY (campaign, post_number)
+            );
+            CREATE INDEX IF NOT EXISTS slots_claimable ON slots (status, lease_expires);
+        """)
+
+    def _transaction(self, sql_calls):
+        """Run callables on the connection inside one BEGIN IMMEDIATE transaction"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = sql_calls(self._conn)
+                self._conn.execute("COMMIT")
+                return result
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, campaign: Campaign) -> int:
+        """Add a campaign's slots; slots already queued are left as they are"""
+        def insert(conn):
+            conn.execute("INSERT OR REPLACE INTO campaigns (name, spec) VALUES (?, ?)",
+                         (campaign.name, json.dumps(campaign.to_dict())))
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO slots (campaign, post_number, week_number, post_order, category) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(campaign.name, *slot) for slot in campaign.post_slots()]
+            )
+            return conn.total_changes - before
+        return self._transaction(insert)
+
+    def campaign_specs(self) -> Dict[str, Dict]:
+        with self._lock:
+            rows = self._conn.execute("SELECT name, spec FROM campaigns ORDER BY name").fetchall()
+        return {name: json.loads(spec) for name, spec in rows}
+
+    def claim(self, owner: str, limit: int = 1, campaign: str = None) -> List[Dict]:
+        """Lease up to limit pending (or expired) slots to owner
+
+        Slots are handed out in (campaign, category, post_number) order, so
+        one claim tends to hold same-category posts that can share a batch
+        request. An expired lease that already used max_attempts is parked
+        as failed instead of being handed out again, so a post that keeps
+        killing its worker cannot cycle forever.
+        """
+        def lease(conn):
+            now = time.time()
+            expire = ("UPDATE slots SET status = 'failed', error = 'lease expired', lease_owner = NULL, "
+                      "lease_expires = NULL WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?")
+            expire_params = [now, self.max_attempts]
+            if campaign:
+                expire += " AND campaign = ?"
+                expire_params.append(campaign)
+            conn.execute(expire, expire_params)
+            query = ("SELECT campaign, post_number, week_number, post_order, category, attempts FROM slots "
+                     "WHERE (status = 'pending' OR (status = 'leased' AND lease_expires < ?))")
+            params = [now]
+            if campaign:
+                query += " AND campaign = ?"
+                params.append(campaign)
+            query += " ORDER BY campaign, category, post_number LIMIT ?"
+            params.append(limit)
+            rows = conn.execute(query, params).fetchall()
+            conn.executemany(
+                "UPDATE slots SET status = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1 "
+                "WHERE campaign = ? AND post_number = ?",
+                [(owner, now + self.lease_seconds, row[0], row[1]) for row in rows]
+            )
+            return [
+                {"campaign": row[0], "post_number": row[1], "week_number": row[2], "post_order": row[3],
+                 "category": row[4], "attempt": row[5] + 1}
+                for row in rows
+            ]
+        return self._transaction(lease)
+
+    def renew(self, owner: str, slots: List[Dict] = None):
+        """Extend the lease on slots this owner still holds (all of them if slots is None)"""
+        def extend(conn):
+            if slots is None:
+                conn.execute("UPDATE slots SET lease_expires = ? WHERE status = 'leased' AND lease_owner = ?",
+                             (time.time() + self.lease_seconds, owner))
+                return
+            conn.executemany(
+                "UPDATE slots SET lease_expires = ? WHERE campaign = ? AND post_number = ? "
+                "AND status = 'leased' AND lease_owner = ?",
+                [(time.time() + self.lease_seconds, slot["campaign"], slot["post_number"], owner) for slot in slots]
+            )
+        self._transaction(extend)
+
+    def complete(self, owner: str, slot: Dict, post: Dict) -> bool:
+        """Store a finished post; False if the slot was already finished by another worker"""
+        def finish(conn):
+            cursor = conn.execute(
+                "UPDATE slots SET status = 'done', result = ?, error = NULL, lease_owner = ?, lease_expires = NULL "
+                "WHERE campaign = ? AND post_number = ? AND status != 'done'",
+                (json.dumps(post, ensure_ascii=False), owner, slot["campaign"], slot["post_number"])
+            )
+            return cursor.rowcount == 1
+        return self._transaction(finish)
+
+    def fail(self, owner: str, slot: Dict, error: str, post: Optional[Dict] = None) -> str:
+        """Release a slot after a failed attempt
+
+        The slot goes back to pending until it has used max_attempts, then
+        it is parked as failed (with its placeholder post, if given).
+        Returns the new status.
+        """
+        def release(conn):
+            row = conn.execute(
+                "SELECT attempts, status, lease_owner FROM slots WHERE campaign = ? AND post_number = ?",
+                (slot["campaign"], slot["post_number"])
+            ).fetchone()
+            if row is None or row[1] == "done" or row[2] != owner:
+                return row[1] if row else "missing"
+            status = "failed" if row[0] >= self.max_attempts else "pending"
+            conn.execute(
+                "UPDATE slots SET status = ?, error = ?, result = ?, lease_owner = NULL, lease_expires = NULL "
+                "WHERE campaign = ? AND post_number = ?",
+                (status, error, json.dumps(post, ensure_ascii=False) if post else None,
+                 slot["campaign"], slot["post_number"])
+            )
+            return status
+        return self._transaction(release)
+
+    def release(self, owner: str):
+        """Hand back every slot this owner still leases (clean shutdown)"""
+        def free(conn):
+            conn.execute(
+                "UPDATE slots SET status = 'pending', lease_owner = NULL, lease_expires = NULL, "
+                "attempts = MAX(attempts - 1, 0) WHERE status = 'leased' AND lease_owner = ?",
+                (owner,)
+            )
+        self._transaction(free)
+
+    def retry_failed(self, campaign: str = None) -> int:
+        """Put failed slots back in the queue with a fresh attempt budget"""
+        def reset(conn):
+            query = "UPDATE slots SET status = 'pending', attempts = 0, error = NULL WHERE status = 'failed'"
+            params = []
+            if campaign:
+                query += " AND campaign = ?"
+                params.append(campaign)
+            return conn.execute(query, params).rowcount
+        return self._transaction(reset)
+
+    def progress(self) -> Dict[str, Dict[str, int]]:
+        """{campaign: {status: count}}, counting expired leases as pending (failed once out of attempts)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT campaign, CASE WHEN status = 'leased' AND lease_expires < ? "
+                "THEN CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END ELSE status END, "
+                "COUNT(*) FROM slots GROUP BY 1, 2", (time.time(), self.max_attempts)
+            ).fetchall()
+        progress = {}
+        for campaign, status, count in rows:
+            progress.setdefault(campaign, {"pending": 0, "leased": 0, "done": 0, "failed": 0})[status] += count
+        return progress
+
+    def next_lease_expiry(self) -> Optional[float]:
+        """Seconds until the earliest active lease expires (None if nothing is leased)"""
+        with self._lock:
+            row = self._conn.execute("SELECT MIN(lease_expires) FROM slots WHERE status = 'leased'").fetchone()
+        return max(row[0] - time.time(), 0.0) if row and row[0] is not None else None
+
+    def results(self, campaign: str) -> List[Dict]:
+        """Stored posts (finished and failed placeholders) for a campaign, by post_number"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT result FROM slots WHERE campaign = ? AND result IS NOT NULL ORDER BY post_number",
+                (campaign,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class LeaseRenewer:
+    """Background thread that renews every lease an owner holds
+
+    Renewing from a timer rather than between results keeps the leases
+    alive while the worker is blocked - on a slow batch, or on a circuit
+    breaker pausing requests for far longer than the lease - so another
+    worker does not reclaim the slots and burn an attempt.
+    """
+
+    def __init__(self, queue: LeaseQueue, owner: str, interval: float = None):
+        self.queue = queue
+        self.owner = owner
+        self.interval = interval or queue.lease_seconds / 3
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.queue.renew(self.owner)
+
+    def __enter__(self) -> "LeaseRenewer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()